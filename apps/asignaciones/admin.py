@@ -12,6 +12,8 @@ from .models import Asignacion, HistorialSupervisorAsignacion, HistorialEmpleado
 from apps.recursos_humanos.models import Empleado
 from apps.empresas.models import Empresa
 from .forms_custom import EmpleadoAsignacionFormSet, AsignacionCustomForm, ActividadAsignadaFormSet
+from .busqueda import buscar
+from .servicios import inferir_supervisores
 from django.urls import path
 from django.shortcuts import get_object_or_404
 
@@ -40,14 +42,14 @@ class AsignacionAdmin(admin.ModelAdmin):
     change_list_template = 'admin/asignaciones/asignacion/change_list.html'
     list_display = ('numero_cotizacion', 'fecha', 'get_empleados', 'empresa', 'supervisor', 'detalles', 'fecha_termino_display', 'dias_activos')
     list_filter = ('fecha', 'empresa')
-    search_fields = (
-        'empleados__usuario__first_name',
-        'empleados__usuario__last_name',
-        'empleados__numero_empleado',
-        'empresa__nombre',
-        'supervisor__usuario__first_name',
-        'supervisor__usuario__last_name',
-    )
+    # La búsqueda va contra la columna desnormalizada `texto_busqueda` (empresa,
+    # supervisor, empleados, detalles y No. cotización) con índice de trigramas
+    search_fields = ('texto_busqueda',)
+    search_help_text = 'Empresa, supervisor, empleado (nombre o número), detalles o No. cotización'
+
+    def get_search_results(self, request, queryset, search_term):
+        # Una sola tabla: no hay filas duplicadas que obliguen a un DISTINCT
+        return buscar(queryset, search_term), False
 
     # Renderizamos el historial de supervisores y empleados de forma personalizada
     # en la plantilla `change_form.html` (evitamos que el admin genere los
@@ -441,6 +443,9 @@ class AsignacionAdmin(admin.ModelAdmin):
         if empleados_formset.is_valid():
             empleados = [f.cleaned_data['empleado'] for f in empleados_formset.forms if f.cleaned_data and not f.cleaned_data.get('DELETE', False)]
             obj.empleados.set(empleados)
+        if not change and obj.supervisor_id is None:
+            # Supervisor por defecto a partir del primer empleado ya guardado
+            inferir_supervisores([obj])
         
         # Manejar actividades preservando las completadas
         if change and obj.pk:
@@ -510,10 +515,7 @@ class AsignacionAdmin(admin.ModelAdmin):
         """
         Notifica al admin cuando se cambia de supervisor y hay actividades completadas
         """
-        from apps.notificaciones.models import Notificacion
-        from apps.usuarios.models import Usuario
-        
-        admin_users = Usuario.objects.filter(is_staff=True)
+        from apps.notificaciones.servicios import notificar
         
         # Crear mensaje con detalles del cambio
         lineas = []
@@ -533,10 +535,4 @@ class AsignacionAdmin(admin.ModelAdmin):
         
         mensaje = '\n'.join(lineas)
         
-        for admin in admin_users:
-            Notificacion.objects.create(
-                usuario=admin,
-                titulo=f"🔄 Cambio de supervisor - {obj.empresa.nombre}",
-                mensaje=mensaje,
-                tipo='info'
-            )
+        notificar('staff', f"🔄 Cambio de supervisor - {obj.empresa.nombre}", mensaje, tipo='info')
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class AsignacionesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.asignaciones'
+    verbose_name = 'Asignaciones'
+
+    def ready(self):
+        # Conectar la invalidación del cache de conteos por estado y el
+        # mantenimiento del texto de búsqueda
+        from . import busqueda, servicios  # noqa: F401
@@ -0,0 +1,130 @@
+"""
+Búsqueda de asignaciones por texto.
+
+Cada asignación guarda en `texto_busqueda` el nombre de la empresa, del
+supervisor y de los empleados (con su número), los detalles y el No. de
+cotización, en minúsculas y sin acentos. Sobre esa columna hay un índice GIN
+de trigramas (pg_trgm), así que `buscar()` resuelve cada término con un
+LIKE '%termino%' indexado sobre una sola tabla, sin JOINs ni DISTINCT.
+
+La columna se recalcula al confirmar la transacción cuando cambia la
+asignación, sus empleados, el nombre de la empresa o el de un usuario/empleado
+relacionado; `recalcular_busqueda_asignaciones` la reconstruye completa.
+"""
+import unicodedata
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_save
+
+from apps.empresas.models import Empresa
+from apps.recursos_humanos.models import Empleado
+from soma.al_commit import agrupar_al_commit
+from .models import Asignacion
+
+LOTE = 1000
+# Campos de la asignación que forman parte del texto
+CAMPOS_ASIGNACION = ('empresa', 'supervisor', 'detalles', 'numero_cotizacion')
+# Campos de otros modelos que aparecen en el texto de sus asignaciones
+CAMPOS_EMPRESA = ('nombre',)
+CAMPOS_USUARIO = ('first_name', 'last_name')
+CAMPOS_EMPLEADO = ('numero_empleado',)
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos, igual para lo guardado y lo buscado."""
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def buscar(queryset, termino):
+    """Filtra las asignaciones que contienen todos los términos (separados por espacios)."""
+    for parte in normalizar(termino).split():
+        queryset = queryset.filter(texto_busqueda__contains=parte)
+    return queryset
+
+
+def recalcular_busqueda(asignacion_ids, guardar=True):
+    """Reconstruye `texto_busqueda` por lotes; devuelve cuántas filas estaban desactualizadas."""
+    ids = list(asignacion_ids)
+    Through = Asignacion.empleados.through
+    total = 0
+    for i in range(0, len(ids), LOTE):
+        lote = ids[i:i + LOTE]
+        partes = {}
+        actuales = {}
+        filas = (Asignacion.objects.filter(pk__in=lote)
+                 .values_list('pk', 'texto_busqueda', 'empresa__nombre', 'supervisor__usuario__first_name',
+                              'supervisor__usuario__last_name', 'detalles', 'numero_cotizacion'))
+        for pk, actual, *valores in filas:
+            actuales[pk] = actual
+            partes[pk] = [v for v in valores if v not in (None, '')]
+        empleados = (Through.objects.filter(asignacion_id__in=lote)
+                     .order_by('asignacion_id', 'empleado__numero_empleado')
+                     .values_list('asignacion_id', 'empleado__usuario__first_name',
+                                  'empleado__usuario__last_name', 'empleado__numero_empleado'))
+        for asignacion_id, *valores in empleados:
+            partes[asignacion_id].extend(v for v in valores if v)
+
+        cambios = []
+        for pk, valores in partes.items():
+            texto = normalizar(' '.join(str(v) for v in valores))
+            if texto != actuales[pk]:
+                cambios.append(Asignacion(pk=pk, texto_busqueda=texto))
+        if cambios and guardar:
+            Asignacion.objects.bulk_update(cambios, ['texto_busqueda'])
+        total += len(cambios)
+    return total
+
+
+# Agenda el recálculo para el commit; varias llamadas en la misma transacción se juntan
+programar_busqueda = agrupar_al_commit(recalcular_busqueda)
+
+
+def _asignacion_guardada(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or set(update_fields) & set(CAMPOS_ASIGNACION):
+        programar_busqueda([instance.pk])
+
+
+def _empleados_cambiados(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            programar_busqueda([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        programar_busqueda(pk_set or ())
+    elif action == 'pre_clear':
+        # Después del clear ya no se sabe de qué asignaciones se quitó
+        programar_busqueda(instance.asignaciones.values_list('pk', flat=True))
+
+
+def _cambio(instance, campos, update_fields):
+    # Comparado con lo leído de la BD (ValoresCargadosMixin); sin registro se asume que cambió
+    if update_fields is not None and not set(update_fields) & set(campos):
+        return False
+    return instance.valores_cargados(*campos) != {c: instance.__dict__.get(c) for c in campos}
+
+
+def _empresa_guardada(sender, instance, created, update_fields=None, **kwargs):
+    if not created and _cambio(instance, CAMPOS_EMPRESA, update_fields):
+        programar_busqueda(Asignacion.objects.filter(empresa_id=instance.pk).values_list('pk', flat=True))
+
+
+def _usuario_guardado(sender, instance, created, update_fields=None, **kwargs):
+    # El login guarda sólo last_login: no llega a consultar nada
+    if not created and _cambio(instance, CAMPOS_USUARIO, update_fields):
+        programar_busqueda(Asignacion.objects.filter(supervisor__usuario_id=instance.pk).values_list('pk', flat=True))
+        programar_busqueda(Asignacion.empleados.through.objects
+                           .filter(empleado__usuario_id=instance.pk)
+                           .values_list('asignacion_id', flat=True))
+
+
+def _empleado_guardado(sender, instance, created, update_fields=None, **kwargs):
+    if not created and _cambio(instance, CAMPOS_EMPLEADO, update_fields):
+        programar_busqueda(instance.asignaciones.values_list('pk', flat=True))
+
+
+post_save.connect(_asignacion_guardada, sender=Asignacion, dispatch_uid='asignaciones_busqueda_save')
+m2m_changed.connect(_empleados_cambiados, sender=Asignacion.empleados.through,
+                    dispatch_uid='asignaciones_busqueda_empleados')
+post_save.connect(_empresa_guardada, sender=Empresa, dispatch_uid='asignaciones_busqueda_empresa_save')
+post_save.connect(_usuario_guardado, sender=get_user_model(), dispatch_uid='asignaciones_busqueda_usuario_save')
+post_save.connect(_empleado_guardado, sender=Empleado, dispatch_uid='asignaciones_busqueda_empleado_save')
@@ -1,7 +1,9 @@
 from django import forms
 from django.forms import formset_factory
+from django.urls import reverse
 from apps.recursos_humanos.models import Empleado
 from .models import Asignacion, ActividadAsignada
+from .servicios import opciones_empleados
 class ActividadAsignadaForm(forms.Form):
     nombre = forms.CharField(
         max_length=120,
@@ -61,28 +63,46 @@ def ActividadAsignadaFormSetFactory(extra=1):
 
 ActividadAsignadaFormSet = ActividadAsignadaFormSetFactory()
 
+def etiquetas_empleados():
+    return {pk: etiqueta for pk, etiqueta, _ in opciones_empleados()}
+
+
 class EmpleadoAsignacionForm(forms.Form):
     empleado = forms.ModelChoiceField(
         queryset=Empleado.objects.filter(activo=True).order_by('numero_empleado'),
         label='Empleado',
-        required=True
+        required=True,
+        widget=forms.Select(attrs={'class': 'empleado-select form-control'}),
     )
     
     def __init__(self, *args, **kwargs):
         supervisor_id = kwargs.pop('supervisor_id', None)
+        etiquetas = kwargs.pop('etiquetas', None)
         super().__init__(*args, **kwargs)
         if supervisor_id:
             # Excluir el supervisor de la lista de empleados
             self.fields['empleado'].queryset = self.fields['empleado'].queryset.exclude(id=supervisor_id)
+        if etiquetas is None:
+            etiquetas = etiquetas_empleados()
+        # Sólo se renderiza la opción elegida (sin consultar la BD); el resto lo
+        # carga el widget desde el autocompletado
+        opciones = [('', '---------')]
+        try:
+            seleccionado = int(self['empleado'].value())
+        except (TypeError, ValueError):
+            seleccionado = None
+        if seleccionado in etiquetas:
+            opciones.append((seleccionado, etiquetas[seleccionado]))
+        self.fields['empleado'].choices = opciones
+        self.fields['empleado'].widget.attrs['data-autocomplete-url'] = reverse('asignaciones:autocompletar_empleados')
+
 
 class EmpleadoAsignacionBaseFormSet(forms.BaseFormSet):
     def __init__(self, *args, **kwargs):
-        self.form_kwargs = kwargs.pop('form_kwargs', {})
         super().__init__(*args, **kwargs)
-    
-    def _construct_form(self, i, **kwargs):
-        kwargs.update(self.form_kwargs)
-        return super()._construct_form(i, **kwargs)
+        # Las mismas etiquetas (de cache) para todos los formularios y el vacío
+        if 'etiquetas' not in self.form_kwargs:
+            self.form_kwargs = {**self.form_kwargs, 'etiquetas': etiquetas_empleados()}
 
 def EmpleadoAsignacionFormSetFactory(extra=1):
     return formset_factory(EmpleadoAsignacionForm, formset=EmpleadoAsignacionBaseFormSet, extra=extra, can_delete=True)
@@ -107,7 +127,8 @@ class AsignacionCustomForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['empresa'].queryset = self.fields['empresa'].queryset.filter(activa=True)
-        self.fields['supervisor'].queryset = self.fields['supervisor'].queryset.filter(activo=True)
+        # Con el usuario unido: la etiqueta de cada opción usa su nombre
+        self.fields['supervisor'].queryset = self.fields['supervisor'].queryset.filter(activo=True).select_related('usuario')
         # Configura el widget para mostrar el calendario nativo del navegador
         self.fields['fecha'].widget = forms.DateInput(format='%Y-%m-%d', attrs={'type': 'date'})
         # Inicializa la fecha en formato HTML5 si estamos editando y no hay datos POST
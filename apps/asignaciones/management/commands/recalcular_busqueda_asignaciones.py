@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.asignaciones.busqueda import recalcular_busqueda
+from apps.asignaciones.models import Asignacion
+
+
+class Command(BaseCommand):
+    help = ('Reconstruye el texto de búsqueda de las asignaciones (empresa, supervisor, empleados, '
+            'detalles y No. cotización)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo contar las asignaciones desactualizadas sin modificarlas',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Asignaciones procesadas por lote (por defecto 1000)',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = max(1, options['batch_size'])
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: No se harán cambios'))
+
+        corregidas = 0
+        asignacion_ids = list(Asignacion.objects.order_by('pk').values_list('pk', flat=True))
+        for inicio in range(0, len(asignacion_ids), batch_size):
+            lote = asignacion_ids[inicio:inicio + batch_size]
+            with transaction.atomic():
+                corregidas += recalcular_busqueda(lote, guardar=not dry_run)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Asignaciones revisadas: {len(asignacion_ids)}. Asignaciones corregidas: {corregidas}.'
+        ))
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.asignaciones.models import ReporteAsignaciones
+from apps.asignaciones.reportes import generar_reporte, titulo_rango
+from apps.notificaciones.servicios import notificar
+
+ESTADOS_INCONCLUSOS = ('pendiente', 'generando')
+
+
+class Command(BaseCommand):
+    help = ('Retoma los reportes PDF de asignaciones que se quedaron pendientes o generándose (p. ej. por un '
+            'reinicio del servidor): los genera de nuevo o, con --marcar-error, los da por fallidos')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutos',
+            type=int,
+            default=30,
+            help='Antigüedad mínima en minutos para considerar un reporte abandonado (por defecto 30)',
+        )
+        parser.add_argument(
+            '--marcar-error',
+            action='store_true',
+            help='Marcar los reportes como error y avisar al usuario en lugar de generarlos',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo mostrar cuántos reportes se recuperarían',
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(minutes=max(0, options['minutos']))
+        inconclusos = ReporteAsignaciones.objects.filter(estado__in=ESTADOS_INCONCLUSOS, fecha_creacion__lt=limite)
+        reporte_ids = list(inconclusos.order_by('pk').values_list('pk', flat=True))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: No se harán cambios'))
+            self.stdout.write(f'Reportes a recuperar: {len(reporte_ids)}')
+            return
+
+        if options['marcar_error']:
+            marcados = 0
+            for reporte in inconclusos.filter(pk__in=reporte_ids):
+                # Sólo si sigue inconcluso: otro proceso pudo terminarlo mientras tanto
+                marcado = (ReporteAsignaciones.objects
+                           .filter(pk=reporte.pk, estado__in=ESTADOS_INCONCLUSOS)
+                           .update(estado='error', error='La generación se interrumpió; vuelve a solicitarlo.',
+                                   fecha_fin=timezone.now()))
+                marcados += marcado
+                if marcado:
+                    notificar(reporte.usuario_id, '❌ Error en el reporte de asignaciones',
+                              f'No se pudo generar el PDF del {titulo_rango(reporte.desde, reporte.hasta)}; '
+                              'vuelve a solicitarlo.',
+                              tipo='danger', url=reverse('asignaciones:reportes_pdf'))
+            self.stdout.write(self.style.SUCCESS(f'Reportes marcados como error: {marcados}'))
+            return
+
+        for reporte_id in reporte_ids:
+            generar_reporte(reporte_id)
+            self.stdout.write(f'Reporte {reporte_id} generado')
+        self.stdout.write(self.style.SUCCESS(f'Reportes recuperados: {len(reporte_ids)}'))
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:28
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+CAMPOS = ['porcentaje_completado', 'actividades_total', 'actividades_completadas',
+          'tiempo_estimado_pendiente', 'tiempo_estimado_completado']
+
+
+def poblar_progreso(apps, schema_editor):
+    """Calcula el avance inicial de cada asignación a partir de sus actividades."""
+    Asignacion = apps.get_model('asignaciones', 'Asignacion')
+    ActividadAsignada = apps.get_model('asignaciones', 'ActividadAsignada')
+    completada = Q(completada=True)
+    filas = (ActividadAsignada.objects
+             .order_by()
+             .values('asignacion_id')
+             .annotate(total=Count('id'),
+                       completadas=Count('id', filter=completada),
+                       porcentaje=Sum('porcentaje', filter=completada),
+                       pendientes=Sum('tiempo_estimado_dias', filter=~completada),
+                       completados=Sum('tiempo_estimado_dias', filter=completada)))
+    lote = []
+    for fila in filas.iterator():
+        lote.append(Asignacion(
+            pk=fila['asignacion_id'],
+            porcentaje_completado=fila['porcentaje'] or 0,
+            actividades_total=fila['total'],
+            actividades_completadas=fila['completadas'],
+            tiempo_estimado_pendiente=fila['pendientes'] or 0,
+            tiempo_estimado_completado=fila['completados'] or 0,
+        ))
+        if len(lote) >= 1000:
+            Asignacion.objects.bulk_update(lote, CAMPOS)
+            lote = []
+    Asignacion.objects.bulk_update(lote, CAMPOS)
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asignaciones', '0018_asignacion_fecha_termino_asignaciondiatrabajado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asignacion',
+            name='actividades_completadas',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Actividades completadas'),
+        ),
+        migrations.AddField(
+            model_name='asignacion',
+            name='actividades_total',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Actividades'),
+        ),
+        migrations.AddField(
+            model_name='asignacion',
+            name='porcentaje_completado',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Porcentaje completado'),
+        ),
+        migrations.AddField(
+            model_name='asignacion',
+            name='tiempo_estimado_completado',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Días estimados completados'),
+        ),
+        migrations.AddField(
+            model_name='asignacion',
+            name='tiempo_estimado_pendiente',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Días estimados pendientes'),
+        ),
+        migrations.AddIndex(
+            model_name='asignacion',
+            index=models.Index(fields=['porcentaje_completado', 'fecha'], name='asignacion_progreso_fecha_idx'),
+        ),
+        migrations.RunPython(poblar_progreso, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recursos_humanos', '0019_empleado_lugar_de_pertenencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('empresas', '0023_ctzformato_notas_observaciones_and_more'),
+        ('asignaciones', '0019_asignacion_progreso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReporteAsignaciones',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desde', models.DateField(verbose_name='Desde')),
+                ('hasta', models.DateField(verbose_name='Hasta')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('generando', 'Generando'), ('listo', 'Listo'), ('error', 'Error')], default='pendiente', max_length=10, verbose_name='Estado')),
+                ('archivo', models.FileField(blank=True, upload_to='asignaciones/reportes/', verbose_name='Archivo')),
+                ('total_asignaciones', models.PositiveIntegerField(default=0, verbose_name='Asignaciones')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de finalización')),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='empresas.empresa', verbose_name='Empresa')),
+                ('supervisor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='recursos_humanos.empleado', verbose_name='Supervisor')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reportes_asignaciones', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Reporte de asignaciones',
+                'verbose_name_plural': 'Reportes de asignaciones',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+def verificar_duplicados(apps, schema_editor):
+    """Antes la unicidad sólo se validaba en formularios; si hay duplicados, detener con la lista."""
+    Asignacion = apps.get_model('asignaciones', 'Asignacion')
+    duplicados = list(
+        Asignacion.objects
+        .filter(numero_cotizacion__isnull=False)
+        .values('numero_cotizacion')
+        .annotate(n=models.Count('id'))
+        .filter(n__gt=1)
+        .values_list('numero_cotizacion', flat=True)[:50]
+    )
+    if duplicados:
+        raise RuntimeError(
+            'Hay asignaciones con el mismo No. cotización; corríjalas antes de aplicar la '
+            f'restricción única: {", ".join(str(n) for n in duplicados)}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asignaciones', '0020_reporteasignaciones'),
+    ]
+
+    operations = [
+        migrations.RunPython(verificar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='asignacion',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('numero_cotizacion__isnull', False)),
+                fields=('numero_cotizacion',),
+                name='asignacion_numero_cotizacion_uniq',
+                violation_error_message='Ya existe una asignación con ese No. cotización.',
+            ),
+        ),
+    ]
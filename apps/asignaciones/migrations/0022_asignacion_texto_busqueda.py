@@ -0,0 +1,57 @@
+import unicodedata
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def poblar_texto_busqueda(apps, schema_editor):
+    """Texto de búsqueda inicial (mismo formato que apps.asignaciones.busqueda)."""
+    Asignacion = apps.get_model('asignaciones', 'Asignacion')
+    Through = Asignacion.empleados.through
+    ids = list(Asignacion.objects.order_by('pk').values_list('pk', flat=True))
+    for i in range(0, len(ids), 1000):
+        lote = ids[i:i + 1000]
+        partes = {}
+        filas = (Asignacion.objects.filter(pk__in=lote)
+                 .values_list('pk', 'empresa__nombre', 'supervisor__usuario__first_name',
+                              'supervisor__usuario__last_name', 'detalles', 'numero_cotizacion'))
+        for pk, *valores in filas:
+            partes[pk] = [v for v in valores if v not in (None, '')]
+        empleados = (Through.objects.filter(asignacion_id__in=lote)
+                     .order_by('asignacion_id', 'empleado__numero_empleado')
+                     .values_list('asignacion_id', 'empleado__usuario__first_name',
+                                  'empleado__usuario__last_name', 'empleado__numero_empleado'))
+        for asignacion_id, *valores in empleados:
+            partes[asignacion_id].extend(v for v in valores if v)
+        Asignacion.objects.bulk_update(
+            [Asignacion(pk=pk, texto_busqueda=_normalizar(' '.join(str(v) for v in valores)))
+             for pk, valores in partes.items()],
+            ['texto_busqueda'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('asignaciones', '0021_asignacion_numero_cotizacion_uniq'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='asignacion',
+            name='texto_busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(poblar_texto_busqueda, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='asignacion',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['texto_busqueda'], name='asignacion_busqueda_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -1,8 +1,14 @@
+from datetime import date, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.db.models.functions import Coalesce, Greatest, TruncDate
 from django.urls import reverse
 
 from apps.recursos_humanos.models import Empleado
 from apps.empresas.models import Empresa
+from soma.al_commit import agrupar_al_commit
 
 
 
@@ -30,6 +36,40 @@ class ActividadAsignada(models.Model):
         dias_texto = f"{self.tiempo_estimado_dias} día{'s' if self.tiempo_estimado_dias != 1 else ''}"
         return f"{status} {self.nombre} ({self.porcentaje}% - {dias_texto})"
 
+class AsignacionQuerySet(models.QuerySet):
+    def with_progress(self):
+        """Anota las métricas de avance de las actividades en una sola consulta.
+
+        Usa agregación condicional (SUM/COUNT ... FILTER) sobre `actividades`.
+        Es la fuente de verdad de las columnas desnormalizadas de avance
+        (ver `recalcular_progreso`). No combinar con filtros que unan otra
+        relación multivaluada (p.ej. un OR sobre `empleados`): la unión
+        multiplicaría las sumas.
+        """
+        completada = models.Q(actividades__completada=True)
+        return self.annotate(
+            progreso_total=models.Count('actividades'),
+            progreso_completadas=models.Count('actividades', filter=completada),
+            progreso_porcentaje=Coalesce(models.Sum('actividades__porcentaje', filter=completada), 0),
+            progreso_dias_pendientes=Coalesce(
+                models.Sum('actividades__tiempo_estimado_dias', filter=~completada), 0
+            ),
+            progreso_dias_completados=Coalesce(
+                models.Sum('actividades__tiempo_estimado_dias', filter=completada), 0
+            ),
+        )
+
+
+# Columnas de avance de Asignacion y la anotación de with_progress() que las calcula
+CAMPOS_PROGRESO = {
+    'porcentaje_completado': 'progreso_porcentaje',
+    'actividades_total': 'progreso_total',
+    'actividades_completadas': 'progreso_completadas',
+    'tiempo_estimado_pendiente': 'progreso_dias_pendientes',
+    'tiempo_estimado_completado': 'progreso_dias_completados',
+}
+
+
 class Asignacion(models.Model):
     @property
     def actividades_detalle(self):
@@ -46,43 +86,14 @@ class Asignacion(models.Model):
             } for a in actividades
         ]
     
-    @property
-    def porcentaje_completado(self):
-        actividades = self.actividades.all()
-        if not actividades:
-            return 0
-        total_completado = sum(a.porcentaje for a in actividades if a.completada)
-        return total_completado
-    
     @property
     def todas_actividades_completadas(self):
-        return self.actividades.exists() and not self.actividades.filter(completada=False).exists()
-    
-    @property
-    def actividades_completadas(self):
-        """Retorna el número de actividades completadas"""
-        return self.actividades.filter(completada=True).count()
+        return self.actividades_total > 0 and self.actividades_completadas == self.actividades_total
     
     @property
     def tiempo_estimado_total(self):
         """Retorna el tiempo total estimado en días para todas las actividades"""
-        return self.actividades.aggregate(
-            total=models.Sum('tiempo_estimado_dias')
-        )['total'] or 0
-    
-    @property
-    def tiempo_estimado_pendiente(self):
-        """Retorna el tiempo estimado en días para actividades pendientes"""
-        return self.actividades.filter(completada=False).aggregate(
-            total=models.Sum('tiempo_estimado_dias')
-        )['total'] or 0
-    
-    @property
-    def tiempo_estimado_completado(self):
-        """Retorna el tiempo de actividades ya completadas"""
-        return self.actividades.filter(completada=True).aggregate(
-            total=models.Sum('tiempo_estimado_dias')
-        )['total'] or 0
+        return self.tiempo_estimado_pendiente + self.tiempo_estimado_completado
     @property
     def empleado_resumen(self):
         empleados = list(self.empleados.all())
@@ -107,9 +118,6 @@ class Asignacion(models.Model):
         return ''
 
     @property
-    def actividades_total(self):
-        return self.actividades.count()
-    @property
     def empleados_str(self):
         return ', '.join([str(e) for e in self.empleados.all()])
     def get_admin_url(self):
@@ -140,6 +148,18 @@ class Asignacion(models.Model):
     # Nuevo campo: fecha de término de la asignación. Se establecerá cuando
     # todas las actividades estén completadas (fecha de la última actividad).
     fecha_termino = models.DateField(null=True, blank=True, verbose_name='Fecha de término')
+    # Avance desnormalizado de las actividades. Lo mantienen las señales de
+    # ActividadAsignada; `recalcular_progreso_asignaciones` lo repara.
+    porcentaje_completado = models.PositiveIntegerField(default=0, editable=False, verbose_name='Porcentaje completado')
+    actividades_total = models.PositiveIntegerField(default=0, editable=False, verbose_name='Actividades')
+    actividades_completadas = models.PositiveIntegerField(default=0, editable=False, verbose_name='Actividades completadas')
+    tiempo_estimado_pendiente = models.PositiveIntegerField(default=0, editable=False, verbose_name='Días estimados pendientes')
+    tiempo_estimado_completado = models.PositiveIntegerField(default=0, editable=False, verbose_name='Días estimados completados')
+    # Texto normalizado (minúsculas, sin acentos) con empresa, supervisor,
+    # empleados, detalles y No. cotización; lo mantiene `busqueda.py`
+    texto_busqueda = models.TextField(blank=True, default='', editable=False)
+
+    objects = AsignacionQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Asignación'
@@ -147,6 +167,18 @@ class Asignacion(models.Model):
         ordering = ['-fecha']
         indexes = [
             models.Index(fields=['fecha']),
+            models.Index(fields=['porcentaje_completado', 'fecha'], name='asignacion_progreso_fecha_idx'),
+            # Trigramas: LIKE '%termino%' sobre texto_busqueda usa el índice
+            GinIndex(fields=['texto_busqueda'], opclasses=['gin_trgm_ops'], name='asignacion_busqueda_trgm'),
+        ]
+        constraints = [
+            # Índice único parcial: varias asignaciones pueden no tener número
+            models.UniqueConstraint(
+                fields=['numero_cotizacion'],
+                condition=models.Q(numero_cotizacion__isnull=False),
+                name='asignacion_numero_cotizacion_uniq',
+                violation_error_message='Ya existe una asignación con ese No. cotización.',
+            ),
         ]
 
     def __str__(self):
@@ -159,85 +191,29 @@ class Asignacion(models.Model):
         return reverse('asignaciones:detalle', kwargs={'pk': self.pk})
 
     def save(self, *args, **kwargs):
-        # Solo ejecutar la lógica de supervisor al crear la asignación
-        if self.supervisor is None and not self.pk:
-            primer_empleado = self.empleados.first()
-            if primer_empleado:
-                if primer_empleado.jefe_directo_id:
-                    self.supervisor = primer_empleado.jefe_directo
-                else:
-                    puesto_sup = getattr(primer_empleado.puesto, 'superior', None)
-                    if puesto_sup:
-                        from apps.recursos_humanos.models import Empleado as Emp
-                        cand = (
-                            Emp.objects.filter(puesto=puesto_sup, activo=True)
-                            .select_related('usuario')
-                            .order_by('fecha_ingreso')
-                            .first()
-                        )
-                        if cand:
-                            self.supervisor = cand
-        # Validación: asegurar unicidad de numero_cotizacion a nivel de modelo
-        # antes de persistir. full_clean() lanzará ValidationError si falla.
-        try:
-            self.full_clean()
-        except Exception:
-            # No bloquear el flujo aquí; dejar que llamadas superiores manejen
-            # la excepción. Sin embargo, la mayoría de flujos del admin
-            # llamarán a save_model y gestionarán errores de formulario.
-            pass
+        # Sin full_clean() ni consultas aquí: la unicidad de numero_cotizacion la
+        # garantiza la restricción de la BD (y los formularios la validan antes),
+        # y el supervisor por defecto lo asigna `servicios.inferir_supervisores()`
+        # una vez que la asignación ya tiene empleados.
+        if not self._state.adding and not args and kwargs.get('update_fields') is None \
+                and not kwargs.get('force_insert'):
+            # Las columnas de avance y de búsqueda sólo las escriben las señales;
+            # una instancia cargada antes de marcar una actividad no debe pisarlas
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in CAMPOS_PROGRESO and f.name != 'texto_busqueda'
+            ]
         super().save(*args, **kwargs)
 
     def recompute_fecha_termino(self):
         """
         Recalcula y establece `fecha_termino` en base a las actividades completadas
         (usa la fecha máxima de `fecha_completada`) y a los días trabajados si existen.
-        Se llama cuando cambian actividades o días trabajados.
-        """
-        fechas = []
-        # Actividades completadas con fecha
-        for a in self.actividades.filter(completada=True):
-            try:
-                if a.fecha_completada:
-                    fechas.append(a.fecha_completada.date())
-                else:
-                    # Si la actividad está marcada como completada pero no tiene
-                    # fecha_completada, usar la fecha de hoy como indicativo.
-                    from datetime import date
-                    fechas.append(date.today())
-            except Exception:
-                continue
-        # Días trabajados explícitos (si existen)
-        if hasattr(self, 'dias_trabajados'):
-            dias = list(self.dias_trabajados.values_list('fecha', flat=True))
-            for d in dias:
-                if d:
-                    fechas.append(d)
-
-        if fechas:
-            nueva = max(fechas)
-            if self.fecha_termino != nueva:
-                self.fecha_termino = nueva
-                # evitar bucle infinito: save sin recalcular otra vez
-                super(Asignacion, self).save(update_fields=['fecha_termino'])
-        else:
-            if self.fecha_termino is not None:
-                self.fecha_termino = None
-                super(Asignacion, self).save(update_fields=['fecha_termino'])
-
-    def clean(self):
-        """
-        Validaciones del modelo Asignacion. Asegura que el campo
-        `numero_cotizacion`, si está presente, sea único entre asignaciones.
+        Las señales no lo llaman directamente sino vía `programar_fecha_termino`.
         """
-        from django.core.exceptions import ValidationError
-        super().clean()
-        if self.numero_cotizacion not in (None, ''):
-            qs = Asignacion.objects.filter(numero_cotizacion=self.numero_cotizacion)
-            if self.pk:
-                qs = qs.exclude(pk=self.pk)
-            if qs.exists():
-                raise ValidationError({'numero_cotizacion': 'Ya existe una asignación con ese No. cotización.'})
+        cambios = recalcular_fecha_termino([self.pk])
+        if self.pk in cambios:
+            self.fecha_termino = cambios[self.pk]
 
 
 class HistorialSupervisorAsignacion(models.Model):
@@ -306,45 +282,220 @@ class AsignacionDiaTrabajado(models.Model):
         return f"{self.asignacion} - {self.fecha.isoformat()}"
 
 
+class ReporteAsignaciones(models.Model):
+    """PDF de asignaciones de un rango de fechas generado en segundo plano."""
+    ESTADO_CHOICES = (
+        ('pendiente', 'Pendiente'),
+        ('generando', 'Generando'),
+        ('listo', 'Listo'),
+        ('error', 'Error'),
+    )
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                related_name='reportes_asignaciones', verbose_name='Solicitado por')
+    desde = models.DateField(verbose_name='Desde')
+    hasta = models.DateField(verbose_name='Hasta')
+    empresa = models.ForeignKey(Empresa, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Empresa')
+    supervisor = models.ForeignKey(Empleado, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='+', verbose_name='Supervisor')
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='pendiente', verbose_name='Estado')
+    archivo = models.FileField(upload_to='asignaciones/reportes/', blank=True, verbose_name='Archivo')
+    total_asignaciones = models.PositiveIntegerField(default=0, verbose_name='Asignaciones')
+    error = models.TextField(blank=True, verbose_name='Error')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de finalización')
+
+    class Meta:
+        verbose_name = 'Reporte de asignaciones'
+        verbose_name_plural = 'Reportes de asignaciones'
+        ordering = ['-fecha_creacion']
+
+    def __str__(self):
+        return f"Asignaciones {self.desde:%d/%m/%Y} - {self.hasta:%d/%m/%Y} ({self.get_estado_display()})"
+
+    def nombre_archivo(self):
+        return f"asignaciones_{self.desde:%Y%m%d}_{self.hasta:%Y%m%d}.pdf"
+
+
+def recalcular_progreso(asignacion_ids, guardar=True):
+    """Recalcula las columnas de avance de las asignaciones indicadas.
+
+    Un agregado condicional (with_progress) y un bulk_update sólo de las filas
+    desajustadas. Devuelve el número de asignaciones desajustadas (con
+    `guardar=False` sólo las cuenta).
+    """
+    asignacion_ids = [pk for pk in set(asignacion_ids) if pk]
+    if not asignacion_ids:
+        return 0
+    a_corregir = []
+    filas = (Asignacion.objects
+             .filter(pk__in=asignacion_ids)
+             .with_progress()
+             .order_by()
+             .values('pk', *CAMPOS_PROGRESO, *CAMPOS_PROGRESO.values()))
+    for fila in filas:
+        valores = {campo: fila[anotacion] for campo, anotacion in CAMPOS_PROGRESO.items()}
+        if any(fila[campo] != valor for campo, valor in valores.items()):
+            a_corregir.append(Asignacion(pk=fila['pk'], **valores))
+    if guardar:
+        Asignacion.objects.bulk_update(a_corregir, list(CAMPOS_PROGRESO))
+    return len(a_corregir)
+
+
+def _aporte_progreso(completada, porcentaje, dias):
+    """Lo que una actividad suma a cada columna de avance de su asignación."""
+    return {
+        'porcentaje_completado': porcentaje if completada else 0,
+        'actividades_total': 1,
+        'actividades_completadas': 1 if completada else 0,
+        'tiempo_estimado_pendiente': 0 if completada else dias,
+        'tiempo_estimado_completado': dias if completada else 0,
+    }
+
+
+def ajustar_progreso(asignacion_id, deltas, asignacion=None):
+    """Aplica `deltas` ({columna: incremento}) con un UPDATE atómico (F()).
+
+    Si se pasa la instancia en memoria de la asignación se actualiza también,
+    para que quien la tenga cargada vea el nuevo avance sin volver a consultar.
+    """
+    deltas = {campo: delta for campo, delta in deltas.items() if delta}
+    if not asignacion_id or not deltas:
+        return
+    # Greatest: si las columnas se desajustaron (p.ej. un update() masivo sin
+    # señales) no violar el CHECK de los PositiveIntegerField; el comando de
+    # reparación las corrige
+    Asignacion.objects.filter(pk=asignacion_id).update(
+        **{campo: Greatest(models.F(campo) + delta, 0) for campo, delta in deltas.items()}
+    )
+    if asignacion is not None and asignacion.pk == asignacion_id:
+        for campo, delta in deltas.items():
+            setattr(asignacion, campo, max(getattr(asignacion, campo) + delta, 0))
+
+
 # Señales para recalcular fecha_termino cuando cambian actividades o días trabajados
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
 
 
+@receiver(post_init, sender=ActividadAsignada)
+def actividad_post_init(sender, instance, **kwargs):
+    # Estado cargado de la BD, para calcular el delta de avance al guardar
+    d = instance.__dict__
+    instance._progreso_original = (
+        d.get('asignacion_id'), d.get('completada'), d.get('porcentaje'), d.get('tiempo_estimado_dias')
+    )
+
+
+def _asignacion_en_memoria(instance):
+    return instance.asignacion if ActividadAsignada.asignacion.is_cached(instance) else None
+
+
+@receiver(post_save, sender=ActividadAsignada)
+def actividad_saved_actualizar_progreso(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    nuevo = _aporte_progreso(instance.completada, instance.porcentaje, instance.tiempo_estimado_dias)
+    asignacion = _asignacion_en_memoria(instance)
+    original = getattr(instance, '_progreso_original', (None,) * 4)
+    if created:
+        ajustar_progreso(instance.asignacion_id, nuevo, asignacion)
+    elif None in original:
+        # Instancia cargada con only()/defer(); no se conoce el estado previo
+        recalcular_progreso([instance.asignacion_id, original[0]])
+    else:
+        anterior = _aporte_progreso(*original[1:])
+        if original[0] != instance.asignacion_id:
+            ajustar_progreso(original[0], {c: -v for c, v in anterior.items()})
+            ajustar_progreso(instance.asignacion_id, nuevo, asignacion)
+        else:
+            ajustar_progreso(instance.asignacion_id,
+                             {c: nuevo[c] - anterior[c] for c in nuevo}, asignacion)
+    actividad_post_init(sender, instance)
+
+
+@receiver(post_delete, sender=ActividadAsignada)
+def actividad_deleted_actualizar_progreso(sender, instance, **kwargs):
+    # QuerySet.delete() y los borrados en cascada también envían post_delete por objeto
+    original = getattr(instance, '_progreso_original', (None,) * 4)
+    if None in original:
+        original = (instance.asignacion_id, instance.completada, instance.porcentaje, instance.tiempo_estimado_dias)
+    anterior = _aporte_progreso(*original[1:])
+    ajustar_progreso(original[0], {c: -v for c, v in anterior.items()}, _asignacion_en_memoria(instance))
+
+
+def recalcular_fecha_termino(asignacion_ids):
+    """Recalcula `fecha_termino` de varias asignaciones con una consulta y un bulk_update.
+
+    La fecha es la mayor entre la última actividad completada (hoy si alguna
+    completada no tiene fecha) y el último día trabajado; None si no hay
+    ninguna. Devuelve {pk: nueva_fecha} de las asignaciones que cambiaron.
+    """
+    asignacion_ids = [pk for pk in set(asignacion_ids) if pk]
+    if not asignacion_ids:
+        return {}
+    completadas = (ActividadAsignada.objects
+                   .filter(asignacion=models.OuterRef('pk'), completada=True)
+                   .order_by()
+                   .values('asignacion'))
+    dias = (AsignacionDiaTrabajado.objects
+            .filter(asignacion=models.OuterRef('pk'))
+            .order_by()
+            .values('asignacion'))
+    filas = (Asignacion.objects
+             .filter(pk__in=asignacion_ids)
+             .annotate(
+                 # Fecha (UTC) de la última actividad completada, como datetime.date()
+                 ultima_actividad=models.Subquery(completadas.annotate(
+                     ultima=models.Max(TruncDate('fecha_completada', tzinfo=dt_timezone.utc))
+                 ).values('ultima')),
+                 actividad_sin_fecha=models.Exists(completadas.filter(fecha_completada__isnull=True)),
+                 ultimo_dia=models.Subquery(dias.annotate(ultimo=models.Max('fecha')).values('ultimo')),
+             )
+             .values_list('pk', 'fecha_termino', 'ultima_actividad', 'actividad_sin_fecha', 'ultimo_dia'))
+    cambios = {}
+    for pk, actual, ultima_actividad, actividad_sin_fecha, ultimo_dia in filas:
+        # Actividad marcada como completada sin fecha_completada: hoy como indicativo
+        fechas = [f for f in (ultima_actividad, ultimo_dia, date.today() if actividad_sin_fecha else None) if f]
+        nueva = max(fechas) if fechas else None
+        if nueva != actual:
+            cambios[pk] = nueva
+    # bulk_update no envía post_save, así que no vuelve a disparar el recálculo
+    Asignacion.objects.bulk_update(
+        [Asignacion(pk=pk, fecha_termino=fecha) for pk, fecha in cambios.items()], ['fecha_termino']
+    )
+    return cambios
+
+
+_programar_fechas_termino = agrupar_al_commit(recalcular_fecha_termino)
+
+
+def programar_fecha_termino(asignacion_id):
+    """Difiere el recálculo de `fecha_termino` al commit de la transacción.
+
+    Guardar N actividades y M días trabajados en una petición recalcula cada
+    asignación una vez (ver soma.al_commit).
+    """
+    _programar_fechas_termino([asignacion_id])
+
+
 @receiver(post_save, sender=ActividadAsignada)
 def actividad_saved_recompute_fecha_termino(sender, instance, **kwargs):
-    try:
-        asign = instance.asignacion
-        asign.recompute_fecha_termino()
-    except Exception:
-        pass
+    programar_fecha_termino(instance.asignacion_id)
 
 
 @receiver(post_delete, sender=ActividadAsignada)
 def actividad_deleted_recompute_fecha_termino(sender, instance, **kwargs):
-    try:
-        asign = instance.asignacion
-        asign.recompute_fecha_termino()
-    except Exception:
-        pass
+    programar_fecha_termino(instance.asignacion_id)
 
 
 @receiver(post_save, sender=AsignacionDiaTrabajado)
 def dia_trabajado_saved_recompute(sender, instance, **kwargs):
-    try:
-        asign = instance.asignacion
-        asign.recompute_fecha_termino()
-    except Exception:
-        pass
+    programar_fecha_termino(instance.asignacion_id)
 
 
 @receiver(post_delete, sender=AsignacionDiaTrabajado)
 def dia_trabajado_deleted_recompute(sender, instance, **kwargs):
-    try:
-        asign = instance.asignacion
-        asign.recompute_fecha_termino()
-    except Exception:
-        pass
+    programar_fecha_termino(instance.asignacion_id)
 
 
 @receiver(post_save, sender=Asignacion)
@@ -353,8 +504,5 @@ def asignacion_saved_recompute_on_complete(sender, instance, created, **kwargs):
     Si la asignación ha sido marcada como completada, recalcular la fecha de término.
     También útil si se edita desde el admin para forzar el cálculo.
     """
-    try:
-        if instance.completada:
-            instance.recompute_fecha_termino()
-    except Exception:
-        pass
+    if instance.completada:
+        programar_fecha_termino(instance.pk)
@@ -0,0 +1,269 @@
+"""
+Reporte PDF de asignaciones por rango de fechas.
+
+`construir_pdf()` genera el documento en un solo recorrido de asignaciones ya
+precargadas (empresa, supervisor y empleados con su usuario). El logo y el
+membrete se buscan con `staticfiles.finders` una sola vez por proceso (sólo
+la ruta; cada documento arma sus propios flowables).
+
+Los rangos grandes no se generan dentro de la petición: se registra un
+`ReporteAsignaciones` y un hilo de tareas (`soma.tareas`) lo construye, guarda
+el archivo y avisa al usuario con una notificación para descargarlo. Los que
+se quedan a medias por un reinicio los retoma `recuperar_reportes_asignaciones`.
+"""
+import functools
+import logging
+import os
+from io import BytesIO
+
+from django.contrib.staticfiles import finders
+from django.core.files.base import ContentFile
+from django.db import models
+from django.urls import reverse
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from apps.recursos_humanos.models import Empleado
+from soma.tareas import en_segundo_plano
+from .models import Asignacion, ReporteAsignaciones
+
+logger = logging.getLogger(__name__)
+
+# A partir de cuántas asignaciones el reporte se genera en segundo plano
+MAX_ASIGNACIONES_SINCRONO = 200
+
+BANNER_CANDIDATOS = (
+    'images/membrete_header.png',
+    'images/membrete.png',
+    'img/membrete.png',
+    'images/header.png',
+)
+LOGO_CANDIDATOS = ('images/logo.png', 'images/logo_soma.png', 'img/logo.png', 'img/logo_soma.png')
+
+
+@functools.lru_cache(maxsize=None)
+def _ruta_estatica(candidatos):
+    """Ruta de la primera imagen estática que exista (o None); se resuelve una vez por proceso."""
+    for cand in candidatos:
+        ruta = finders.find(cand)
+        if ruta and os.path.exists(ruta):
+            return ruta
+    return None
+
+
+def _imagen_estatica(candidatos, ancho, alto):
+    """Flowable nuevo de la imagen en cada llamada.
+
+    Sólo se cachea la ruta: al dibujarse, el flowable guarda el canvas y el
+    frame del documento, así que no puede compartirse entre construcciones
+    (hilos de fondo y exportación síncrona a la vez).
+    """
+    ruta = _ruta_estatica(candidatos)
+    if not ruta:
+        return None
+    try:
+        return Image(ruta, width=ancho, height=alto)
+    except Exception as e:
+        logger.warning('No se pudo cargar la imagen %s: %s', ruta, e)
+        return None
+
+
+def banner():
+    return _imagen_estatica(BANNER_CANDIDATOS, 7.6 * inch, 1 * inch)
+
+
+def logo():
+    return _imagen_estatica(LOGO_CANDIDATOS, 1.2 * inch, 0.9 * inch)
+
+
+def filtrar_asignaciones(desde, hasta, empresa_id=None, supervisor_id=None):
+    """Asignaciones del rango con todo lo que el reporte lee por fila ya precargado."""
+    qs = (Asignacion.objects
+          .filter(fecha__range=(desde, hasta))
+          .select_related('empresa', 'supervisor__usuario')
+          .prefetch_related(models.Prefetch('empleados', queryset=Empleado.objects.select_related('usuario')))
+          .order_by('fecha', 'empresa__nombre', 'id'))
+    if empresa_id:
+        qs = qs.filter(empresa_id=empresa_id)
+    if supervisor_id:
+        qs = qs.filter(supervisor_id=supervisor_id)
+    return qs
+
+
+def titulo_rango(desde, hasta):
+    if desde == hasta:
+        return desde.strftime('%d/%m/%Y')
+    return f"{desde.strftime('%d/%m/%Y')} al {hasta.strftime('%d/%m/%Y')}"
+
+
+def construir_pdf(destino, asignaciones, desde, hasta, filtros=''):
+    """Escribe en `destino` (archivo o respuesta) el PDF de las asignaciones dadas."""
+    doc = SimpleDocTemplate(destino, pagesize=A4, topMargin=0.5*inch)
+    styles = getSampleStyleSheet()
+    story = []
+
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=15,
+        spaceBefore=5,
+        textColor=colors.HexColor('#1e3a8a'),  # Azul marino igual que el header
+        alignment=1,  # Centro
+        fontName='Helvetica-Bold'
+    )
+    subtitulo = 'Asignaciones de Hoy' if desde == hasta == timezone.localdate() else 'Asignaciones'
+    titulo_principal = Paragraph(
+        f"Servicios Industriales SOMA<br/><font color='#F97316'>{subtitulo}</font>", title_style
+    )
+    # Metadata del PDF (título que aparece en la pestaña)
+    pdf_title = f"Asignaciones {titulo_rango(desde, hasta)}"
+
+    def _on_first_page(canvas, doc_obj):
+        try:
+            canvas.setTitle(pdf_title)
+            canvas.setAuthor('Servicios Industriales SOMA')
+        except Exception:
+            pass
+
+    imagen_banner = banner()
+    if imagen_banner:
+        story.append(imagen_banner)
+        story.append(Spacer(1, 6))
+
+    # Header: logo (izquierda) + título (centrado) + celda vacía simétrica para centrar perfectamente
+    imagen_logo = logo()
+    if imagen_logo:
+        header_table = Table([[imagen_logo, titulo_principal, '']], colWidths=[1.2*inch, 5.2*inch, 1.2*inch])
+        header_table.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+        ]))
+    else:
+        header_table = Table([[titulo_principal]], colWidths=[7.6*inch])
+        header_table.setStyle(TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+    story.append(header_table)
+
+    story.append(Paragraph(f"Fecha: {titulo_rango(desde, hasta)}", styles['Normal']))
+    if filtros:
+        story.append(Paragraph(filtros, styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    varios_dias = desde != hasta
+    encabezado = ['Empresa', 'Supervisor', 'Empleados', 'Detalles']
+    col_widths = [1.8*inch, 1.5*inch, 1.8*inch, 2.4*inch]
+    if varios_dias:
+        encabezado = ['Fecha'] + encabezado
+        col_widths = [0.8*inch, 1.5*inch, 1.4*inch, 1.6*inch, 2.3*inch]
+    table_data = [encabezado]
+
+    # Un solo recorrido: los empleados vienen del prefetch (sin count() ni consultas por fila)
+    for asignacion in asignaciones:
+        supervisor = asignacion.supervisor.nombre_completo if asignacion.supervisor else 'Sin asignar'
+        nombres = [e.nombre_completo for e in asignacion.empleados.all()]
+        if not nombres:
+            empleados = "Sin empleados asignados"
+        else:
+            empleados = f"({len(nombres)}) " + '\n'.join(nombres)
+        detalles = (asignacion.detalles[:150] + '...') if len(asignacion.detalles) > 150 else asignacion.detalles
+        fila = [asignacion.empresa.nombre, supervisor, empleados, detalles]
+        if varios_dias:
+            fila = [asignacion.fecha.strftime('%d/%m/%Y')] + fila
+        table_data.append(fila)
+
+    if len(table_data) > 1:
+        main_table = Table(table_data, colWidths=col_widths, repeatRows=1)
+        main_table.setStyle(TableStyle([
+            # Header
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#001a63")),  # Azul marino
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+
+            # Contenido (más compacto)
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 4),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+
+            # Bordes y colores alternos (ligeramente más finos)
+            ('GRID', (0, 0), (-1, -1), 0.4, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
+        ]))
+        story.append(main_table)
+    elif varios_dias:
+        story.append(Paragraph("No hay asignaciones en el periodo seleccionado.", styles['Normal']))
+    else:
+        story.append(Paragraph("No hay asignaciones programadas para hoy.", styles['Normal']))
+
+    # Footer simple
+    story.append(Spacer(1, 30))
+    footer_text = f"Reporte generado el {timezone.now().strftime('%d/%m/%Y %H:%M')} por Servicios Industriales SOMA"
+    story.append(Paragraph(footer_text, styles['Normal']))
+
+    # Generar el PDF (aplicar metadata en la primera página)
+    doc.build(story, onFirstPage=_on_first_page)
+
+
+def describir_filtros(empresa=None, supervisor=None):
+    partes = []
+    if empresa:
+        partes.append(f'Empresa: {empresa.nombre}')
+    if supervisor:
+        partes.append(f'Supervisor: {supervisor.nombre_completo}')
+    return ' · '.join(partes)
+
+
+def generar_reporte(reporte_id):
+    """Construye y guarda el PDF de un ReporteAsignaciones y avisa a quien lo pidió."""
+    from apps.notificaciones.servicios import notificar
+
+    reporte = (ReporteAsignaciones.objects
+               .select_related('empresa', 'supervisor__usuario')
+               .get(pk=reporte_id))
+    reporte.estado = 'generando'
+    reporte.save(update_fields=['estado'])
+    try:
+        asignaciones = list(filtrar_asignaciones(reporte.desde, reporte.hasta,
+                                                 reporte.empresa_id, reporte.supervisor_id))
+        contenido = BytesIO()
+        construir_pdf(contenido, asignaciones, reporte.desde, reporte.hasta,
+                      describir_filtros(reporte.empresa, reporte.supervisor))
+        reporte.archivo.save(reporte.nombre_archivo(), ContentFile(contenido.getvalue()), save=False)
+        reporte.total_asignaciones = len(asignaciones)
+        reporte.estado = 'listo'
+    except Exception as e:
+        logger.exception('Error generando el reporte de asignaciones %s', reporte_id)
+        reporte.estado = 'error'
+        reporte.error = str(e)
+    reporte.fecha_fin = timezone.now()
+    reporte.save(update_fields=['archivo', 'total_asignaciones', 'estado', 'error', 'fecha_fin'])
+
+    if reporte.estado == 'listo':
+        notificar(reporte.usuario_id, '📄 Reporte de asignaciones listo',
+                  f'El PDF de asignaciones del {titulo_rango(reporte.desde, reporte.hasta)} '
+                  f'({reporte.total_asignaciones} asignaciones) está listo para descargar.',
+                  tipo='success', url=reverse('asignaciones:descargar_reporte_pdf', args=[reporte.pk]))
+    else:
+        notificar(reporte.usuario_id, '❌ Error en el reporte de asignaciones',
+                  f'No se pudo generar el PDF del {titulo_rango(reporte.desde, reporte.hasta)}: {reporte.error}',
+                  tipo='danger', url=reverse('asignaciones:reportes_pdf'))
+
+
+def encolar_reporte(reporte):
+    """Genera el reporte en el hilo de tareas una vez confirmada la transacción."""
+    en_segundo_plano(generar_reporte, reporte.pk)
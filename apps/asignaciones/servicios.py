@@ -0,0 +1,330 @@
+"""
+Consultas compartidas de asignaciones.
+
+`trabajo_del_dia()` arma las listas de asignaciones de la página de inicio y
+del perfil ("mi trabajo de hoy") con un número fijo de consultas.
+
+Los conteos por estado (completadas / en proceso / programadas) del listado
+"todas" se calculan con un solo agregado condicional sobre la columna
+desnormalizada `porcentaje_completado` y se guardan en cache; se invalidan
+cuando cambia una actividad o se crea/borra una asignación.
+
+`inferir_supervisores()` asigna el supervisor por defecto (jefe directo del
+primer empleado o, si no tiene, el empleado activo más antiguo del puesto
+superior) a un lote de asignaciones con consultas fijas; `crear_en_lote()` es
+la vía rápida de alta para importaciones.
+
+`opciones_empleados()` es la lista de empleados activos para los selects de
+asignaciones (cache entre peticiones) y `buscar_empleados()` la filtra para el
+autocompletado JSON.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from apps.recursos_humanos.models import Empleado
+from soma.cache_version import bump_version, get_version
+from .busqueda import normalizar, programar_busqueda
+from .models import ActividadAsignada, Asignacion
+
+# Estado del listado -> condición sobre el avance desnormalizado
+ESTADOS = {
+    'completadas': models.Q(porcentaje_completado__gte=100),
+    # Al menos una actividad completada pero no 100%
+    'en_proceso': models.Q(porcentaje_completado__gt=0, porcentaje_completado__lt=100),
+    'programadas': models.Q(porcentaje_completado__lte=0),
+}
+CONTEOS_TIMEOUT = 60 * 60
+# Máximo de asignaciones supervisadas de días anteriores sin terminar
+LIMITE_PENDIENTES = 5
+# Asignaciones recientes que se muestran cuando no hay trabajo para hoy
+LIMITE_RECIENTES = 5
+_VERSION_KEY = 'asignaciones:conteos:ver'
+_EMPLEADOS_VERSION_KEY = 'asignaciones:empleados:ver'
+OPCIONES_EMPLEADOS_TIMEOUT = 60 * 60
+# Resultados por página del autocompletado de empleados
+LIMITE_AUTOCOMPLETADO = 20
+
+
+def invalidar_conteos():
+    bump_version(_VERSION_KEY)
+
+
+def invalidar_opciones_empleados():
+    bump_version(_EMPLEADOS_VERSION_KEY)
+
+
+def conteos_por_estado():
+    """{'completadas': n, 'en_proceso': n, 'programadas': n} en una consulta (COUNT ... FILTER)."""
+    key = f'asignaciones:conteos:{get_version(_VERSION_KEY)}'
+    conteos = cache.get(key)
+    if conteos is None:
+        conteos = Asignacion.objects.aggregate(
+            **{estado: models.Count('pk', filter=condicion) for estado, condicion in ESTADOS.items()}
+        )
+        cache.set(key, conteos, CONTEOS_TIMEOUT)
+    return conteos
+
+
+def opciones_empleados():
+    """[(pk, etiqueta, texto normalizado)] de los empleados activos, en cache entre peticiones.
+
+    Una consulta con el usuario unido en lugar de un `__str__` con consulta por
+    opción; lo comparten todos los formularios del formset y el autocompletado.
+    """
+    key = f'asignaciones:empleados:{get_version(_EMPLEADOS_VERSION_KEY)}'
+    opciones = cache.get(key)
+    if opciones is None:
+        opciones = [
+            (e.pk, str(e), normalizar(str(e)))
+            for e in (Empleado.objects.filter(activo=True)
+                      .select_related('usuario')
+                      .only('numero_empleado', 'usuario', 'usuario__first_name', 'usuario__last_name')
+                      .order_by('numero_empleado'))
+        ]
+        cache.set(key, opciones, OPCIONES_EMPLEADOS_TIMEOUT)
+    return opciones
+
+
+def buscar_empleados(termino='', excluir=(), pagina=1, limite=LIMITE_AUTOCOMPLETADO):
+    """Filtra en memoria las opciones en cache; devuelve ([(pk, etiqueta)], hay_mas)."""
+    partes = normalizar(termino).split()
+    excluir = {int(pk) for pk in excluir if str(pk).isdigit()}
+    encontrados = [
+        (pk, etiqueta) for pk, etiqueta, texto in opciones_empleados()
+        if pk not in excluir and all(p in texto for p in partes)
+    ]
+    inicio = (max(pagina, 1) - 1) * limite
+    return encontrados[inicio:inicio + limite], len(encontrados) > inicio + limite
+
+
+def _prefetch_empleados(asignaciones):
+    # Una sola consulta para los empleados (con su usuario) de todas las listas
+    models.prefetch_related_objects(
+        asignaciones, models.Prefetch('empleados', queryset=Empleado.objects.select_related('usuario'))
+    )
+    return asignaciones
+
+
+def trabajo_del_dia(empleado=None, es_admin=False, hoy=None):
+    """Listas de asignaciones de "mi trabajo de hoy".
+
+    - Administrador (`es_admin`): todas las asignaciones de hoy (2 consultas).
+    - Empleado: las de hoy donde participa o supervisa, seguidas de las que
+      supervisa de días anteriores aún por debajo del 100%; si no hay
+      ninguna, las más recientes. A lo sumo 4 consultas sin importar el
+      volumen de datos.
+
+    Devuelve un dict con `asignaciones_hoy`, `asignaciones_supervisadas_hoy`,
+    `asignaciones_pendientes` y `asignaciones_recientes`, listo para el contexto.
+    """
+    hoy = hoy or timezone.localdate()
+    trabajo = {
+        'asignaciones_hoy': [],
+        'asignaciones_supervisadas_hoy': [],
+        'asignaciones_pendientes': [],
+        'asignaciones_recientes': [],
+    }
+    if es_admin:
+        trabajo['asignaciones_hoy'] = _prefetch_empleados(list(
+            Asignacion.objects
+            .filter(fecha=hoy)
+            .select_related('empresa', 'supervisor__usuario')
+            .order_by('empresa__nombre', 'id')
+        ))
+        return trabajo
+    if not empleado:
+        return trabajo
+
+    # Participación como empleado en subconsulta: sin JOIN a `empleados` no hay
+    # filas duplicadas y el OR con el supervisor resuelve ambas listas a la vez
+    como_empleado = Asignacion.empleados.through.objects.filter(
+        asignacion_id=models.OuterRef('pk'), empleado_id=empleado.pk
+    )
+    mias = (Asignacion.objects
+            .select_related('empresa', 'supervisor__usuario')
+            .filter(models.Exists(como_empleado) | models.Q(supervisor=empleado))
+            .order_by('-fecha', '-fecha_creacion'))
+
+    # Primero aquellas en las que participa, luego las que sólo supervisa
+    de_hoy = list(mias.filter(fecha=hoy)
+                  .annotate(es_empleado=models.Exists(como_empleado))
+                  .order_by('-es_empleado', '-fecha_creacion'))
+    pendientes = list(mias.filter(supervisor=empleado, fecha__lt=hoy, porcentaje_completado__lt=100)
+                      [:LIMITE_PENDIENTES])
+    trabajo['asignaciones_supervisadas_hoy'] = [a for a in de_hoy if a.supervisor_id == empleado.pk]
+    trabajo['asignaciones_pendientes'] = pendientes
+    trabajo['asignaciones_hoy'] = de_hoy + pendientes
+    if not trabajo['asignaciones_hoy']:
+        trabajo['asignaciones_recientes'] = list(mias[:LIMITE_RECIENTES])
+    _prefetch_empleados(trabajo['asignaciones_hoy'] + trabajo['asignaciones_recientes'])
+    return trabajo
+
+
+def inferir_supervisores(asignaciones):
+    """Asigna supervisor a las asignaciones guardadas que no tienen uno.
+
+    El candidato se toma del primer empleado de cada asignación (por número de
+    empleado, como `asignacion.empleados.first()`): su jefe directo o, si no tiene, el empleado activo con mayor
+    antigüedad en el puesto superior. Son a lo más tres consultas para todo el
+    lote. Devuelve cuántas asignaciones se actualizaron.
+    """
+    sin_supervisor = {a.pk: a for a in asignaciones if a.pk and a.supervisor_id is None}
+    if not sin_supervisor:
+        return 0
+
+    primeros = {}
+    filas = (Asignacion.empleados.through.objects
+             .filter(asignacion_id__in=sin_supervisor)
+             .order_by('asignacion_id', 'empleado__numero_empleado')
+             .values_list('asignacion_id', 'empleado__jefe_directo_id', 'empleado__puesto__superior_id'))
+    for asignacion_id, jefe_id, puesto_superior_id in filas:
+        primeros.setdefault(asignacion_id, (jefe_id, puesto_superior_id))
+
+    por_puesto = {}
+    puestos = {p for jefe, p in primeros.values() if not jefe and p}
+    if puestos:
+        candidatos = (Empleado.objects
+                      .filter(puesto_id__in=puestos, activo=True)
+                      .order_by('fecha_ingreso', 'pk')
+                      .values_list('puesto_id', 'pk'))
+        for puesto_id, empleado_id in candidatos:
+            por_puesto.setdefault(puesto_id, empleado_id)
+
+    cambios = []
+    for asignacion_id, (jefe_id, puesto_superior_id) in primeros.items():
+        supervisor_id = jefe_id or por_puesto.get(puesto_superior_id)
+        if supervisor_id:
+            asignacion = sin_supervisor[asignacion_id]
+            asignacion.supervisor_id = supervisor_id
+            cambios.append(asignacion)
+    if cambios:
+        Asignacion.objects.bulk_update(cambios, ['supervisor'])
+        # bulk_update no emite post_save: el nombre del supervisor va en la búsqueda
+        programar_busqueda(a.pk for a in cambios)
+    return len(cambios)
+
+
+def crear_en_lote(filas, inferir_supervisor=True, batch_size=500):
+    """Alta rápida para importaciones: `filas` es una lista de (Asignacion sin guardar, [empleado_id, ...]).
+
+    Usa bulk_create para las asignaciones y sus empleados (sin save() ni señales
+    por fila) e infiere los supervisores faltantes en lote. Las asignaciones
+    nuevas no tienen actividades, así que sus columnas de avance quedan en 0 sin
+    recalcular nada. Devuelve las asignaciones creadas.
+    """
+    with transaction.atomic():
+        asignaciones = Asignacion.objects.bulk_create([a for a, _ in filas], batch_size=batch_size)
+        Through = Asignacion.empleados.through
+        Through.objects.bulk_create(
+            [Through(asignacion_id=a.pk, empleado_id=empleado_id)
+             for a, (_, empleados) in zip(asignaciones, filas) for empleado_id in set(empleados)],
+            batch_size=batch_size,
+        )
+        if inferir_supervisor:
+            inferir_supervisores(asignaciones)
+        programar_busqueda(a.pk for a in asignaciones)
+        transaction.on_commit(invalidar_conteos)
+    return asignaciones
+
+
+def _dias_texto(dias):
+    return f"{dias} día{'s' if dias != 1 else ''}"
+
+
+def notificar_actividad_completada(actividad_id, supervisor_id):
+    """Avisa a los administradores que el supervisor completó una actividad.
+
+    Corre como tarea en segundo plano (ver `soma.tareas.en_segundo_plano`):
+    lee la actividad con su asignación y empresa, las actividades de la asignación
+    y hasta tres empleados, y envía el aviso con un solo INSERT. Si la actividad
+    se desmarcó antes de que corra la tarea, no avisa.
+    """
+    from apps.notificaciones.servicios import notificar
+
+    actividad = (ActividadAsignada.objects
+                 .select_related('asignacion__empresa')
+                 .filter(pk=actividad_id, completada=True)
+                 .first())
+    if actividad is None:
+        return []
+    supervisor = Empleado.objects.select_related('usuario').get(pk=supervisor_id)
+    asignacion = actividad.asignacion
+    actividades = list(asignacion.actividades.all())
+    completadas = [a for a in actividades if a.completada]
+    pendientes = [a for a in actividades if not a.completada]
+
+    titulo = f"✅ Actividad completada por {supervisor.nombre_completo}"
+    lineas = []
+    lineas.append(f"🎯 ACTIVIDAD: {actividad.nombre} ({actividad.porcentaje}%)")
+    lineas.append("=" * 45)
+    lineas.append(f"📊 PROGRESO: {asignacion.porcentaje_completado}% ({len(completadas)}/{len(actividades)} completadas)")
+    lineas.append("")
+    lineas.append(f"👤 Supervisor: {supervisor.nombre_completo}")
+    lineas.append(f"🏢 Empresa: {asignacion.empresa.nombre}")
+    lineas.append(f"📅 Fecha: {asignacion.fecha.strftime('%d/%m/%Y')}")
+
+    # Actividades completadas (máximo 3)
+    if completadas:
+        lineas.append("")
+        lineas.append("✅ COMPLETADAS:")
+        for act in completadas[:3]:
+            lineas.append(f"   ✓ {act.nombre} ({act.porcentaje}% - {_dias_texto(act.tiempo_estimado_dias)})")
+        if len(completadas) > 3:
+            lineas.append(f"   ➕ ... y {len(completadas) - 3} mas")
+
+    # Actividades pendientes (máximo 3)
+    if pendientes:
+        lineas.append("")
+        lineas.append("⏳ PENDIENTES:")
+        for act in pendientes[:3]:
+            lineas.append(f"   ⭕ {act.nombre} ({act.porcentaje}% - {_dias_texto(act.tiempo_estimado_dias)})")
+        if len(pendientes) > 3:
+            lineas.append(f"   ➕ ... y {len(pendientes) - 3} mas")
+    else:
+        lineas.append("")
+        lineas.append("🎉 ¡ASIGNACION COMPLETADA AL 100%!")
+
+    # Empleados (máximo 2); el total sólo se cuenta si hay más
+    empleados = list(asignacion.empleados.select_related('usuario')[:3])
+    if empleados:
+        lineas.append("")
+        lineas.append("EQUIPO:")
+        for emp in empleados[:2]:
+            lineas.append(f"  - {emp.nombre_completo}")
+        if len(empleados) > 2:
+            lineas.append(f"  - ... y {asignacion.empleados.count() - 2} mas")
+
+    return notificar('staff', titulo, "\n".join(lineas), tipo='success')
+
+
+def _actividad_cambiada(sender, instance, **kwargs):
+    transaction.on_commit(invalidar_conteos)
+
+
+def _asignacion_cambiada(sender, instance, **kwargs):
+    # Sólo altas y bajas cambian los conteos; el avance lo mueven las actividades
+    if kwargs.get('created', True):
+        transaction.on_commit(invalidar_conteos)
+
+
+def _empleado_cambiado(sender, instance, **kwargs):
+    transaction.on_commit(invalidar_opciones_empleados)
+
+
+def _usuario_cambiado(sender, instance, created=False, update_fields=None, **kwargs):
+    # El login sólo guarda last_login; la etiqueta usa el nombre
+    if created or (update_fields is not None and not {'first_name', 'last_name'} & set(update_fields)):
+        return
+    transaction.on_commit(invalidar_opciones_empleados)
+
+
+post_save.connect(_actividad_cambiada, sender=ActividadAsignada, dispatch_uid='asignaciones_conteos_actividad_save')
+post_delete.connect(_actividad_cambiada, sender=ActividadAsignada, dispatch_uid='asignaciones_conteos_actividad_delete')
+post_save.connect(_asignacion_cambiada, sender=Asignacion, dispatch_uid='asignaciones_conteos_save')
+post_delete.connect(_asignacion_cambiada, sender=Asignacion, dispatch_uid='asignaciones_conteos_delete')
+post_save.connect(_empleado_cambiado, sender=Empleado, dispatch_uid='asignaciones_opciones_empleado_save')
+post_delete.connect(_empleado_cambiado, sender=Empleado, dispatch_uid='asignaciones_opciones_empleado_delete')
+post_save.connect(_usuario_cambiado, sender=get_user_model(), dispatch_uid='asignaciones_opciones_usuario_save')
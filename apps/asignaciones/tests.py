@@ -0,0 +1,413 @@
+import io
+import tempfile
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.empresas.models import Empresa
+from apps.notificaciones.models import Notificacion
+from apps.recursos_humanos.models import Empleado, Puesto
+from soma.cache_version import get_version
+from . import reportes, servicios
+from .models import CAMPOS_PROGRESO, ActividadAsignada, Asignacion, ReporteAsignaciones
+from .busqueda import buscar
+from .forms_custom import EmpleadoAsignacionFormSetFactory
+from .servicios import (LIMITE_PENDIENTES, conteos_por_estado, crear_en_lote, inferir_supervisores,
+                        trabajo_del_dia)
+
+User = get_user_model()
+
+
+class AsignacionesTestBase(TestCase):
+    def setUp(self):
+        self.hoy = date(2025, 3, 10)
+        self.puesto = Puesto.objects.create(nombre='Técnico', descripcion='Técnico',
+                                            salario_minimo=1000, salario_maximo=2000)
+        self.empresa = Empresa.objects.create(nombre='Cliente')
+        self.supervisor = self._empleado('sup')
+        self.companero = self._empleado('comp')
+
+    def _empleado(self, nombre):
+        n = Empleado.objects.count() + 1
+        usuario = User.objects.create_user(username=nombre, password='pass', first_name=nombre)
+        return Empleado.objects.create(
+            usuario=usuario, numero_empleado=f'T{n:03d}', curp=f'CURP{n:014d}', rfc=f'RFC{n:010d}',
+            fecha_nacimiento=date(1990, 1, 1), estado_civil='soltero', telefono_personal='1',
+            telefono_emergencia='1', contacto_emergencia='Contacto', direccion='Dirección',
+            puesto=self.puesto, fecha_ingreso=date(2020, 1, 1), salario_actual=1500,
+        )
+
+    def _asignacion(self, fecha, completada=False):
+        asignacion = Asignacion.objects.create(fecha=fecha, empresa=self.empresa,
+                                               supervisor=self.supervisor, detalles='Trabajo')
+        asignacion.empleados.add(self.companero, self._empleado(f'extra{Asignacion.objects.count()}'))
+        ActividadAsignada.objects.create(asignacion=asignacion, nombre='Actividad', porcentaje=100,
+                                         completada=completada)
+        return asignacion
+
+
+class ConProgresoTest(AsignacionesTestBase):
+    def test_avance_anotado_en_una_consulta(self):
+        primera = self._asignacion(self.hoy)
+        primera.actividades.create(nombre='Otra', porcentaje=30, tiempo_estimado_dias=2, completada=True)
+        segunda = self._asignacion(self.hoy)
+        sin_actividades = Asignacion.objects.create(fecha=self.hoy, empresa=self.empresa,
+                                                    supervisor=self.supervisor, detalles='Vacía')
+        with self.assertNumQueries(1):
+            filas = {a.pk: a for a in Asignacion.objects.with_progress()}
+        campos = ('progreso_total', 'progreso_completadas', 'progreso_porcentaje',
+                  'progreso_dias_pendientes', 'progreso_dias_completados')
+
+        def avance(pk):
+            return tuple(getattr(filas[pk], campo) for campo in campos)
+        self.assertEqual(avance(primera.pk), (2, 1, 30, 1, 2))
+        self.assertEqual(avance(segunda.pk), (1, 0, 0, 1, 0))
+        self.assertEqual(avance(sin_actividades.pk), (0, 0, 0, 0, 0))
+
+    def test_listados_no_consultan_por_fila(self):
+        self.client.force_login(self.supervisor.usuario)
+        url = reverse('asignaciones:todas')
+        self._asignacion(self.hoy)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as una:
+            self.client.get(url)
+        for _ in range(4):
+            self._asignacion(self.hoy)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as cinco:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(cinco.captured_queries), len(una.captured_queries))
+
+
+class ProgresoDesnormalizadoTest(AsignacionesTestBase):
+    def _columnas(self, asignacion):
+        asignacion = Asignacion.objects.get(pk=asignacion.pk)
+        return tuple(getattr(asignacion, campo) for campo in CAMPOS_PROGRESO)
+
+    def _real(self, asignacion):
+        asignacion = Asignacion.objects.with_progress().get(pk=asignacion.pk)
+        return tuple(getattr(asignacion, anotacion) for anotacion in CAMPOS_PROGRESO.values())
+
+    def test_senales_aplican_deltas(self):
+        asignacion = Asignacion.objects.create(fecha=self.hoy, empresa=self.empresa,
+                                               supervisor=self.supervisor, detalles='Trabajo')
+        copia_vieja = Asignacion.objects.get(pk=asignacion.pk)
+        primera = ActividadAsignada.objects.create(asignacion=asignacion, nombre='a', porcentaje=30,
+                                                   tiempo_estimado_dias=2, completada=True)
+        segunda = ActividadAsignada.objects.create(asignacion=asignacion, nombre='b', porcentaje=70,
+                                                   tiempo_estimado_dias=3)
+        self.assertEqual(self._columnas(asignacion), (30, 2, 1, 3, 2))
+        # Guardar una instancia cargada antes no pisa las columnas
+        copia_vieja.detalles = 'Otro'
+        copia_vieja.save()
+        self.assertEqual(self._columnas(asignacion), (30, 2, 1, 3, 2))
+
+        segunda = ActividadAsignada.objects.select_related('asignacion').get(pk=segunda.pk)
+        segunda.completada = True
+        segunda.save()
+        # La asignación en memoria también refleja el nuevo avance
+        self.assertEqual(segunda.asignacion.porcentaje_completado, 100)
+        self.assertEqual(self._columnas(asignacion), self._real(asignacion))
+
+        otra = Asignacion.objects.create(fecha=self.hoy, empresa=self.empresa, supervisor=self.supervisor)
+        primera.asignacion = otra
+        primera.save()
+        self.assertEqual(self._columnas(asignacion), self._real(asignacion))
+        self.assertEqual(self._columnas(otra), self._real(otra))
+
+        ActividadAsignada.objects.filter(pk=segunda.pk).delete()
+        self.assertEqual(self._columnas(asignacion), (0, 0, 0, 0, 0))
+
+    def test_comando_repara_columnas_desajustadas(self):
+        asignacion = self._asignacion(self.hoy, completada=True)
+        Asignacion.objects.filter(pk=asignacion.pk).update(porcentaje_completado=7, actividades_total=9)
+        salida = io.StringIO()
+        call_command('recalcular_progreso_asignaciones', '--dry-run', stdout=salida)
+        self.assertIn('corregidas: 1', salida.getvalue())
+        self.assertNotEqual(self._columnas(asignacion), self._real(asignacion))
+        call_command('recalcular_progreso_asignaciones', stdout=io.StringIO())
+        self.assertEqual(self._columnas(asignacion), self._real(asignacion))
+
+
+class ConteosPorEstadoTest(AsignacionesTestBase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_una_consulta_en_cache_hasta_que_cambia_una_asignacion(self):
+        self._asignacion(self.hoy, completada=True)
+        pendiente = self._asignacion(self.hoy)
+        Asignacion.objects.create(fecha=self.hoy, empresa=self.empresa, supervisor=self.supervisor)
+        with self.assertNumQueries(1):
+            self.assertEqual(conteos_por_estado(), {'completadas': 1, 'en_proceso': 0, 'programadas': 2})
+        with self.assertNumQueries(0):
+            conteos_por_estado()
+
+        version = get_version(servicios._VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            actividad = pendiente.actividades.get()
+            actividad.completada = True
+            actividad.save()
+        self.assertNotEqual(get_version(servicios._VERSION_KEY), version)
+        self.assertEqual(conteos_por_estado(), {'completadas': 2, 'en_proceso': 0, 'programadas': 1})
+
+        # Editar los datos de una asignación no mueve los conteos ni descarta el cache
+        version = get_version(servicios._VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            pendiente.detalles = 'Otro'
+            pendiente.save()
+        self.assertEqual(get_version(servicios._VERSION_KEY), version)
+
+    def test_listado_todas_usa_los_conteos(self):
+        self._asignacion(self.hoy, completada=True)
+        self.client.force_login(self.supervisor.usuario)
+        respuesta = self.client.get(reverse('asignaciones:todas'))
+        self.assertEqual((respuesta.context['total_completadas'], respuesta.context['total_en_proceso']), (1, 0))
+
+
+class TrabajoDelDiaTest(AsignacionesTestBase):
+    def _cargar(self, dias_anteriores):
+        for _ in range(2):
+            self._asignacion(self.hoy)
+        for dias in range(1, dias_anteriores + 1):
+            self._asignacion(self.hoy - timedelta(days=dias), completada=dias % 2 == 0)
+
+    def _consultas(self, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            trabajo = trabajo_del_dia(hoy=self.hoy, **kwargs)
+            # Lo que las plantillas leen por fila no debe disparar consultas
+            for a in trabajo['asignaciones_hoy'] + trabajo['asignaciones_recientes']:
+                [e.nombre_completo for e in a.empleados.all()]
+                a.empresa.nombre, a.supervisor.nombre_completo
+        return trabajo, len(ctx.captured_queries)
+
+    def test_consultas_constantes_para_supervisor(self):
+        self._cargar(dias_anteriores=2)
+        _, pocas = self._consultas(empleado=self.supervisor)
+        self._cargar(dias_anteriores=20)
+        trabajo, muchas = self._consultas(empleado=self.supervisor)
+        self.assertEqual(pocas, muchas)
+        self.assertLessEqual(muchas, 4)
+        self.assertEqual(len(trabajo['asignaciones_supervisadas_hoy']), 4)
+        self.assertEqual(len(trabajo['asignaciones_pendientes']), LIMITE_PENDIENTES)
+        self.assertTrue(all(a.porcentaje_completado < 100 for a in trabajo['asignaciones_pendientes']))
+
+    def test_consultas_constantes_para_empleado_y_admin(self):
+        self._cargar(dias_anteriores=1)
+        _, empleado_pocas = self._consultas(empleado=self.companero)
+        _, admin_pocas = self._consultas(es_admin=True)
+        self._cargar(dias_anteriores=10)
+        trabajo, empleado_muchas = self._consultas(empleado=self.companero)
+        _, admin_muchas = self._consultas(es_admin=True)
+        self.assertEqual(empleado_pocas, empleado_muchas)
+        self.assertEqual(admin_pocas, admin_muchas)
+        # Participa en las de hoy pero no supervisa nada
+        self.assertEqual(len(trabajo['asignaciones_hoy']), 4)
+        self.assertEqual(trabajo['asignaciones_pendientes'], [])
+
+    def test_recientes_sin_trabajo_hoy(self):
+        self._asignacion(self.hoy - timedelta(days=3), completada=True)
+        trabajo, _ = self._consultas(empleado=self.companero)
+        self.assertEqual(trabajo['asignaciones_hoy'], [])
+        self.assertEqual(len(trabajo['asignaciones_recientes']), 1)
+
+
+class FechaTerminoTest(AsignacionesTestBase):
+    def test_recalculo_una_vez_por_asignacion_al_commit(self):
+        asignacion = self._asignacion(self.hoy - timedelta(days=5))
+        with self.captureOnCommitCallbacks(execute=True):
+            for dias in range(3):
+                asignacion.dias_trabajados.create(fecha=self.hoy - timedelta(days=dias))
+            actividad = asignacion.actividades.create(nombre='Cierre', porcentaje=0)
+            actividad.completada = True
+            actividad.save()
+            # Nada se recalcula antes del commit
+            self.assertIsNone(Asignacion.objects.get(pk=asignacion.pk).fecha_termino)
+        asignacion.refresh_from_db()
+        self.assertEqual(asignacion.fecha_termino, max(self.hoy, date.today()))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            asignacion.dias_trabajados.all().delete()
+            asignacion.actividades.all().delete()
+        with CaptureQueriesContext(connection) as ctx:
+            for callback in callbacks:
+                callback()
+        # Una lectura agregada y una escritura para todos los cambios
+        self.assertEqual(len(ctx.captured_queries), 2)
+        asignacion.refresh_from_db()
+        self.assertIsNone(asignacion.fecha_termino)
+
+
+class SupervisorYCotizacionTest(AsignacionesTestBase):
+    def test_inferir_supervisores_en_lote(self):
+        jefe = self._empleado('jefe')
+        self.companero.jefe_directo = jefe
+        self.companero.save()
+        puesto_superior = Puesto.objects.create(nombre='Líder', descripcion='Líder',
+                                                salario_minimo=1000, salario_maximo=2000)
+        self.puesto.superior = puesto_superior
+        self.puesto.save()
+        lider = self._empleado('lider')
+        Empleado.objects.filter(pk=lider.pk).update(puesto=puesto_superior)
+
+        nuevas = crear_en_lote(
+            [(Asignacion(fecha=self.hoy, empresa=self.empresa, detalles='Con jefe'), [self.companero.pk]),
+             (Asignacion(fecha=self.hoy, empresa=self.empresa, detalles='Por puesto'), [self.supervisor.pk]),
+             (Asignacion(fecha=self.hoy, empresa=self.empresa, detalles='Sin empleados'), [])],
+            inferir_supervisor=False,
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(inferir_supervisores(nuevas), 2)
+        self.assertLessEqual(len(ctx.captured_queries), 3)
+        supervisores = dict(Asignacion.objects.filter(pk__in=[a.pk for a in nuevas])
+                            .values_list('detalles', 'supervisor_id'))
+        self.assertEqual(supervisores, {'Con jefe': jefe.pk, 'Por puesto': lider.pk, 'Sin empleados': None})
+
+    def test_numero_cotizacion_unico_si_existe(self):
+        Asignacion.objects.create(fecha=self.hoy, empresa=self.empresa, detalles='A')
+        Asignacion.objects.create(fecha=self.hoy, empresa=self.empresa, detalles='B')
+        Asignacion.objects.create(fecha=self.hoy, empresa=self.empresa, detalles='C', numero_cotizacion=10)
+        repetida = Asignacion(fecha=self.hoy, empresa=self.empresa, detalles='D', numero_cotizacion=10)
+        with self.assertRaises(ValidationError):
+            repetida.validate_constraints()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            repetida.save()
+
+
+class BusquedaTest(AsignacionesTestBase):
+    def _buscar(self, termino):
+        return set(buscar(Asignacion.objects.all(), termino).values_list('pk', flat=True))
+
+    def test_texto_se_mantiene_al_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            asignacion = Asignacion.objects.create(fecha=self.hoy, empresa=self.empresa, supervisor=self.supervisor,
+                                                   detalles='Mantenimiento de grúa', numero_cotizacion=4521)
+            asignacion.empleados.add(self.companero)
+        self.assertEqual(self._buscar('GRUA cliente'), {asignacion.pk})
+        self.assertEqual(self._buscar('4521 comp'), {asignacion.pk})
+        self.assertEqual(self._buscar('grúa otra'), set())
+
+        # Cambios en modelos relacionados actualizan el texto de sus asignaciones
+        with self.captureOnCommitCallbacks(execute=True):
+            self.empresa.nombre = 'Acería del Norte'
+            self.empresa.save()
+            self.companero.usuario.last_name = 'Pérez'
+            self.companero.usuario.save()
+        self.assertEqual(self._buscar('aceria perez'), {asignacion.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.companero.asignaciones.clear()
+        self.assertEqual(self._buscar('perez'), set())
+
+    def test_sin_cambio_de_nombre_no_se_recalcula(self):
+        def consultas_de_asignaciones(instancia):
+            with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+                instancia.save()
+            return [q for q in ctx.captured_queries if 'asignaciones_asignacion' in q['sql']]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Asignacion.objects.create(fecha=self.hoy, empresa=self.empresa, supervisor=self.supervisor)
+        # El nombre anterior sale de lo leído en from_db
+        empresa = Empresa.objects.get(pk=self.empresa.pk)
+        empresa.direccion = 'Otra dirección'
+        self.assertEqual(consultas_de_asignaciones(empresa), [])
+        empresa.nombre = 'Otra'
+        self.assertNotEqual(consultas_de_asignaciones(empresa), [])
+        usuario = User.objects.get(pk=self.companero.usuario_id)
+        usuario.email = 'otro@example.com'
+        self.assertEqual(consultas_de_asignaciones(usuario), [])
+
+
+class OpcionesEmpleadosTest(AsignacionesTestBase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.empleados = [self._empleado(f'emp{i}') for i in range(8)]
+
+    def test_formset_sin_consultas_por_opcion(self):
+        inicial = [{'empleado': e.pk} for e in self.empleados]
+        EmpleadoAsignacionFormSetFactory(extra=0)(initial=inicial, prefix='empleados').as_p()
+        with CaptureQueriesContext(connection) as ctx:
+            formset = EmpleadoAsignacionFormSetFactory(extra=0)(initial=inicial, prefix='empleados')
+            html = formset.as_p() + str(formset.empty_form['empleado'])
+        # Con la lista en cache no se consulta nada; cada select sólo trae su opción
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertIn(str(self.empleados[3]), html)
+        self.assertEqual(html.count('<option value="%d"' % self.empleados[3].pk), 1)
+
+    def test_autocompletado(self):
+        admin = User.objects.create_user(username='admin', password='pass', is_staff=True)
+        self.client.force_login(admin)
+        url = reverse('asignaciones:autocompletar_empleados')
+        datos = self.client.get(url, {'q': 'EMP', 'excluir': str(self.empleados[0].pk)}).json()
+        self.assertEqual(len(datos['results']), 7)
+        self.assertFalse(datos['more'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.empleados[1].usuario.first_name = 'Ñandú'
+            self.empleados[1].usuario.save()
+        datos = self.client.get(url, {'q': 'nandu'}).json()
+        self.assertEqual([r['id'] for r in datos['results']], [self.empleados[1].pk])
+
+
+class ActividadCompletadaTest(AsignacionesTestBase):
+    @override_settings(TAREAS_SEGUNDO_PLANO=False)
+    def test_aviso_despues_del_commit(self):
+        admin = User.objects.create_user(username='admin', password='pass', is_staff=True)
+        asignacion = self._asignacion(self.hoy)
+        actividad = asignacion.actividades.get()
+        self.client.force_login(self.supervisor.usuario)
+        url = reverse('asignaciones:marcar_actividad_completada', args=[actividad.pk])
+        with self.captureOnCommitCallbacks() as callbacks:
+            respuesta = self.client.post(url, '{"completada": true}', content_type='application/json')
+        self.assertEqual(respuesta.json()['porcentaje_asignacion'], 100)
+        # La respuesta no crea el aviso: queda para después del commit
+        self.assertFalse(Notificacion.objects.exists())
+        for callback in callbacks:
+            callback()
+        aviso = Notificacion.objects.get(usuario=admin)
+        self.assertIn('100% (1/1 completadas)', aviso.mensaje)
+        self.assertIn('ASIGNACION COMPLETADA', aviso.mensaje)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), TAREAS_SEGUNDO_PLANO=False)
+class ReporteAsignacionesTest(AsignacionesTestBase):
+    def _reporte(self, **extra):
+        self._asignacion(self.hoy)
+        return ReporteAsignaciones.objects.create(usuario=self.supervisor.usuario, desde=self.hoy,
+                                                  hasta=self.hoy, **extra)
+
+    def test_encolar_genera_al_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            reporte = self._reporte()
+            reportes.encolar_reporte(reporte)
+        reporte.refresh_from_db()
+        self.assertEqual((reporte.estado, reporte.total_asignaciones), ('listo', 1))
+        self.assertTrue(Notificacion.objects.filter(usuario=self.supervisor.usuario, tipo='success').exists())
+
+    def test_recuperar_reportes_inconclusos(self):
+        abandonado = self._reporte(estado='generando')
+        reciente = self._reporte()
+        ReporteAsignaciones.objects.filter(pk=abandonado.pk).update(
+            fecha_creacion=timezone.now() - timedelta(hours=1))
+        call_command('recuperar_reportes_asignaciones', '--minutos', '30', stdout=io.StringIO())
+        abandonado.refresh_from_db()
+        reciente.refresh_from_db()
+        self.assertEqual((abandonado.estado, reciente.estado), ('listo', 'pendiente'))
+
+    def test_recuperar_marcando_error(self):
+        abandonado = self._reporte()
+        ReporteAsignaciones.objects.filter(pk=abandonado.pk).update(
+            fecha_creacion=timezone.now() - timedelta(hours=1))
+        call_command('recuperar_reportes_asignaciones', '--marcar-error', stdout=io.StringIO())
+        abandonado.refresh_from_db()
+        self.assertEqual(abandonado.estado, 'error')
+        self.assertTrue(Notificacion.objects.filter(usuario=self.supervisor.usuario, tipo='danger').exists())
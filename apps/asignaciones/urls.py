@@ -13,4 +13,8 @@ urlpatterns = [
     path('supervisor/<int:pk>/', views.SupervisorAsignacionDetailView.as_view(), name='supervisor_detalle'),
     path('ajax/actividad/<int:actividad_id>/completar/', views.marcar_actividad_completada, name='marcar_actividad_completada'),
     path('admin/exportar-hoy-pdf/', views.exportar_asignaciones_hoy_pdf, name='exportar_hoy_pdf'),
+    path('admin/exportar-pdf/', views.exportar_asignaciones_pdf, name='exportar_pdf'),
+    path('admin/reportes-pdf/', views.reportes_pdf, name='reportes_pdf'),
+    path('reportes-pdf/<int:pk>/descargar/', views.descargar_reporte_pdf, name='descargar_reporte_pdf'),
+    path('admin/empleados/autocompletar/', views.autocompletar_empleados, name='autocompletar_empleados'),
 ]
@@ -1,24 +1,24 @@
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.shortcuts import render, get_object_or_404
+from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import ListView, CreateView, UpdateView, DetailView
 from django.urls import reverse_lazy
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, Http404, FileResponse
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from django.contrib.admin.views.decorators import staff_member_required
 import json
 from datetime import date
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.utils import ImageReader
-from django.contrib.staticfiles import finders
 
-from .models import Asignacion, ActividadAsignada
+from apps.empresas.models import Empresa
+from soma.tareas import en_segundo_plano
+from apps.recursos_humanos.models import Empleado
+from . import reportes
+from .busqueda import buscar
+from .models import Asignacion, ActividadAsignada, ReporteAsignaciones
+from .servicios import ESTADOS, buscar_empleados, conteos_por_estado, notificar_actividad_completada
 
 
 class MisAsignacionesView(LoginRequiredMixin, ListView):
@@ -27,22 +27,20 @@ class MisAsignacionesView(LoginRequiredMixin, ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        from apps.recursos_humanos.models import Empleado
-        context['empleado'] = Empleado.objects.filter(usuario=self.request.user).first()
+        context['empleado'] = self.request.empleado
         return context
 
     def get_queryset(self):
-        user = self.request.user
-        from apps.recursos_humanos.models import Empleado
         from django.db.models import Q
-        empleado = Empleado.objects.filter(usuario=user).first()
+        empleado = self.request.empleado
         if empleado:
-            # Incluir asignaciones donde el usuario es empleado O supervisor
+            # Incluir asignaciones donde el usuario es empleado O supervisor. La
+            # pertenencia como empleado va en subconsulta para no unir `empleados`
+            # (duplicaría filas y obligaría a un DISTINCT)
             qs = (Asignacion.objects
-                  .filter(Q(empleados=empleado) | Q(supervisor=empleado))
+                  .filter(Q(pk__in=empleado.asignaciones.values('pk')) | Q(supervisor=empleado))
                   .select_related('empresa', 'supervisor')
                   .prefetch_related('empleados')
-                  .distinct()  # Evitar duplicados si es empleado Y supervisor de la misma asignación
                   .order_by('-fecha', '-fecha_creacion'))
             
             fecha = self.request.GET.get('fecha')
@@ -103,26 +101,16 @@ class AsignacionesTodasView(LoginRequiredMixin, ListView):
     paginate_by = 20
 
     def get_queryset(self):
-            from django.db.models import Sum, Case, When, IntegerField
-
             qs = (Asignacion.objects
-                  .select_related('empresa', 'supervisor')
+                  .select_related('empresa', 'supervisor__usuario')
+                  .prefetch_related('empleados__usuario')
                   .order_by('-fecha', '-fecha_creacion'))
             # Filtros opcionales por querystring
             empleado_id = self.request.GET.get('empleado')
             fecha = self.request.GET.get('fecha')
+            termino = (self.request.GET.get('q') or '').strip()
             # Por defecto mostrar 'completadas' si no se especifica estado
             estado = self.request.GET.get('estado') or 'completadas'
-            # Anotar porcentaje completado sumando porcentajes de actividades completadas
-            qs = qs.annotate(
-                porcentaje_completado_sum=Sum(
-                    Case(
-                        When(actividades__completada=True, then='actividades__porcentaje'),
-                        default=0,
-                        output_field=IntegerField()
-                    )
-                )
-            )
             if empleado_id:
                 qs = qs.filter(empleados__id=empleado_id)
             if fecha:
@@ -133,16 +121,13 @@ class AsignacionesTodasView(LoginRequiredMixin, ListView):
                     qs = qs.filter(fecha=date(y, m, d))
                 except Exception:
                     pass
-            # Aplicar filtro por estado si existe
-            if estado:
-                estado = estado.lower()
-                if estado == 'completadas':
-                    qs = qs.filter(porcentaje_completado_sum__gte=100)
-                elif estado == 'en_proceso':
-                    # Al menos una actividad completada pero no 100%
-                    qs = qs.filter(porcentaje_completado_sum__gt=0, porcentaje_completado_sum__lt=100)
-                elif estado == 'programadas':
-                    qs = qs.filter(porcentaje_completado_sum__lte=0)
+            if termino:
+                # Texto de búsqueda indexado con trigramas (ver busqueda.py)
+                qs = buscar(qs, termino)
+            # Aplicar filtro por estado si existe (índice sobre porcentaje_completado)
+            estado = estado.lower()
+            if estado in ESTADOS:
+                qs = qs.filter(ESTADOS[estado])
             return qs
 
     def get_context_data(self, **kwargs):
@@ -150,20 +135,11 @@ class AsignacionesTodasView(LoginRequiredMixin, ListView):
         # Por defecto seleccionar 'completadas' si no se indicó
         estado_actual = self.request.GET.get('estado') or 'completadas'
         ctx['estado_actual'] = estado_actual
-        # Calcular totales por categoría para mostrar leyenda
-        from django.db.models import Sum, Case, When, IntegerField
-        base_qs = Asignacion.objects.annotate(
-            porcentaje_completado_sum=Sum(
-                Case(
-                    When(actividades__completada=True, then='actividades__porcentaje'),
-                    default=0,
-                    output_field=IntegerField()
-                )
-            )
-        )
-        ctx['total_completadas'] = base_qs.filter(porcentaje_completado_sum__gte=100).distinct().count()
-        ctx['total_en_proceso'] = base_qs.filter(porcentaje_completado_sum__gt=0, porcentaje_completado_sum__lt=100).distinct().count()
-        ctx['total_programadas'] = base_qs.filter(porcentaje_completado_sum__lte=0).distinct().count()
+        # Totales por categoría para la leyenda (una consulta, cacheada)
+        conteos = conteos_por_estado()
+        ctx['total_completadas'] = conteos['completadas']
+        ctx['total_en_proceso'] = conteos['en_proceso']
+        ctx['total_programadas'] = conteos['programadas']
         return ctx
 
 
@@ -176,14 +152,15 @@ def marcar_actividad_completada(request, actividad_id):
     """
     try:
         # Obtener empleado del usuario actual
-        from apps.recursos_humanos.models import Empleado
-        empleado = get_object_or_404(Empleado, usuario=request.user)
+        empleado = request.empleado
+        if not empleado:
+            raise Http404('Tu usuario no está asociado a un empleado.')
         
-        # Obtener la actividad asignada
-        actividad = get_object_or_404(ActividadAsignada, id=actividad_id)
+        # Obtener la actividad asignada (con su asignación: el avance se ajusta en memoria al guardar)
+        actividad = get_object_or_404(ActividadAsignada.objects.select_related('asignacion'), id=actividad_id)
         
         # Verificar que el usuario es el supervisor de la asignación
-        if actividad.asignacion.supervisor != empleado:
+        if actividad.asignacion.supervisor_id != empleado.pk:
             return JsonResponse({
                 'success': False,
                 'error': 'No tienes permisos para completar esta actividad'
@@ -203,12 +180,10 @@ def marcar_actividad_completada(request, actividad_id):
             actividad.completada_por = None
         actividad.save()
         
-        # Enviar notificación al admin si la actividad se marca como completada
+        # El aviso a los administradores se arma después del commit en el hilo
+        # de tareas; la respuesta no espera a sus consultas
         if completada:
-            print(f"Enviando notificación para actividad completada: {actividad.nombre}")
-            enviar_notificacion_admin_actividad_completada(actividad, empleado)
-        else:
-            print(f"Actividad marcada como pendiente: {actividad.nombre}")
+            en_segundo_plano(notificar_actividad_completada, actividad.pk, empleado.pk)
         
         return JsonResponse({
             'success': True,
@@ -224,98 +199,6 @@ def marcar_actividad_completada(request, actividad_id):
         }, status=500)
 
 
-def enviar_notificacion_admin_actividad_completada(actividad, supervisor):
-    """
-    Envía notificación al admin cuando se completa una actividad.
-    """
-    print(f"=== INICIANDO ENVÍO DE NOTIFICACIÓN ===")
-    print(f"Actividad: {actividad.nombre}")
-    print(f"Supervisor: {supervisor.nombre_completo}")
-    
-    try:
-        from apps.notificaciones.models import Notificacion
-        from apps.usuarios.models import Usuario
-        
-        # Obtener todos los usuarios admin (usando el modelo personalizado Usuario)
-        admins = Usuario.objects.filter(is_staff=True, is_active=True)
-        print(f"Admins encontrados: {admins.count()}")
-        
-        # Obtener información detallada de la asignación
-        asignacion = actividad.asignacion
-        todas_actividades = asignacion.actividades.all()
-        actividades_completadas = todas_actividades.filter(completada=True)
-        actividades_pendientes = todas_actividades.filter(completada=False)
-        porcentaje_total = asignacion.porcentaje_completado
-        
-        titulo = f"✅ Actividad completada por {supervisor.nombre_completo}"
-        
-        # Crear mensaje estructurado con iconos
-        lineas = []
-        lineas.append(f"🎯 ACTIVIDAD: {actividad.nombre} ({actividad.porcentaje}%)")
-        lineas.append("=" * 45)
-        lineas.append(f"📊 PROGRESO: {porcentaje_total}% ({actividades_completadas.count()}/{todas_actividades.count()} completadas)")
-        lineas.append("")
-        lineas.append(f"👤 Supervisor: {supervisor.nombre_completo}")
-        lineas.append(f"🏢 Empresa: {asignacion.empresa.nombre}")
-        lineas.append(f"📅 Fecha: {asignacion.fecha.strftime('%d/%m/%Y')}")
-
-        # Actividades completadas (máximo 3)
-        if actividades_completadas.exists():
-            lineas.append("")
-            lineas.append("✅ COMPLETADAS:")
-            for act in actividades_completadas[:3]:
-                dias_texto = f"{act.tiempo_estimado_dias} día{'s' if act.tiempo_estimado_dias != 1 else ''}"
-                lineas.append(f"   ✓ {act.nombre} ({act.porcentaje}% - {dias_texto})")
-            if actividades_completadas.count() > 3:
-                lineas.append(f"   ➕ ... y {actividades_completadas.count() - 3} mas")
-        
-        # Actividades pendientes (máximo 3)
-        if actividades_pendientes.exists():
-            lineas.append("")
-            lineas.append("⏳ PENDIENTES:")
-            for act in actividades_pendientes[:3]:
-                dias_texto = f"{act.tiempo_estimado_dias} día{'s' if act.tiempo_estimado_dias != 1 else ''}"
-                lineas.append(f"   ⭕ {act.nombre} ({act.porcentaje}% - {dias_texto})")
-            if actividades_pendientes.count() > 3:
-                lineas.append(f"   ➕ ... y {actividades_pendientes.count() - 3} mas")
-        else:
-            lineas.append("")
-            lineas.append("🎉 ¡ASIGNACION COMPLETADA AL 100%!")
-        
-        # Empleados (máximo 2)
-        empleados = asignacion.empleados.all()
-        if empleados.count() > 0:
-            lineas.append("")
-            lineas.append("EQUIPO:")
-            for emp in empleados[:2]:
-                lineas.append(f"  - {emp.nombre_completo}")
-            if empleados.count() > 2:
-                lineas.append(f"  - ... y {empleados.count() - 2} mas")
-        
-        mensaje = "\n".join(lineas)
-        
-        # Crear notificación para cada admin
-        notificaciones_creadas = 0
-        for admin in admins:
-            notificacion = Notificacion.objects.create(
-                usuario=admin,
-                titulo=titulo,
-                mensaje=mensaje,
-                tipo='success'
-            )
-            notificaciones_creadas += 1
-            print(f"✅ Notificación #{notificacion.id} creada para {admin.username}")
-            
-        print(f"🎉 Total notificaciones enviadas: {notificaciones_creadas}")
-        return True
-            
-    except Exception as e:
-        print(f"❌ Error enviando notificación: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
-
-
 class SupervisorAsignacionDetailView(LoginRequiredMixin, DetailView):
     """
     Vista detallada de una asignación para el supervisor,
@@ -327,192 +210,123 @@ class SupervisorAsignacionDetailView(LoginRequiredMixin, DetailView):
     
     def get_queryset(self):
         # Solo permitir ver asignaciones donde el usuario es supervisor
-        from apps.recursos_humanos.models import Empleado
-        empleado = Empleado.objects.filter(usuario=self.request.user).first()
+        empleado = self.request.empleado
         if empleado:
-            return Asignacion.objects.filter(supervisor=empleado)
+            return (Asignacion.objects
+                    .filter(supervisor=empleado)
+                    .select_related('empresa', 'supervisor')
+                    .prefetch_related('empleados', 'actividades__completada_por'))
         return Asignacion.objects.none()
 
 
+def _fecha_param(valor):
+    """Fecha 'YYYY-MM-DD' de la querystring o None si falta o no es válida."""
+    try:
+        y, m, d = map(int, valor.split('-'))
+        return date(y, m, d)
+    except Exception:
+        return None
+
+
+def _entero_param(valor):
+    try:
+        return int(valor) if valor else None
+    except (TypeError, ValueError):
+        return None
+
+
 @staff_member_required
-def exportar_asignaciones_hoy_pdf(request):
+def exportar_asignaciones_pdf(request):
     """
-    Exporta todas las asignaciones de hoy a PDF en formato tabla con logo SOMA
+    Exporta a PDF (tabla con logo SOMA) las asignaciones de un rango de fechas,
+    opcionalmente filtradas por empresa y supervisor. Sin parámetros exporta
+    las de hoy. Si el rango es grande el PDF se genera en segundo plano y se
+    avisa con una notificación para descargarlo.
     """
-    from django.conf import settings
-    import os
-    
-    hoy = date.today()
-    asignaciones = Asignacion.objects.filter(fecha=hoy).select_related(
-        'empresa', 'supervisor'
-    ).prefetch_related('empleados', 'actividades')
-    
+    desde = _fecha_param(request.GET.get('desde')) or timezone.localdate()
+    hasta = _fecha_param(request.GET.get('hasta')) or desde
+    if hasta < desde:
+        desde, hasta = hasta, desde
+    empresa = supervisor = None
+    empresa_id = _entero_param(request.GET.get('empresa'))
+    if empresa_id:
+        empresa = get_object_or_404(Empresa, pk=empresa_id)
+    supervisor_id = _entero_param(request.GET.get('supervisor'))
+    if supervisor_id:
+        supervisor = get_object_or_404(Empleado.objects.select_related('usuario'), pk=supervisor_id)
+
+    asignaciones = reportes.filtrar_asignaciones(desde, hasta, empresa_id, supervisor_id)
+    if desde != hasta and asignaciones.count() > reportes.MAX_ASIGNACIONES_SINCRONO:
+        reporte = ReporteAsignaciones.objects.create(
+            usuario=request.user, desde=desde, hasta=hasta, empresa=empresa, supervisor=supervisor
+        )
+        reportes.encolar_reporte(reporte)
+        messages.info(request, 'El reporte es grande y se está generando en segundo plano. '
+                               'Recibirás una notificación cuando esté listo para descargar.')
+        return redirect('asignaciones:reportes_pdf')
+
     # Crear response PDF
+    nombre = ReporteAsignaciones(desde=desde, hasta=hasta).nombre_archivo() if desde != hasta \
+        else f'asignaciones_{desde.strftime("%Y%m%d")}.pdf'
     response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="asignaciones_{hoy.strftime("%Y%m%d")}.pdf"'
-    
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
     try:
-        # Crear documento PDF
-        doc = SimpleDocTemplate(response, pagesize=A4, topMargin=0.5*inch)
-        styles = getSampleStyleSheet()
-        story = []
-        
-        # Estilos personalizados
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=15,
-            spaceBefore=5,
-            textColor=colors.HexColor('#1e3a8a'),  # Azul marino igual que el header
-            alignment=1,  # Centro
-            fontName='Helvetica-Bold'
-        )
-        
-        # Header con logo de SOMA y posible membrete
-        # Mostrar el título con la segunda línea en color naranja
-        titulo_principal = Paragraph("Servicios Industriales SOMA<br/><font color='#F97316'>Asignaciones de Hoy</font>", title_style)
-
-        # Preparar metadata del PDF (título que aparece en la pestaña)
-        pdf_title = f"Asignaciones {hoy.strftime('%d/%m/%Y')}"
-
-        def _on_first_page(canvas, doc_obj):
-            try:
-                canvas.setTitle(pdf_title)
-                canvas.setAuthor('Servicios Industriales SOMA')
-            except Exception:
-                pass
-
-        # Intentar localizar un banner/membrete completo primero (imagen a lo ancho)
-        banner_path = None
-        banner_candidates = [
-            'images/membrete_header.png',
-            'images/membrete.png',
-            'img/membrete.png',
-            'images/header.png'
-        ]
-        for cand in banner_candidates:
-            p = finders.find(cand)
-            if p:
-                banner_path = p
-                break
-
-        if banner_path and os.path.exists(banner_path):
-            try:
-                banner = Image(banner_path, width=7.6*inch, height=1*inch)
-                story.append(banner)
-                story.append(Spacer(1, 6))
-            except Exception as e:
-                print(f"No se pudo cargar banner desde {banner_path}: {e}")
-
-        # Buscar el logo en ubicaciones estáticas conocidas (más robusto usando finders)
-        logo_soma = None
-        logo_candidates = [
-            'images/logo.png', 'images/logo_soma.png', 'img/logo.png', 'img/logo_soma.png'
-        ]
-        for cand in logo_candidates:
-            ruta = finders.find(cand)
-            if ruta and os.path.exists(ruta):
-                try:
-                    logo_soma = Image(ruta, width=1.2*inch, height=0.9*inch)
-                    break
-                except Exception as e:
-                    print(f"Error cargando logo desde {ruta}: {e}")
-                    continue
-
-        # Header: logo (izquierda) + título (centrado) + celda vacía simétrica para centrar perfectamente
-        if logo_soma:
-            header_table = Table([[logo_soma, titulo_principal, '']], colWidths=[1.2*inch, 5.2*inch, 1.2*inch])
-            header_table.setStyle(TableStyle([
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 0),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-            ]))
-            story.append(header_table)
-        else:
-            header_table = Table([[titulo_principal]], colWidths=[7.6*inch])
-            header_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ]))
-            story.append(header_table)
-
-        story.append(Paragraph(f"Fecha: {hoy.strftime('%d/%m/%Y')}", styles['Normal']))
-        story.append(Spacer(1, 20))
-        
-        if asignaciones.exists():
-            # Crear tabla principal de asignaciones
-            table_data = [
-                ['Empresa', 'Supervisor', 'Empleados', 'Detalles']
-            ]
-            
-            for asignacion in asignaciones:
-                # Preparar datos de la fila
-                empresa = asignacion.empresa.nombre
-                supervisor = asignacion.supervisor.nombre_completo if asignacion.supervisor else 'Sin asignar'
-                
-                # Mostrar todos los empleados con cantidad total
-                todos_empleados = asignacion.empleados.all()
-                total_empleados = todos_empleados.count()
-                
-                if total_empleados == 0:
-                    empleados = "Sin empleados asignados"
-                elif total_empleados == 1:
-                    empleados = f"(1) {todos_empleados[0].nombre_completo}"
-                else:
-                    empleados_lista = [e.nombre_completo for e in todos_empleados]
-                    empleados = f"({total_empleados}) " + '\n'.join(empleados_lista)
-                
-                detalles = (asignacion.detalles[:150] + '...') if len(asignacion.detalles) > 150 else asignacion.detalles
-                
-                table_data.append([
-                    empresa,
-                    supervisor, 
-                    empleados,
-                    detalles
-                ])
-            
-            # Crear y estilizar la tabla
-            main_table = Table(table_data, colWidths=[1.8*inch, 1.5*inch, 1.8*inch, 2.4*inch])
-            main_table.setStyle(TableStyle([
-                # Header
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#001a63")),  # Azul marino
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-
-                # Contenido (más compacto)
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 4),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-                ('TOPPADDING', (0, 0), (-1, -1), 4),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-
-                # Bordes y colores alternos (ligeramente más finos)
-                ('GRID', (0, 0), (-1, -1), 0.4, colors.grey),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
-            ]))
-            
-            story.append(main_table)
-            
-        else:
-            story.append(Paragraph("No hay asignaciones programadas para hoy.", styles['Normal']))
-        
-        # Footer simple
-        story.append(Spacer(1, 30))
-        footer_text = f"Reporte generado el {timezone.now().strftime('%d/%m/%Y %H:%M')} por Servicios Industriales SOMA"
-        story.append(Paragraph(footer_text, styles['Normal']))
-
-        # Generar el PDF (aplicar metadata en la primera página)
-        doc.build(story, onFirstPage=_on_first_page)
-
+        reportes.construir_pdf(response, list(asignaciones), desde, hasta,
+                               reportes.describir_filtros(empresa, supervisor))
         return response
-        
     except Exception as e:
         from django.http import HttpResponseServerError
         return HttpResponseServerError(f"Error generando PDF: {str(e)}")
+
+
+@staff_member_required
+def exportar_asignaciones_hoy_pdf(request):
+    """
+    Exporta todas las asignaciones de hoy a PDF en formato tabla con logo SOMA
+    """
+    return exportar_asignaciones_pdf(request)
+
+
+@staff_member_required
+def reportes_pdf(request):
+    """Formulario de exportación por rango y reportes generados en segundo plano del usuario."""
+    context = {
+        'reportes': ReporteAsignaciones.objects.filter(usuario=request.user).select_related(
+            'empresa', 'supervisor__usuario'
+        )[:20],
+        'empresas': Empresa.objects.filter(activa=True).order_by('nombre'),
+        'supervisores': (Empleado.objects
+                         .filter(pk__in=Asignacion.objects.filter(supervisor__isnull=False).values('supervisor'))
+                         .select_related('usuario')
+                         .order_by('usuario__first_name', 'usuario__last_name')),
+        'hoy': timezone.localdate(),
+        'max_sincrono': reportes.MAX_ASIGNACIONES_SINCRONO,
+    }
+    return render(request, 'asignaciones/reportes_pdf.html', context)
+
+
+@login_required
+def descargar_reporte_pdf(request, pk):
+    """Descarga de un reporte generado en segundo plano (sólo quien lo pidió o un superusuario)."""
+    reporte = get_object_or_404(ReporteAsignaciones, pk=pk)
+    if reporte.usuario_id != request.user.pk and not request.user.is_superuser:
+        raise Http404('Reporte no encontrado')
+    if reporte.estado != 'listo' or not reporte.archivo:
+        messages.warning(request, 'El reporte todavía no está disponible.')
+        return redirect('asignaciones:reportes_pdf')
+    return FileResponse(reporte.archivo.open('rb'), as_attachment=True, filename=reporte.nombre_archivo())
+
+
+@staff_member_required
+def autocompletar_empleados(request):
+    """Empleados activos en formato Select2 ({results: [{id, text}], more}) para los selects del admin.
+
+    Filtra en memoria la lista en cache de `opciones_empleados()`: no consulta la BD.
+    """
+    excluir = [pk for pk in (request.GET.get('excluir') or '').split(',') if pk]
+    resultados, hay_mas = buscar_empleados(request.GET.get('q', ''), excluir=excluir,
+                                           pagina=_entero_param(request.GET.get('page')) or 1)
+    return JsonResponse({
+        'results': [{'id': pk, 'text': etiqueta} for pk, etiqueta in resultados],
+        'more': hay_mas,
+    })
@@ -4,8 +4,13 @@ from django.utils import timezone
 from datetime import timedelta
 from apps.recursos_humanos.models import Empleado
 from apps.empresas.models import Contacto
-from apps.notificaciones.models import Notificacion
-from django.contrib.auth import get_user_model
+from apps.notificaciones.servicios import ids_de_rol, notificar
+from django.urls import reverse
+
+
+def _url_detalle_cumpleanos(notif):
+    return reverse('notificaciones:detalle_cumpleanos', args=[notif.pk])
+
 
 # Notifica al admin si el empleado cumple hoy o en los próximos 30 días
 @receiver(post_save, sender=Empleado)
@@ -15,35 +20,20 @@ def notificar_cumple_empleado(sender, instance, created, **kwargs):
         return
     hoy = timezone.localdate()
     en_30_dias = hoy + timedelta(days=30)
-    User = get_user_model()
-    admin = User.objects.filter(is_superuser=True, activo=True).first()
-    if not admin:
+    # Sólo al primer superusuario activo (ids cacheados y ordenados por pk)
+    admin_ids = ids_de_rol('superusuarios_activos')[:1]
+    if not admin_ids:
         return
     cumple_hoy = (fecha.month == hoy.month and fecha.day == hoy.day)
     # Genera lista de fechas de cumpleaños en los próximos 30 días
     proximos = [(hoy + timedelta(days=i)) for i in range(1, 31)]
     cumple_prox = any(fecha.month == d.month and fecha.day == d.day for d in proximos)
-    from django.urls import reverse
     if cumple_hoy:
         mensaje = f'Empleado: {instance.nombre_completo} ({fecha}) cumple años hoy.'
-        notif = Notificacion.objects.create(
-            usuario=admin,
-            titulo='Cumpleaños de hoy',
-            mensaje=mensaje,
-            tipo='success'
-        )
-        notif.url = reverse('notificaciones:detalle_cumpleanos', args=[notif.pk])
-        notif.save()
+        notificar(admin_ids, 'Cumpleaños de hoy', mensaje, tipo='success', url=_url_detalle_cumpleanos)
     elif cumple_prox:
         mensaje = f'Empleado: {instance.nombre_completo} ({fecha}) cumple años en los próximos 30 días.'
-        notif = Notificacion.objects.create(
-            usuario=admin,
-            titulo='Cumpleaños próximos',
-            mensaje=mensaje,
-            tipo='info'
-        )
-        notif.url = reverse('notificaciones:detalle_cumpleanos', args=[notif.pk])
-        notif.save()
+        notificar(admin_ids, 'Cumpleaños próximos', mensaje, tipo='info', url=_url_detalle_cumpleanos)
 
 # Notifica al admin si el contacto cumple hoy o en los próximos 30 días
 @receiver(post_save, sender=Contacto)
@@ -53,31 +43,16 @@ def notificar_cumple_contacto(sender, instance, created, **kwargs):
         return
     hoy = timezone.localdate()
     en_30_dias = hoy + timedelta(days=30)
-    User = get_user_model()
-    admin = User.objects.filter(is_superuser=True, activo=True).first()
-    if not admin:
+    # Sólo al primer superusuario activo (ids cacheados y ordenados por pk)
+    admin_ids = ids_de_rol('superusuarios_activos')[:1]
+    if not admin_ids:
         return
     cumple_hoy = (fecha.month == hoy.month and fecha.day == hoy.day)
     proximos = [(hoy + timedelta(days=i)) for i in range(1, 31)]
     cumple_prox = any(fecha.month == d.month and fecha.day == d.day for d in proximos)
-    from django.urls import reverse
     if cumple_hoy:
         mensaje = f'Contacto: {instance.nombre_completo} ({fecha}) cumple años hoy.'
-        notif = Notificacion.objects.create(
-            usuario=admin,
-            titulo='Cumpleaños de hoy',
-            mensaje=mensaje,
-            tipo='success'
-        )
-        notif.url = reverse('notificaciones:detalle_cumpleanos', args=[notif.pk])
-        notif.save()
+        notificar(admin_ids, 'Cumpleaños de hoy', mensaje, tipo='success', url=_url_detalle_cumpleanos)
     elif cumple_prox:
         mensaje = f'Contacto: {instance.nombre_completo} ({fecha}) cumple años en los próximos 30 días.'
-        notif = Notificacion.objects.create(
-            usuario=admin,
-            titulo='Cumpleaños próximos',
-            mensaje=mensaje,
-            tipo='info'
-        )
-        notif.url = reverse('notificaciones:detalle_cumpleanos', args=[notif.pk])
-        notif.save()
+        notificar(admin_ids, 'Cumpleaños próximos', mensaje, tipo='info', url=_url_detalle_cumpleanos)
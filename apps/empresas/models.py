@@ -3,8 +3,10 @@ from django.urls import reverse
 from django.core.validators import RegexValidator
 from django.db.models import SET_NULL
 
+from soma.valores_cargados import ValoresCargadosMixin
 
-class Empresa(models.Model):
+
+class Empresa(ValoresCargadosMixin, models.Model):
     """Modelo para representar una empresa o corporativo"""
     
     nombre = models.CharField(max_length=200, verbose_name="Empresa")
@@ -12,6 +14,9 @@ class Empresa(models.Model):
     direccion = models.TextField(verbose_name="Dirección")
     logo = models.ImageField(upload_to='empresas/logos/', blank=True, null=True, verbose_name="Logo")
     activa = models.BooleanField(default=True, verbose_name="ACTIVA")
+
+    # El nombre aparece en el texto de búsqueda de las asignaciones
+    CAMPOS_RASTREADOS = ('nombre',)
     
     class Meta:
         verbose_name = "Empresa"
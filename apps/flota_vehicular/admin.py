@@ -286,50 +286,49 @@ class GasolinaRequestAdmin(admin.ModelAdmin):
         return ''
     comprobante_link.short_description = 'Comprobante'
 
+    def _notificar_empleados(self, queryset, estado, titulo, mensaje, tipo):
+        """Una notificación por solicitud (URL a subir comprobante) con un solo bulk_create;
+        las que ya se enviaron para ese estado se descartan por dedupe_key."""
+        try:
+            from apps.notificaciones.models import Notificacion
+            from django.urls import reverse
+            Notificacion.objects.bulk_create([
+                Notificacion(
+                    usuario_id=req.empleado.usuario_id,
+                    titulo=titulo,
+                    mensaje=mensaje.format(fecha=req.fecha.date(), precio=req.precio),
+                    tipo=tipo,
+                    leida=False,
+                    url=reverse('flota:subir_comprobante_gasolina', args=[req.pk]),
+                    dedupe_key=f'gasolina_estado:{req.pk}:{estado}',
+                )
+                for req in queryset.select_related('empleado')
+            ], ignore_conflicts=True)
+        except Exception:
+            pass
+
     def aprobar_solicitudes(self, request, queryset):
         updated = queryset.filter(estado='pendiente').update(estado='revisado')
         # Notificar a empleados
-        for req in queryset:
-            try:
-                from apps.notificaciones.models import Notificacion
-                from django.urls import reverse
-                noti = Notificacion.objects.create(
-                    usuario=req.empleado.usuario,
-                    titulo='✅ Solicitud de gasolina aprobada',
-                    mensaje=f'Tu solicitud de gasolina del {req.fecha.date()} por ${req.precio} ha sido aprobada. Ahora puedes subir el comprobante para completar el proceso.',
-                    tipo='success',
-                    leida=False,
-                )
-                try:
-                    noti.url = reverse('flota:subir_comprobante_gasolina', args=[req.pk])
-                    noti.save()
-                except Exception:
-                    pass
-            except Exception:
-                pass
+        self._notificar_empleados(
+            queryset,
+            'revisado',
+            '✅ Solicitud de gasolina aprobada',
+            'Tu solicitud de gasolina del {fecha} por ${precio} ha sido aprobada. Ahora puedes subir el comprobante para completar el proceso.',
+            'success',
+        )
         self.message_user(request, f'{updated} solicitudes marcadas como aprobadas.')
     aprobar_solicitudes.short_description = 'Marcar solicitudes seleccionadas como Aprobadas'
 
     def rechazar_solicitudes(self, request, queryset):
         updated = queryset.filter(estado='pendiente').update(estado='rechazado')
-        for req in queryset:
-            try:
-                from apps.notificaciones.models import Notificacion
-                from django.urls import reverse
-                noti = Notificacion.objects.create(
-                    usuario=req.empleado.usuario,
-                    titulo='❌ Solicitud de gasolina rechazada',
-                    mensaje=f'Tu solicitud de gasolina del {req.fecha.date()} por ${req.precio} ha sido revisada y fue rechazada. Si corresponde, sube el comprobante o revisa las observaciones.',
-                    tipo='danger',
-                    leida=False,
-                )
-                try:
-                    noti.url = reverse('flota:subir_comprobante_gasolina', args=[req.pk])
-                    noti.save()
-                except Exception:
-                    pass
-            except Exception:
-                pass
+        self._notificar_empleados(
+            queryset,
+            'rechazado',
+            '❌ Solicitud de gasolina rechazada',
+            'Tu solicitud de gasolina del {fecha} por ${precio} ha sido revisada y fue rechazada. Si corresponde, sube el comprobante o revisa las observaciones.',
+            'danger',
+        )
         self.message_user(request, f'{updated} solicitudes marcadas como rechazadas.')
     rechazar_solicitudes.short_description = 'Marcar solicitudes seleccionadas como Rechazadas'
 
@@ -349,22 +348,17 @@ class GasolinaRequestAdmin(admin.ModelAdmin):
             obj.save()
             # Asegurar que el empleado reciba una notificación (evitar duplicados si ya existe)
             try:
-                from apps.notificaciones.models import Notificacion
+                from apps.notificaciones.servicios import notificar
                 from django.urls import reverse
-                url = ''
-                try:
-                    url = reverse('flota:subir_comprobante_gasolina', args=[obj.pk])
-                except Exception:
-                    url = ''
-                titulo = '✅ Solicitud de gasolina aprobada'
-                if not Notificacion.objects.filter(usuario=obj.empleado.usuario, titulo=titulo, url=url).exists():
-                    Notificacion.objects.create(
-                        usuario=obj.empleado.usuario,
-                        titulo=titulo,
-                        mensaje=f'Tu solicitud de gasolina del {obj.fecha.date()} por ${obj.precio} ha sido aprobada. Ahora puedes subir el comprobante para completar el proceso.',
-                        tipo='success',
-                        url=url
-                    )
+                notificar(
+                    obj.empleado.usuario_id,
+                    '✅ Solicitud de gasolina aprobada',
+                    f'Tu solicitud de gasolina del {obj.fecha.date()} por ${obj.precio} ha sido aprobada. Ahora puedes subir el comprobante para completar el proceso.',
+                    tipo='success',
+                    url=reverse('flota:subir_comprobante_gasolina', args=[obj.pk]),
+                    # Si la señal de GasolinaRequest ya lo notificó, el INSERT se descarta
+                    dedupe_key=f'gasolina_estado:{obj.pk}:revisado',
+                )
             except Exception:
                 pass
         return redirect(request.META.get('HTTP_REFERER', '/admin/'))
@@ -375,22 +369,17 @@ class GasolinaRequestAdmin(admin.ModelAdmin):
             obj.estado = 'rechazado'
             obj.save()
             try:
-                from apps.notificaciones.models import Notificacion
+                from apps.notificaciones.servicios import notificar
                 from django.urls import reverse
-                url = ''
-                try:
-                    url = reverse('flota:subir_comprobante_gasolina', args=[obj.pk])
-                except Exception:
-                    url = ''
-                titulo = '❌ Solicitud de gasolina rechazada'
-                if not Notificacion.objects.filter(usuario=obj.empleado.usuario, titulo=titulo, url=url).exists():
-                    Notificacion.objects.create(
-                        usuario=obj.empleado.usuario,
-                        titulo=titulo,
-                        mensaje=f'Tu solicitud de gasolina del {obj.fecha.date()} por ${obj.precio} ha sido revisada y fue rechazada. Si corresponde, sube el comprobante o revisa las observaciones.',
-                        tipo='danger',
-                        url=url
-                    )
+                notificar(
+                    obj.empleado.usuario_id,
+                    '❌ Solicitud de gasolina rechazada',
+                    f'Tu solicitud de gasolina del {obj.fecha.date()} por ${obj.precio} ha sido revisada y fue rechazada. Si corresponde, sube el comprobante o revisa las observaciones.',
+                    tipo='danger',
+                    url=reverse('flota:subir_comprobante_gasolina', args=[obj.pk]),
+                    # Si la señal de GasolinaRequest ya lo notificó, el INSERT se descarta
+                    dedupe_key=f'gasolina_estado:{obj.pk}:rechazado',
+                )
             except Exception:
                 pass
         return redirect(request.META.get('HTTP_REFERER', '/admin/'))
\ No newline at end of file
@@ -2,7 +2,7 @@ from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
 from django.urls import reverse
 from .models import GasolinaRequest
-from apps.notificaciones.models import Notificacion
+from apps.notificaciones.servicios import notificar
 
 
 @receiver(pre_save, sender=GasolinaRequest)
@@ -58,15 +58,15 @@ def gasolina_post_save(sender, instance, created, **kwargs):
         except Exception:
             url = ''
 
-        # Evitar crear notificación si ya existe (posibles rutas que ya la crearon desde admin)
-        if not Notificacion.objects.filter(usuario=usuario, titulo=titulo, url=url).exists():
-            Notificacion.objects.create(
-                usuario=usuario,
-                titulo=titulo,
-                mensaje=mensaje,
-                tipo='success' if new == 'revisado' else 'danger',
-                url=url
-            )
+        # La clave evita duplicados con las rutas del admin que notifican el mismo cambio
+        notificar(
+            usuario,
+            titulo,
+            mensaje,
+            tipo='success' if new == 'revisado' else 'danger',
+            url=url,
+            dedupe_key=f'gasolina_estado:{instance.pk}:{new}',
+        )
 
     # Detectar subida de comprobante: si antes no había comprobante y ahora sí, notificar a admins
     # También cubrir el caso de creación con comprobante
@@ -78,32 +78,22 @@ def gasolina_post_save(sender, instance, created, **kwargs):
     # Si se creó con comprobante o se actualizó agregando comprobante
     if (created and getattr(instance, 'comprobante', None)) or (not created and not old_has and getattr(instance, 'comprobante', None)):
         try:
-            from apps.usuarios.models import Usuario
-            admins = Usuario.objects.filter(is_staff=True)
-            for admin in admins:
-                mensaje_admin = f'El empleado {instance.empleado.usuario.get_full_name()} ha subido un comprobante de gasolina para {instance.vehiculo or instance.vehiculo_externo} por ${instance.precio}.'
-                # Incluir enlace público al archivo si está disponible
-                try:
-                    if instance.comprobante:
-                        mensaje_admin += f' Comprobante: {instance.comprobante.url}'
-                except Exception:
-                    pass
+            mensaje_admin = f'El empleado {instance.empleado.usuario.get_full_name()} ha subido un comprobante de gasolina para {instance.vehiculo or instance.vehiculo_externo} por ${instance.precio}.'
+            # Incluir enlace público al archivo si está disponible
+            try:
+                if instance.comprobante:
+                    mensaje_admin += f' Comprobante: {instance.comprobante.url}'
+            except Exception:
+                pass
 
-                # Crear notificación y establecer su URL al detalle admin de notificaciones con gasolina_id
-                try:
-                    noti = Notificacion.objects.create(
-                        usuario=admin,
-                        titulo='📥 Comprobante de gasolina subido',
-                        mensaje=mensaje_admin,
-                        tipo='info',
-                        url=''
-                    )
-                    try:
-                        noti.url = reverse('notificaciones:admin_detalle', args=[noti.pk]) + f'?gasolina_id={instance.pk}'
-                        noti.save()
-                    except Exception:
-                        pass
-                except Exception:
-                    pass
+            # La URL lleva al detalle admin de la notificación con gasolina_id
+            notificar(
+                'staff',
+                titulo='📥 Comprobante de gasolina subido',
+                mensaje=mensaje_admin,
+                tipo='info',
+                url=lambda noti: reverse('notificaciones:admin_detalle', args=[noti.pk]) + f'?gasolina_id={instance.pk}',
+                dedupe_key=f'gasolina_comprobante:{instance.pk}',
+            )
         except Exception:
-            pass
\ No newline at end of file
+            pass
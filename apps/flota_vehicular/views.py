@@ -14,18 +14,22 @@ from .forms import (
     GasolinaComprobanteForm,
 )
 from .models import GasolinaRequest
-from apps.recursos_humanos.models import Empleado
 from apps.notificaciones.models import Notificacion
-from apps.usuarios.models import Usuario
+from apps.notificaciones.servicios import notificar
 from django.urls import reverse
 
 
+def _url_detalle_notificacion(noti):
+    """URL al detalle de la propia notificación (requiere su pk; la resuelve notificar)."""
+    return reverse('notificaciones:detalle_usuario', args=[noti.pk])
+
+
 @login_required
 def solicitar_transferencia(request):
     """Vista para solicitar la transferencia de un vehículo"""
     
     # Verificar que el usuario tenga un empleado asociado
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado:
         messages.error(request, 'Tu usuario no está asociado a un empleado.')
         return redirect('mi_vehiculo')
@@ -96,21 +100,14 @@ def solicitar_transferencia(request):
                 )
                 # Notificar a administradores que se creó una nueva solicitud de transferencia
                 try:
-                    admins = Usuario.objects.filter(is_staff=True)
-                    for admin in admins:
-                        noti = Notificacion.objects.create(
-                            usuario=admin,
-                            titulo='📣 Nueva solicitud de transferencia',
-                            mensaje=f'El usuario {empleado.usuario.get_full_name()} ha solicitado transferir el vehículo {asignacion.vehiculo} a {transferencia.empleado_destino.usuario.get_full_name()}.',
-                            tipo='info',
-                        )
-                        # Poner la URL al detalle de la notificación para que el dropdown apunte al recurso concreto
-                        try:
-                            noti.url = reverse('notificaciones:detalle_usuario', args=[noti.id])
-                            noti.save()
-                        except Exception:
-                            # Si falla construir la URL no bloqueamos la operación
-                            pass
+                    # La URL apunta al detalle de la propia notificación para que el dropdown abra el recurso concreto
+                    notificar(
+                        'staff',
+                        titulo='📣 Nueva solicitud de transferencia',
+                        mensaje=f'El usuario {empleado.usuario.get_full_name()} ha solicitado transferir el vehículo {asignacion.vehiculo} a {transferencia.empleado_destino.usuario.get_full_name()}.',
+                        tipo='info',
+                        url=_url_detalle_notificacion,
+                    )
                 except Exception:
                     # No bloquear la operación de transferencia ante fallo en notificaciones a admins
                     pass
@@ -133,7 +130,7 @@ def solicitar_transferencia(request):
 def transferencia_detalle(request, pk):
     """Vista para ver los detalles de una transferencia"""
     
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado:
         messages.error(request, 'Tu usuario no está asociado a un empleado.')
         return redirect('home')
@@ -168,7 +165,7 @@ def responder_solicitud(request, pk):
         from django.http import HttpResponseForbidden
         return HttpResponseForbidden('Los administradores no pueden responder notificaciones.')
 
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado:
         messages.error(request, 'Tu usuario no está asociado a un empleado.')
         return redirect('home')
@@ -254,19 +251,13 @@ def responder_solicitud(request, pk):
                 )
                 # Notificar a administradores sobre la transferencia aprobada
                 try:
-                    admins = Usuario.objects.filter(is_staff=True)
-                    for admin in admins:
-                        noti = Notificacion.objects.create(
-                            usuario=admin,
-                            titulo='🚚 Transferencia aprobada',
-                            mensaje=f'La transferencia del vehículo {transferencia.vehiculo} de {transferencia.empleado_origen.usuario.get_full_name()} a {transferencia.empleado_destino.usuario.get_full_name()} ha sido aprobada.',
-                            tipo='info',
-                        )
-                        try:
-                            noti.url = reverse('notificaciones:detalle_usuario', args=[noti.id])
-                            noti.save()
-                        except Exception:
-                            pass
+                    notificar(
+                        'staff',
+                        titulo='🚚 Transferencia aprobada',
+                        mensaje=f'La transferencia del vehículo {transferencia.vehiculo} de {transferencia.empleado_origen.usuario.get_full_name()} a {transferencia.empleado_destino.usuario.get_full_name()} ha sido aprobada.',
+                        tipo='info',
+                        url=_url_detalle_notificacion,
+                    )
                 except Exception:
                     pass
                 
@@ -304,7 +295,7 @@ def responder_solicitud(request, pk):
 def inspeccionar_vehiculo(request, pk):
     """Vista para que el empleado destino inspeccione el vehículo"""
 
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado:
         messages.error(request, 'Tu usuario no está asociado a un empleado.')
         return redirect('home')
@@ -343,23 +334,17 @@ def inspeccionar_vehiculo(request, pk):
 
                 # Notificar a administradores sobre la inspección realizada
                 try:
-                    admins = Usuario.objects.filter(is_staff=True)
-                    for admin in admins:
-                        # Incluir las observaciones de inspección en el mensaje para que se muestren
-                        inspeccion_msg = f'El empleado {empleado.usuario.get_full_name()} ha completado la inspección del vehículo {transferencia.vehiculo} para la transferencia hacia {transferencia.empleado_origen.usuario.get_full_name()}.'
-                        if transferencia.observaciones_inspeccion:
-                            inspeccion_msg += "\n\nObservaciones de la inspección:\n" + transferencia.observaciones_inspeccion
-                        noti = Notificacion.objects.create(
-                            usuario=admin,
-                            titulo='🔔 Inspección de transferencia completada',
-                            mensaje=inspeccion_msg,
-                            tipo='info',
-                        )
-                        try:
-                            noti.url = reverse('notificaciones:detalle_usuario', args=[noti.id])
-                            noti.save()
-                        except Exception:
-                            pass
+                    # Incluir las observaciones de inspección en el mensaje para que se muestren
+                    inspeccion_msg = f'El empleado {empleado.usuario.get_full_name()} ha completado la inspección del vehículo {transferencia.vehiculo} para la transferencia hacia {transferencia.empleado_origen.usuario.get_full_name()}.'
+                    if transferencia.observaciones_inspeccion:
+                        inspeccion_msg += "\n\nObservaciones de la inspección:\n" + transferencia.observaciones_inspeccion
+                    notificar(
+                        'staff',
+                        titulo='🔔 Inspección de transferencia completada',
+                        mensaje=inspeccion_msg,
+                        tipo='info',
+                        url=_url_detalle_notificacion,
+                    )
                 except Exception:
                     # No bloquear la operación si falla el envío de notificaciones a admins
                     pass
@@ -382,7 +367,7 @@ def inspeccionar_vehiculo(request, pk):
 def responder_inspeccion(request, pk):
     """Vista para que el empleado origen responda a la inspección"""
     
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado:
         messages.error(request, 'Tu usuario no está asociado a un empleado.')
         return redirect('home')
@@ -477,19 +462,13 @@ def responder_inspeccion(request, pk):
                     )
                     # Notificar a administradores sobre la transferencia aprobada (desde inspección)
                     try:
-                        admins = Usuario.objects.filter(is_staff=True)
-                        for admin in admins:
-                            noti = Notificacion.objects.create(
-                                usuario=admin,
-                                titulo='🚚 Transferencia aprobada',
-                                mensaje=f'La transferencia del vehículo {transferencia.vehiculo} de {empleado.usuario.get_full_name()} a {transferencia.empleado_destino.usuario.get_full_name()} ha sido aprobada tras inspección.',
-                                tipo='info',
-                            )
-                            try:
-                                noti.url = reverse('notificaciones:detalle_usuario', args=[noti.id])
-                                noti.save()
-                            except Exception:
-                                pass
+                        notificar(
+                            'staff',
+                            titulo='🚚 Transferencia aprobada',
+                            mensaje=f'La transferencia del vehículo {transferencia.vehiculo} de {empleado.usuario.get_full_name()} a {transferencia.empleado_destino.usuario.get_full_name()} ha sido aprobada tras inspección.',
+                            tipo='info',
+                            url=_url_detalle_notificacion,
+                        )
                     except Exception:
                         pass
                     
@@ -508,22 +487,16 @@ def responder_inspeccion(request, pk):
                     )
                     # Notificar a administradores sobre el rechazo de la inspección
                     try:
-                        admins = Usuario.objects.filter(is_staff=True)
-                        for admin in admins:
-                            admin_msg = f'El empleado {empleado.usuario.get_full_name()} ha rechazado la inspección del vehículo {transferencia.vehiculo}.'
-                            if observaciones:
-                                admin_msg += "\n\nObservaciones de la respuesta:\n" + observaciones
-                            noti = Notificacion.objects.create(
-                                usuario=admin,
-                                titulo='🔔 Inspección Rechazada',
-                                mensaje=admin_msg,
-                                tipo='warning',
-                            )
-                            try:
-                                noti.url = reverse('notificaciones:detalle_usuario', args=[noti.id])
-                                noti.save()
-                            except Exception:
-                                pass
+                        admin_msg = f'El empleado {empleado.usuario.get_full_name()} ha rechazado la inspección del vehículo {transferencia.vehiculo}.'
+                        if observaciones:
+                            admin_msg += "\n\nObservaciones de la respuesta:\n" + observaciones
+                        notificar(
+                            'staff',
+                            titulo='🔔 Inspección Rechazada',
+                            mensaje=admin_msg,
+                            tipo='warning',
+                            url=_url_detalle_notificacion,
+                        )
                     except Exception:
                         pass
                     
@@ -552,7 +525,7 @@ def responder_inspeccion(request, pk):
 def mis_transferencias(request):
     """Vista para listar las transferencias del usuario"""
     
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado:
         messages.error(request, 'Tu usuario no está asociado a un empleado.')
         return redirect('home')
@@ -579,7 +552,7 @@ def mis_transferencias(request):
 @login_required
 def pedir_gasolina(request):
     """Permite al empleado subir comprobante de gasolina con precio; notifica a todos los admins."""
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado:
         messages.error(request, 'Tu usuario no está asociado a un empleado.')
         return redirect('perfil_usuario')
@@ -629,25 +602,13 @@ def pedir_gasolina(request):
             req.save()
 
             # Notificar a todos los administradores
-            admins = Usuario.objects.filter(is_staff=True)
-            for admin in admins:
-                try:
-                    url = reverse('admin:flota_vehicular_gasolinarequest_change', args=[req.pk])
-                except Exception:
-                    url = ''
-                mensaje = f'El empleado {empleado.usuario.get_full_name()} ha solicitado gasolina para {vehiculo or vehiculo_externo} por {req.precio} MXN.'
-                noti = Notificacion.objects.create(
-                    usuario=admin,
-                    titulo='📄 Nueva solicitud de gasolina',
-                    mensaje=mensaje,
-                    tipo='info',
-                    url=''
-                )
-                try:
-                    noti.url = reverse('notificaciones:admin_detalle', args=[noti.pk]) + f'?gasolina_id={req.pk}'
-                    noti.save()
-                except Exception:
-                    pass
+            notificar(
+                'staff',
+                titulo='📄 Nueva solicitud de gasolina',
+                mensaje=f'El empleado {empleado.usuario.get_full_name()} ha solicitado gasolina para {vehiculo or vehiculo_externo} por {req.precio} MXN.',
+                tipo='info',
+                url=lambda noti: reverse('notificaciones:admin_detalle', args=[noti.pk]) + f'?gasolina_id={req.pk}',
+            )
 
             messages.success(request, 'Solicitud enviada. Los administradores serán notificados.')
             return redirect('mi_vehiculo')
@@ -668,7 +629,7 @@ def subir_comprobante_gasolina(request, pk):
     """Permite al empleado subir el comprobante solo después de que su solicitud haya sido revisada
     (estado 'revisado' o 'rechazado'). La opción sólo aparece/está disponible si la solicitud no tiene comprobante.
     """
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado:
         messages.error(request, 'Tu usuario no está asociado a un empleado.')
         return redirect('perfil_usuario')
@@ -705,34 +666,22 @@ def subir_comprobante_gasolina(request, pk):
 
             # Respaldo: notificar a administradores si no lo hizo la señal (chequeo idempotente)
             try:
-                from apps.usuarios.models import Usuario
-                admins = Usuario.objects.filter(is_staff=True)
-                for admin in admins:
-                    titulo_admin = '📥 Comprobante de gasolina subido'
-                    # Evitar duplicados buscando notificaciones que ya referencien esta gasolina_id
-                    if Notificacion.objects.filter(usuario=admin, titulo=titulo_admin, url__contains=f'gasolina_id={req.pk}').exists():
-                        continue
-                    mensaje_admin = f'El empleado {req.empleado.usuario.get_full_name()} ha subido un comprobante de gasolina para {req.vehiculo or req.vehiculo_externo} por ${req.precio}.'
-                    try:
-                        if req.comprobante:
-                            mensaje_admin += f' Comprobante: {req.comprobante.url}'
-                    except Exception:
-                        pass
-                    try:
-                        noti = Notificacion.objects.create(
-                            usuario=admin,
-                            titulo=titulo_admin,
-                            mensaje=mensaje_admin,
-                            tipo='info',
-                            url=''
-                        )
-                        try:
-                            noti.url = reverse('notificaciones:admin_detalle', args=[noti.pk]) + f'?gasolina_id={req.pk}'
-                            noti.save()
-                        except Exception:
-                            pass
-                    except Exception:
-                        pass
+                titulo_admin = '📥 Comprobante de gasolina subido'
+                mensaje_admin = f'El empleado {req.empleado.usuario.get_full_name()} ha subido un comprobante de gasolina para {req.vehiculo or req.vehiculo_externo} por ${req.precio}.'
+                try:
+                    if req.comprobante:
+                        mensaje_admin += f' Comprobante: {req.comprobante.url}'
+                except Exception:
+                    pass
+                notificar(
+                    'staff',
+                    titulo=titulo_admin,
+                    mensaje=mensaje_admin,
+                    tipo='info',
+                    url=lambda noti: reverse('notificaciones:admin_detalle', args=[noti.pk]) + f'?gasolina_id={req.pk}',
+                    # Misma clave que la señal: si ya notificó, el INSERT se descarta
+                    dedupe_key=f'gasolina_comprobante:{req.pk}',
+                )
             except Exception:
                 pass
             messages.success(request, 'Comprobante subido correctamente. Gracias.')
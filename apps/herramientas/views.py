@@ -4,10 +4,9 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
 from django.db import transaction
-from apps.recursos_humanos.models import Empleado
 from .models import Herramienta, AsignacionHerramienta, TransferenciaHerramienta
 from apps.notificaciones.models import Notificacion
-from django.contrib.auth import get_user_model
+from apps.notificaciones.servicios import notificar
 from django.http import HttpResponseForbidden
 from .forms import SolicitudTransferenciaHerramientaForm, RespuestaTransferenciaHerramientaForm
 from django import forms
@@ -17,19 +16,7 @@ def _notificar_admins(titulo: str, mensaje: str, url: str = '', exclude_ids=None
     """Crea una notificación para todos los usuarios administradores (is_staff) excepto los excluidos.
     exclude_ids: iterable de IDs de usuarios a omitir.
     """
-    User = get_user_model()
-    qs = User.objects.filter(is_staff=True, is_active=True)
-    if exclude_ids:
-        qs = qs.exclude(id__in=list(exclude_ids))
-    objetos = [Notificacion(
-        usuario=u,
-        titulo=titulo,
-        mensaje=mensaje,
-        tipo='info',
-        url=url or ''
-    ) for u in qs]
-    if objetos:
-        Notificacion.objects.bulk_create(objetos)
+    notificar('staff', titulo, mensaje, tipo='info', url=url or '', excluir=exclude_ids)
 
 
 class HerramientasView(ListView):
@@ -42,7 +29,7 @@ class HerramientasView(ListView):
 
 @login_required
 def mi_herramienta(request):
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado:
         messages.error(request, 'Tu usuario no está vinculado a un empleado.')
         return redirect('perfil_usuario')
@@ -72,7 +59,7 @@ def mi_herramienta(request):
 @login_required
 def mis_herramientas(request):
     """Vista para mostrar la lista de herramientas asignadas al usuario"""
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado:
         messages.error(request, 'Tu usuario no está vinculado a un empleado.')
         return redirect('perfil_usuario')
@@ -97,7 +84,7 @@ def mis_herramientas(request):
 @login_required
 def detalle_herramienta(request, herramienta_id):
     """Vista para mostrar los detalles de una herramienta específica"""
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado:
         messages.error(request, 'Tu usuario no está vinculado a un empleado.')
         return redirect('perfil_usuario')
@@ -119,7 +106,7 @@ def detalle_herramienta(request, herramienta_id):
 
 @login_required
 def solicitar_transferencia_herramienta(request):
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado:
         messages.error(request, 'Tu usuario no está asociado a un empleado.')
         return redirect('perfil_usuario')
@@ -195,7 +182,7 @@ def solicitar_transferencia_herramienta(request):
 @login_required
 def transferencia_detalle(request, pk):
     transferencia = get_object_or_404(TransferenciaHerramienta.objects.select_related('herramienta', 'empleado_origen__usuario', 'empleado_destino__usuario'), pk=pk)
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado or (transferencia.empleado_origen != empleado and transferencia.empleado_destino != empleado):
         messages.error(request, 'No puedes ver esta transferencia.')
         return redirect('perfil_usuario')
@@ -214,7 +201,7 @@ def responder_transferencia_herramienta(request, pk):
     # Si la vista fue abierta desde una notificación, los administradores no deben poder responder
     if request.GET.get('from_notification') and request.user.is_superuser:
         return HttpResponseForbidden('Los administradores no pueden responder notificaciones.')
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     es_destino = empleado and transferencia.empleado_destino == empleado
     es_origen = empleado and transferencia.empleado_origen == empleado
     if not empleado:
@@ -375,7 +362,7 @@ def inspeccionar_herramienta(request, pk):
     # Bloquear administración desde notificaciones
     if request.GET.get('from_notification') and request.user.is_superuser:
         return HttpResponseForbidden('Los administradores no pueden responder notificaciones.')
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado or transferencia.empleado_destino != empleado:
         messages.error(request, 'No puedes inspeccionar esta transferencia.')
         return redirect('perfil_usuario')
@@ -435,7 +422,7 @@ def inspeccionar_herramienta(request, pk):
 
 @login_required
 def mis_transferencias_herramientas(request):
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado:
         messages.error(request, 'Tu usuario no está asociado a un empleado.')
         return redirect('perfil_usuario')
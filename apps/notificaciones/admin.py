@@ -84,12 +84,12 @@ class NotificacionAdmin(admin.ModelAdmin):
     actions = ['marcar_como_leidas', 'marcar_como_no_leidas']
 
     def marcar_como_leidas(self, request, queryset):
-        updated = queryset.update(leida=True)
+        updated = queryset.marcar_leidas()
         self.message_user(request, f'{updated} notificaciones marcadas como leídas.')
     marcar_como_leidas.short_description = "Marcar seleccionadas como leídas"
 
     def marcar_como_no_leidas(self, request, queryset):
-        updated = queryset.update(leida=False)
+        updated = queryset.marcar_no_leidas()
         self.message_user(request, f'{updated} notificaciones marcadas como no leídas.')
     marcar_como_no_leidas.short_description = "Marcar seleccionadas como no leídas"
 
@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class NotificacionesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.notificaciones'
-    verbose_name = 'Notificaciones'
\ No newline at end of file
+    verbose_name = 'Notificaciones'
+
+    def ready(self):
+        # Conectar la invalidación del cache de destinatarios por rol
+        from . import servicios  # noqa: F401
@@ -1,11 +1,16 @@
-from .models import Notificacion
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from .models import conteo_no_leidas
 
 def notificaciones(request):
+    # Los fragmentos HTMX no dibujan el badge; el conteo sólo se consulta si la plantilla lo lee
+    htmx = getattr(request, 'htmx', None)
+    if htmx and not htmx.boosted and not htmx.history_restore_request:
+        return {}
     if request.user.is_authenticated:
         return {
-            'notificaciones_pendientes': Notificacion.objects.filter(
-                usuario=request.user, 
-                leida=False
-            ).count()
+            'notificaciones_pendientes': SimpleLazyObject(lambda: conteo_no_leidas(request.user.pk)),
+            # El script de EventSource sólo se emite si el stream se sirve con ASGI
+            'notificaciones_sse': getattr(settings, 'NOTIFICACIONES_SSE', False),
         }
-    return {'notificaciones_pendientes': 0}
\ No newline at end of file
+    return {'notificaciones_pendientes': 0}
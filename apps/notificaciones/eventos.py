@@ -0,0 +1,214 @@
+"""
+Publicación de cambios de notificaciones para el endpoint de Server-Sent Events.
+
+Cuando cambia el contador de un usuario se publica un evento pequeño
+(`{"u": usuario_id, "n": notificacion_id}`). Con PostgreSQL se usa NOTIFY, de
+modo que cualquier proceso (workers WSGI, admin, comandos) puede publicar y los
+procesos ASGI lo reciben con un único LISTEN por proceso. Con otros motores se
+usa un broker en memoria que sólo alcanza a los clientes del mismo proceso
+(suficiente para desarrollo).
+
+Los clientes conectados esperan en una asyncio.Queue; mientras no hay eventos
+no se hace ninguna consulta.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+CANAL = 'soma_notificaciones'
+# Comentario SSE periódico para que proxies y balanceadores no cierren la conexión
+LATIDO_SEGUNDOS = 25
+# Las conexiones se cierran tras este tiempo y el navegador reconecta solo; así una
+# desconexión que el servidor no detecte no deja el generador vivo indefinidamente
+DURACION_MAXIMA_SEGUNDOS = 5 * 60
+RECONEXION_MS = 3000
+# Eventos por NOTIFY en publicar_lote (~20 bytes cada uno)
+EVENTOS_POR_AVISO = 300
+
+
+def _usa_postgres(alias='default'):
+    return connections[alias].vendor == 'postgresql'
+
+
+def publicar(usuario_id, notificacion_id=None):
+    """Avisa a los clientes SSE del usuario que su contador cambió.
+
+    En PostgreSQL, NOTIFY dentro de una transacción se entrega al confirmar y se
+    descarta si hay rollback; además varios NOTIFY idénticos se agrupan en uno.
+    """
+    if not usuario_id:
+        return
+    payload = {'u': usuario_id, 'n': notificacion_id}
+    if _usa_postgres():
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_notify(%s, %s)', [CANAL, json.dumps(payload)])
+        except Exception:
+            logger.exception('No se pudo publicar el evento de notificaciones')
+    else:
+        transaction.on_commit(lambda: suscripciones.despachar(payload))
+
+
+def publicar_lote(eventos):
+    """Versión por lotes de `publicar`: `eventos` es un iterable de (usuario_id, notificacion_id).
+
+    En PostgreSQL los eventos viajan en pocos NOTIFY (`{"l": [[u, n], ...]}`,
+    troceados para no rebasar el límite de 8000 bytes del payload).
+    """
+    eventos = [[usuario_id, notificacion_id] for usuario_id, notificacion_id in eventos if usuario_id]
+    if len(eventos) == 1:
+        publicar(*eventos[0])
+        return
+    for inicio in range(0, len(eventos), EVENTOS_POR_AVISO):
+        payload = {'l': eventos[inicio:inicio + EVENTOS_POR_AVISO]}
+        if _usa_postgres():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT pg_notify(%s, %s)', [CANAL, json.dumps(payload)])
+            except Exception:
+                logger.exception('No se pudo publicar el evento de notificaciones')
+        else:
+            transaction.on_commit(lambda payload=payload: suscripciones.despachar(payload))
+
+
+class _Suscripciones:
+    """Colas asyncio de los clientes conectados en este proceso, por usuario."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._colas = {}
+        self._listener = None
+
+    def suscribir(self, usuario_id):
+        cola = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._colas.setdefault(usuario_id, set()).add((loop, cola))
+            if _usa_postgres() and (self._listener is None or not self._listener.is_alive()):
+                self._listener = threading.Thread(target=_escuchar_postgres, name='soma-notificaciones-listen',
+                                                  daemon=True)
+                self._listener.start()
+        return cola
+
+    def cancelar(self, usuario_id, cola):
+        with self._lock:
+            colas = self._colas.get(usuario_id)
+            if not colas:
+                return
+            colas.difference_update({item for item in colas if item[1] is cola})
+            if not colas:
+                del self._colas[usuario_id]
+
+    def despachar(self, payload):
+        if 'l' in payload:
+            for usuario_id, notificacion_id in payload['l']:
+                self.despachar({'u': usuario_id, 'n': notificacion_id})
+            return
+        usuario_id = payload.get('u')
+        with self._lock:
+            destinos = list(self._colas.get(usuario_id, ()))
+        for loop, cola in destinos:
+            try:
+                loop.call_soon_threadsafe(cola.put_nowait, payload)
+            except RuntimeError:
+                # El loop ya se cerró; la suscripción se limpia al terminar el stream
+                pass
+
+
+suscripciones = _Suscripciones()
+
+
+def _escuchar_postgres():
+    """Hilo de fondo: un LISTEN por proceso que reparte los NOTIFY a las colas."""
+    espera = 1
+    while True:
+        conn = None
+        try:
+            db = connections['default']
+            conn = db.get_new_connection(db.get_connection_params())
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {CANAL}')
+            espera = 1
+            while True:
+                # Bloquea sin consumir CPU hasta que llegue un NOTIFY
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    aviso = conn.notifies.pop(0)
+                    try:
+                        suscripciones.despachar(json.loads(aviso.payload))
+                    except ValueError:
+                        logger.warning('Payload de notificación inválido: %s', aviso.payload)
+        except Exception:
+            logger.exception('Se perdió la conexión LISTEN de notificaciones; reintentando')
+            time.sleep(espera)
+            espera = min(espera * 2, 60)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+def _evento_sse(evento, datos):
+    return f'event: {evento}\ndata: {json.dumps(datos)}\n\n'
+
+
+def _datos_notificacion(notificacion_id, usuario_id):
+    from .models import Notificacion
+    notif = (Notificacion.objects
+             .filter(pk=notificacion_id, usuario_id=usuario_id)
+             .only('id', 'titulo', 'tipo', 'url', 'fecha_creacion', 'leida')
+             .first())
+    if notif is None:
+        return None
+    return {
+        'id': notif.id,
+        'titulo': notif.display_title,
+        'tipo': notif.tipo,
+        'url': notif.url,
+        'fecha': notif.display_fecha_creacion,
+        'leida': notif.leida,
+    }
+
+
+def _conteo(usuario_id):
+    from .models import conteo_no_leidas
+    return conteo_no_leidas(usuario_id)
+
+
+async def stream_usuario(usuario_id):
+    """Generador SSE: envía el conteo inicial y luego sólo cuando llega un evento."""
+    cola = suscripciones.suscribir(usuario_id)
+    try:
+        yield f'retry: {RECONEXION_MS}\n\n'
+        yield _evento_sse('conteo', {'pendientes': await sync_to_async(_conteo)(usuario_id)})
+        limite = time.monotonic() + DURACION_MAXIMA_SEGUNDOS
+        while time.monotonic() < limite:
+            try:
+                payload = await asyncio.wait_for(cola.get(), timeout=LATIDO_SEGUNDOS)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            # Agrupar los eventos acumulados (p. ej. un bulk_create) en una sola lectura
+            pendientes = [payload]
+            while not cola.empty():
+                pendientes.append(cola.get_nowait())
+            for notificacion_id in dict.fromkeys(p.get('n') for p in pendientes if p.get('n')):
+                datos = await sync_to_async(_datos_notificacion)(notificacion_id, usuario_id)
+                if datos:
+                    yield _evento_sse('notificacion', datos)
+            yield _evento_sse('conteo', {'pendientes': await sync_to_async(_conteo)(usuario_id)})
+    finally:
+        suscripciones.cancelar(usuario_id, cola)
@@ -0,0 +1,79 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.notificaciones.models import Notificacion, NotificacionArchivada, ajustar_contadores
+
+CAMPOS = ['id', 'usuario_id', 'titulo', 'mensaje', 'tipo', 'fecha_creacion', 'url', 'dedupe_key']
+
+
+class Command(BaseCommand):
+    help = ('Mueve a NotificacionArchivada las notificaciones leídas más antiguas que la retención '
+            '(NOTIFICACIONES_RETENCION_DIAS) y las borra de la tabla principal por lotes')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=getattr(settings, 'NOTIFICACIONES_RETENCION_DIAS', 90),
+            help='Antigüedad mínima en días (por defecto NOTIFICACIONES_RETENCION_DIAS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Notificaciones por lote (por defecto 1000)',
+        )
+        parser.add_argument(
+            '--purgar',
+            action='store_true',
+            help='Borrar sin copiar al archivo',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo mostrar cuántas notificaciones se archivarían',
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['dias'])
+        batch_size = max(1, options['batch_size'])
+        # Las notificaciones con respuestas se conservan: borrarlas eliminaría las respuestas en cascada
+        candidatas = Notificacion.objects.filter(leida=True, fecha_creacion__lt=limite, respuestas__isnull=True)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: No se harán cambios'))
+            self.stdout.write(f'Notificaciones a archivar: {candidatas.count()}')
+            return
+
+        total = 0
+        while True:
+            with transaction.atomic():
+                # Bloquear el lote; lo que otra ejecución tenga bloqueado se omite
+                filas = list(candidatas
+                             .select_for_update(skip_locked=True, of=('self',))
+                             .order_by('id')
+                             .values(*CAMPOS)[:batch_size])
+                if not filas:
+                    break
+                if not options['purgar']:
+                    NotificacionArchivada.objects.bulk_create(
+                        [NotificacionArchivada(**fila) for fila in filas], ignore_conflicts=True
+                    )
+                # Borrado directo: delete() cargaría cada fila y su post_delete haría un UPDATE al
+                # contador por notificación. Las candidatas no tienen respuestas que borrar en cascada
+                # y el contador se ajusta abajo con un delta por usuario
+                Notificacion.objects.filter(pk__in=[fila['id'] for fila in filas])._raw_delete(Notificacion.objects.db)
+                # Son leídas: sólo cambia el total, no el badge
+                ajustar_contadores({usuario_id: (0, -n, None)
+                                    for usuario_id, n in Counter(fila['usuario_id'] for fila in filas).items()},
+                                   crear=False)
+            total += len(filas)
+            self.stdout.write(f'Lote procesado: {len(filas)} (acumulado {total})')
+
+        accion = 'eliminadas' if options['purgar'] else 'archivadas'
+        self.stdout.write(self.style.SUCCESS(f'Notificaciones {accion}: {total}'))
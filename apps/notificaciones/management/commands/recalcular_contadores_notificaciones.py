@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from apps.notificaciones.models import ContadorNotificaciones, Notificacion
+from apps.usuarios.models import Usuario
+
+
+class Command(BaseCommand):
+    help = 'Crea o corrige los contadores de notificaciones (no leídas / total) de cada usuario'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo mostrar los contadores desajustados sin modificarlos',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Usuarios procesados por lote (por defecto 1000)',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = max(1, options['batch_size'])
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('MODO DRY-RUN: No se harán cambios'))
+
+        creados = corregidos = 0
+        usuario_ids = list(Usuario.objects.order_by('pk').values_list('pk', flat=True))
+        for inicio in range(0, len(usuario_ids), batch_size):
+            lote = usuario_ids[inicio:inicio + batch_size]
+            # Conteos reales del lote en una sola consulta agrupada
+            reales = {
+                fila['usuario_id']: (fila['no_leidas'], fila['total'])
+                for fila in (Notificacion.objects
+                             .filter(usuario_id__in=lote)
+                             .order_by()
+                             .values('usuario_id')
+                             .annotate(total=Count('id'), no_leidas=Count('id', filter=Q(leida=False))))
+            }
+            existentes = ContadorNotificaciones.objects.in_bulk(lote)
+
+            nuevos, a_corregir = [], []
+            for usuario_id in lote:
+                no_leidas, total = reales.get(usuario_id, (0, 0))
+                contador = existentes.get(usuario_id)
+                if contador is None:
+                    nuevos.append(ContadorNotificaciones(usuario_id=usuario_id, no_leidas=no_leidas, total=total))
+                elif (contador.no_leidas, contador.total) != (no_leidas, total):
+                    self.stdout.write(
+                        f'Usuario {usuario_id}: {contador.no_leidas}/{contador.total} -> {no_leidas}/{total}'
+                    )
+                    contador.no_leidas, contador.total = no_leidas, total
+                    a_corregir.append(contador)
+
+            creados += len(nuevos)
+            corregidos += len(a_corregir)
+            if not dry_run:
+                with transaction.atomic():
+                    ContadorNotificaciones.objects.bulk_create(nuevos, ignore_conflicts=True)
+                    ContadorNotificaciones.objects.bulk_update(a_corregir, ['no_leidas', 'total'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Contadores creados: {creados}. Contadores corregidos: {corregidos}.'
+        ))
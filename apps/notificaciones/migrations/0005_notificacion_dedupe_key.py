@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificaciones', '0004_contadornotificaciones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='dedupe_key',
+            field=models.CharField(blank=True, editable=False, max_length=150, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='notificacion',
+            constraint=models.UniqueConstraint(condition=models.Q(('dedupe_key__isnull', False)), fields=('usuario', 'dedupe_key'), name='notificacion_usuario_dedupe_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notificaciones', '0005_notificacion_dedupe_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('titulo', models.CharField(max_length=200)),
+                ('mensaje', models.TextField()),
+                ('tipo', models.CharField(choices=[('info', 'Información'), ('warning', 'Advertencia'), ('success', 'Éxito'), ('danger', 'Urgente')], default='info', max_length=30)),
+                ('fecha_creacion', models.DateTimeField()),
+                ('url', models.URLField(blank=True)),
+                ('dedupe_key', models.CharField(blank=True, max_length=150, null=True)),
+                ('fecha_archivado', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Notificación archivada',
+                'verbose_name_plural': 'Notificaciones archivadas',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', 'leida', '-fecha_creacion'], name='notif_usuario_leida_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', '-fecha_creacion'], name='notif_usuario_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificacionarchivada',
+            name='usuario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
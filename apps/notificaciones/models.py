@@ -1,5 +1,84 @@
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Count, F, Q
+from django.db.models.constants import OnConflict
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
 from apps.usuarios.models import Usuario
+from .eventos import publicar, publicar_lote
+
+
+class NotificacionQuerySet(models.QuerySet):
+    """Operaciones masivas que mantienen sincronizado ContadorNotificaciones.
+
+    `update()` y `bulk_create()` no disparan señales, por lo que estos métodos
+    calculan el delta por usuario y lo aplican al contador en lote
+    (`ajustar_contadores`).
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if kwargs.get('ignore_conflicts'):
+            if args or not connections[self.db].features.can_return_rows_from_bulk_insert:
+                # Sin RETURNING no se sabe qué filas se omitieron: recalcular en una sola pasada
+                objs = super().bulk_create(objs, *args, **kwargs)
+                recalcular_contadores({obj.usuario_id for obj in objs})
+                return objs
+            objs = list(objs)
+            insertadas = self._insertar_omitiendo_conflictos(objs, kwargs.get('batch_size'))
+        else:
+            objs = insertadas = super().bulk_create(objs, *args, **kwargs)
+        deltas = {}
+        for obj in insertadas:
+            no_leidas, total, _ = deltas.get(obj.usuario_id, (0, 0, None))
+            deltas[obj.usuario_id] = (no_leidas + (0 if obj.leida else 1), total + 1, obj.pk)
+        ajustar_contadores(deltas)
+        return objs
+
+    def _insertar_omitiendo_conflictos(self, objs, batch_size=None):
+        """INSERT ... ON CONFLICT DO NOTHING RETURNING por lotes.
+
+        Asigna pk sólo a las filas que realmente se insertaron (el resto las
+        descartó el índice único de `dedupe_key`) y las devuelve.
+        """
+        opts = self.model._meta
+        connection = connections[self.db]
+        self._prepare_for_bulk_create(objs)
+        campos = [f for f in opts.concrete_fields if not f.primary_key]
+        retorno = [opts.pk, opts.get_field('usuario'), opts.get_field('dedupe_key')]
+        lote = max(1, min(batch_size or len(objs), connection.ops.bulk_batch_size(campos, objs)))
+        pendientes = {}
+        for obj in objs:
+            pendientes.setdefault((obj.usuario_id, obj.dedupe_key), []).append(obj)
+        insertadas = []
+        for inicio in range(0, len(objs), lote):
+            filas = self._insert(objs[inicio:inicio + lote], fields=campos, using=self.db,
+                                 on_conflict=OnConflict.IGNORE, returning_fields=retorno)
+            # Con un solo objeto el backend devuelve [None] si hubo conflicto
+            for pk, usuario_id, dedupe_key in filter(None, filas):
+                obj = pendientes[(usuario_id, dedupe_key)].pop(0)
+                obj.pk = pk
+                obj._state.adding = False
+                obj._state.db = self.db
+                insertadas.append(obj)
+        return insertadas
+
+    def _marcar(self, leida):
+        with transaction.atomic():
+            # Filas que realmente cambian de estado, agrupadas por usuario
+            por_usuario = list(self.filter(leida=not leida)
+                               .order_by()
+                               .values('usuario_id')
+                               .annotate(n=Count('id')))
+            updated = self.filter(leida=not leida).update(leida=leida)
+            ajustar_contadores({fila['usuario_id']: (-fila['n'] if leida else fila['n'], 0, None)
+                                for fila in por_usuario})
+        return updated
+
+    def marcar_leidas(self):
+        return self._marcar(True)
+
+    def marcar_no_leidas(self):
+        return self._marcar(False)
+
 
 class Notificacion(models.Model):
     TIPOS_NOTIFICACION = [
@@ -16,11 +95,29 @@ class Notificacion(models.Model):
     leida = models.BooleanField(default=False)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     url = models.URLField(blank=True)
+    # Clave opcional para no repetir el mismo aviso al mismo usuario (p. ej. 'gasolina_estado:15:revisado').
+    # Se crea con bulk_create(ignore_conflicts=True) y el índice único descarta el duplicado.
+    dedupe_key = models.CharField(max_length=150, null=True, blank=True, editable=False)
+
+    objects = NotificacionQuerySet.as_manager()
     
     class Meta:
         verbose_name = 'Notificación'
         verbose_name_plural = 'Notificaciones'
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Bandeja filtrada por leídas/no leídas y paginada por cursor
+            models.Index(fields=['usuario', 'leida', '-fecha_creacion'], name='notif_usuario_leida_fecha_idx'),
+            # Bandeja completa y dropdown (últimas del usuario)
+            models.Index(fields=['usuario', '-fecha_creacion'], name='notif_usuario_fecha_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['usuario', 'dedupe_key'],
+                condition=Q(dedupe_key__isnull=False),
+                name='notificacion_usuario_dedupe_key_uniq',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.titulo} - {self.usuario}"
@@ -97,4 +194,191 @@ class RespuestaNotificacion(models.Model):
     def __str__(self):
         return f"Respuesta de {self.usuario} a {self.notificacion}" 
 
-    # Helpers / display properties
\ No newline at end of file
+    # Helpers / display properties
+
+
+class NotificacionArchivada(models.Model):
+    """Notificaciones leídas movidas fuera de la tabla principal por `archivar_notificaciones`.
+
+    Conserva el id original para poder rastrear enlaces antiguos.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='+')
+    titulo = models.CharField(max_length=200)
+    mensaje = models.TextField()
+    tipo = models.CharField(max_length=30, choices=Notificacion.TIPOS_NOTIFICACION, default='info')
+    fecha_creacion = models.DateTimeField()
+    url = models.URLField(blank=True)
+    dedupe_key = models.CharField(max_length=150, null=True, blank=True)
+    fecha_archivado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Notificación archivada'
+        verbose_name_plural = 'Notificaciones archivadas'
+        ordering = ['-fecha_creacion']
+
+    def __str__(self):
+        return f"{self.titulo} - {self.usuario}"
+
+
+class ContadorNotificaciones(models.Model):
+    """Conteo desnormalizado de notificaciones por usuario (badge del header).
+
+    Se mantiene con expresiones F() desde las señales de Notificacion y desde
+    NotificacionQuerySet. Si falta la fila se recalcula a partir de la tabla de
+    notificaciones; `recalcular_contadores_notificaciones` repara desajustes.
+    """
+    usuario = models.OneToOneField(Usuario, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='contador_notificaciones')
+    no_leidas = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Contador de notificaciones'
+        verbose_name_plural = 'Contadores de notificaciones'
+
+    def __str__(self):
+        return f"{self.usuario}: {self.no_leidas}/{self.total}"
+
+    @property
+    def leidas(self):
+        return self.total - self.no_leidas
+
+
+def recalcular_contador(usuario_id):
+    """Recalcula el contador del usuario desde la tabla de notificaciones."""
+    conteo = Notificacion.objects.filter(usuario_id=usuario_id).aggregate(
+        total=Count('id'),
+        no_leidas=Count('id', filter=Q(leida=False)),
+    )
+    try:
+        with transaction.atomic():
+            contador, _ = ContadorNotificaciones.objects.update_or_create(
+                usuario_id=usuario_id,
+                defaults={'no_leidas': conteo['no_leidas'], 'total': conteo['total']},
+            )
+    except IntegrityError:
+        # Otra petición creó la fila al mismo tiempo; su valor ya es correcto
+        contador = ContadorNotificaciones.objects.get(usuario_id=usuario_id)
+    return contador
+
+
+def recalcular_contadores(usuario_ids, avisar=True):
+    """Versión por lotes de recalcular_contador: un agregado agrupado y un upsert."""
+    usuario_ids = [pk for pk in set(usuario_ids) if pk]
+    if not usuario_ids:
+        return
+    conteos = {
+        fila['usuario_id']: fila
+        for fila in (Notificacion.objects
+                     .filter(usuario_id__in=usuario_ids)
+                     .order_by()
+                     .values('usuario_id')
+                     .annotate(total=Count('id'), no_leidas=Count('id', filter=Q(leida=False))))
+    }
+    ContadorNotificaciones.objects.bulk_create(
+        [ContadorNotificaciones(usuario_id=pk,
+                                no_leidas=conteos.get(pk, {}).get('no_leidas', 0),
+                                total=conteos.get(pk, {}).get('total', 0))
+         for pk in usuario_ids],
+        update_conflicts=True,
+        unique_fields=['usuario'],
+        update_fields=['no_leidas', 'total'],
+    )
+    if avisar:
+        publicar_lote((pk, None) for pk in usuario_ids)
+
+
+def ajustar_contador(usuario_id, no_leidas=0, total=0, crear=True, notificacion_id=None):
+    """Aplica un delta atómico al contador del usuario (creándolo si no existe y `crear`)
+    y avisa a sus clientes SSE."""
+    if not usuario_id or (not no_leidas and not total):
+        return
+    actualizados = ContadorNotificaciones.objects.filter(usuario_id=usuario_id).update(
+        no_leidas=F('no_leidas') + no_leidas,
+        total=F('total') + total,
+    )
+    if not actualizados and crear:
+        # El recálculo ya incluye el cambio actual porque corre en la misma transacción
+        recalcular_contador(usuario_id)
+    publicar(usuario_id, notificacion_id)
+
+
+def ajustar_contadores(deltas, crear=True):
+    """Versión por lotes de ajustar_contador: `deltas` es {usuario_id: (no_leidas, total, notificacion_id)}.
+
+    Un UPDATE por cada par de deltas distinto (en un fan-out todos los
+    destinatarios suman lo mismo, así que es uno solo), el recálculo sólo de
+    los usuarios sin fila (si `crear`) y un aviso SSE por lote. El costo no
+    crece con el número de usuarios.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if pk and (delta[0] or delta[1])}
+    if not deltas:
+        return
+    faltantes = set()
+    if crear:
+        faltantes = set(deltas) - set(ContadorNotificaciones.objects
+                                      .filter(usuario_id__in=list(deltas))
+                                      .values_list('usuario_id', flat=True))
+    por_delta = {}
+    for pk, (no_leidas, total, _) in deltas.items():
+        if pk not in faltantes:
+            por_delta.setdefault((no_leidas, total), []).append(pk)
+    for (no_leidas, total), ids in por_delta.items():
+        ContadorNotificaciones.objects.filter(usuario_id__in=ids).update(
+            no_leidas=F('no_leidas') + no_leidas,
+            total=F('total') + total,
+        )
+    if faltantes:
+        # El recálculo ya incluye el cambio actual porque corre en la misma transacción
+        recalcular_contadores(faltantes, avisar=False)
+    publicar_lote((pk, notificacion_id) for pk, (_, _, notificacion_id) in deltas.items())
+
+
+def get_contador(usuario_id):
+    """Devuelve el ContadorNotificaciones del usuario con una sola búsqueda por PK."""
+    try:
+        return ContadorNotificaciones.objects.get(pk=usuario_id)
+    except ContadorNotificaciones.DoesNotExist:
+        return recalcular_contador(usuario_id)
+
+
+def conteo_no_leidas(usuario_id):
+    return get_contador(usuario_id).no_leidas
+
+
+@receiver(post_init, sender=Notificacion)
+def notificacion_post_init(sender, instance, **kwargs):
+    # Estado cargado de la BD, para calcular el delta al guardar
+    instance._contador_original = (instance.__dict__.get('usuario_id'), instance.__dict__.get('leida'))
+
+
+@receiver(post_save, sender=Notificacion)
+def notificacion_post_save(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    no_leida = 0 if instance.leida else 1
+    if created:
+        ajustar_contador(instance.usuario_id, no_leidas=no_leida, total=1, notificacion_id=instance.pk)
+    else:
+        usuario_original, leida_original = getattr(instance, '_contador_original', (None, None))
+        if usuario_original is None or leida_original is None:
+            # Instancia cargada con only()/defer(); no se conoce el estado previo
+            recalcular_contador(instance.usuario_id)
+        elif usuario_original != instance.usuario_id:
+            ajustar_contador(usuario_original, no_leidas=-(0 if leida_original else 1), total=-1)
+            ajustar_contador(instance.usuario_id, no_leidas=no_leida, total=1)
+        elif leida_original != instance.leida:
+            ajustar_contador(instance.usuario_id, no_leidas=1 if no_leida else -1)
+    instance._contador_original = (instance.usuario_id, instance.leida)
+
+
+@receiver(post_delete, sender=Notificacion)
+def notificacion_post_delete(sender, instance, **kwargs):
+    # QuerySet.delete() y los borrados en cascada también envían post_delete por objeto
+    usuario_original, leida_original = getattr(instance, '_contador_original', (instance.usuario_id, instance.leida))
+    if leida_original is None:
+        leida_original = instance.leida
+    # Sin crear la fila: el usuario podría estar borrándose en cascada
+    ajustar_contador(usuario_original or instance.usuario_id,
+                     no_leidas=0 if leida_original else -1, total=-1, crear=False)
@@ -0,0 +1,47 @@
+"""
+Paginación por cursor (keyset) para las bandejas de notificaciones.
+
+En lugar de OFFSET, cada página filtra las filas anteriores a la última
+mostrada según (fecha_creacion, id), de modo que el costo no crece con el
+número de página y se aprovechan los índices (usuario, leida, fecha_creacion)
+y (usuario, fecha_creacion).
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import Q
+
+TAMANO_PAGINA = 25
+
+
+def codificar_cursor(notificacion):
+    """Cursor opaco '<microsegundos UTC>.<id>' de la última fila de la página."""
+    fecha = notificacion.fecha_creacion.astimezone(dt_timezone.utc)
+    micros = int(fecha.timestamp()) * 1_000_000 + fecha.microsecond
+    return f'{micros}.{notificacion.pk}'
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (fecha_creacion, id) o None si el cursor no es válido."""
+    try:
+        micros, pk = cursor.split('.', 1)
+        micros, pk = int(micros), int(pk)
+        segundos, resto = divmod(micros, 1_000_000)
+        return datetime.fromtimestamp(segundos, tz=dt_timezone.utc).replace(microsecond=resto), pk
+    except (AttributeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def paginar(queryset, cursor=None, tamano=TAMANO_PAGINA):
+    """Devuelve (filas, siguiente_cursor) ordenando por fecha_creacion e id descendentes.
+
+    `siguiente_cursor` es None en la última página.
+    """
+    queryset = queryset.order_by('-fecha_creacion', '-id')
+    posicion = decodificar_cursor(cursor) if cursor else None
+    if posicion:
+        fecha, pk = posicion
+        queryset = queryset.filter(Q(fecha_creacion__lt=fecha) | Q(fecha_creacion=fecha, id__lt=pk))
+    # Una fila extra indica si hay otra página sin hacer COUNT
+    filas = list(queryset[:tamano + 1])
+    siguiente = codificar_cursor(filas[tamano - 1]) if len(filas) > tamano else None
+    return filas[:tamano], siguiente
@@ -0,0 +1,112 @@
+"""
+API para crear notificaciones a varios destinatarios ("fan-out").
+
+    from apps.notificaciones.servicios import notificar
+    notificar('staff', titulo, mensaje, tipo='success', url=url)
+
+Los destinatarios pueden ser un rol (ver ROLES), un QuerySet de Usuario, un
+Usuario, un id o un iterable de ellos. Los ids de cada rol se guardan en cache
+y se invalidan cuando cambia un usuario, así que notificar a N administradores
+cuesta un INSERT (más un UPDATE si la URL necesita el pk de la notificación).
+
+Para armar un aviso después del commit sin hacer esperar a la petición, usa
+`soma.tareas.en_segundo_plano()`.
+"""
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+
+from apps.usuarios.models import Usuario
+from soma.cache_version import bump_version, get_version
+from .models import Notificacion
+
+ROLES = {
+    # Usuarios con acceso al admin de Django
+    'staff': models.Q(is_staff=True, is_active=True),
+    'superusuarios': models.Q(is_superuser=True, is_active=True),
+    # Superusuarios con la bandera propia de la app (Usuario.activo)
+    'superusuarios_activos': models.Q(is_superuser=True, activo=True),
+    # Administradores de la aplicación (Usuario.es_administrador)
+    'admins': models.Q(activo=True) & (models.Q(tipo_usuario='admin') | models.Q(is_superuser=True)),
+}
+ROLES_TIMEOUT = 60 * 60
+_VERSION_KEY = 'notificaciones:roles:ver'
+
+
+
+def invalidar_roles():
+    bump_version(_VERSION_KEY)
+
+
+def ids_de_rol(rol):
+    """Ids (ordenados) de los usuarios del rol, desde cache."""
+    if rol not in ROLES:
+        raise ValueError(f'Rol de notificación desconocido: {rol}')
+    key = f'notificaciones:roles:{rol}:{get_version(_VERSION_KEY)}'
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(Usuario.objects.filter(ROLES[rol]).order_by('pk').values_list('pk', flat=True))
+        cache.set(key, ids, ROLES_TIMEOUT)
+    return ids
+
+
+def _resolver_ids(destinatarios):
+    if destinatarios is None:
+        return []
+    if isinstance(destinatarios, str):
+        return ids_de_rol(destinatarios)
+    if isinstance(destinatarios, models.QuerySet):
+        return list(destinatarios.values_list('pk', flat=True))
+    if isinstance(destinatarios, (models.Model, int)):
+        destinatarios = [destinatarios]
+    ids = []
+    for destinatario in destinatarios:
+        if isinstance(destinatario, str):
+            ids.extend(ids_de_rol(destinatario))
+        else:
+            ids.append(getattr(destinatario, 'pk', destinatario))
+    return ids
+
+
+def notificar(destinatarios, titulo, mensaje, tipo='info', url='', excluir=None, dedupe_key=None):
+    """Crea la misma notificación para cada destinatario con un solo bulk_create.
+
+    `url` puede ser una cadena o un callable que recibe la notificación ya
+    insertada (con pk) y devuelve la URL; en ese caso se guardan todas con un
+    único bulk_update. `excluir` es un iterable de usuarios o ids a omitir.
+    Con `dedupe_key` el índice único (usuario, dedupe_key) descarta a los
+    destinatarios que ya tienen ese aviso, sin consultar antes.
+    Devuelve la lista de notificaciones; con `dedupe_key` las omitidas quedan sin pk.
+    """
+    excluidos = set(_resolver_ids(excluir)) if excluir else set()
+    # dict.fromkeys: quitar duplicados conservando el orden
+    ids = [pk for pk in dict.fromkeys(_resolver_ids(destinatarios)) if pk and pk not in excluidos]
+    if not ids:
+        return []
+    url_diferida = callable(url)
+    objetos = [
+        Notificacion(usuario_id=pk, titulo=titulo, mensaje=mensaje, tipo=tipo,
+                     url='' if url_diferida else (url or ''), dedupe_key=dedupe_key)
+        for pk in ids
+    ]
+    with transaction.atomic():
+        objetos = Notificacion.objects.bulk_create(objetos, ignore_conflicts=dedupe_key is not None)
+        if url_diferida:
+            # Con dedupe_key sólo las insertadas reciben pk; las omitidas ya tenían su URL
+            pendientes = [notificacion for notificacion in objetos if notificacion.pk]
+            for notificacion in pendientes:
+                notificacion.url = url(notificacion) or ''
+            Notificacion.objects.bulk_update(pendientes, ['url'])
+    return objetos
+
+
+def _usuario_cambiado(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    # El login sólo actualiza last_login; no afecta a los roles
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(invalidar_roles)
+
+
+post_save.connect(_usuario_cambiado, sender=Usuario, dispatch_uid='notificaciones_roles_save')
+post_delete.connect(_usuario_cambiado, sender=Usuario, dispatch_uid='notificaciones_roles_delete')
@@ -0,0 +1,259 @@
+import asyncio
+import io
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (ContadorNotificaciones, Notificacion, NotificacionArchivada, RespuestaNotificacion,
+                     conteo_no_leidas)
+from .paginacion import paginar
+from .servicios import ids_de_rol, notificar
+
+User = get_user_model()
+
+
+class NotificacionesTestBase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user(username='ana', password='pass')
+
+    def _notificaciones(self, n, **extra):
+        return [Notificacion.objects.create(usuario=self.usuario, titulo=f'Aviso {i}', mensaje='m', **extra)
+                for i in range(n)]
+
+    def assertContadorExacto(self, usuario=None):
+        usuario = usuario or self.usuario
+        contador = ContadorNotificaciones.objects.get(usuario=usuario)
+        filas = Notificacion.objects.filter(usuario=usuario)
+        self.assertEqual((contador.total, contador.no_leidas), (filas.count(), filas.filter(leida=False).count()))
+
+
+class ContadorTest(NotificacionesTestBase):
+    def test_contador_igual_al_conteo_tras_cada_cambio(self):
+        otro = User.objects.create_user(username='beto', password='pass')
+        primera = self._notificaciones(1)[0]
+        self._notificaciones(1, leida=True)
+        Notificacion.objects.bulk_create([Notificacion(usuario=self.usuario, titulo='x', mensaje='m')
+                                          for _ in range(3)])
+        self.assertContadorExacto()
+
+        primera.marcar_como_leida()
+        primera.marcar_como_leida()
+        self.assertContadorExacto()
+        self.assertEqual(Notificacion.objects.filter(usuario=self.usuario).marcar_leidas(), 3)
+        self.assertContadorExacto()
+        Notificacion.objects.filter(usuario=self.usuario, titulo='x').marcar_no_leidas()
+        self.assertContadorExacto()
+
+        movida = Notificacion.objects.filter(usuario=self.usuario, titulo='x').first()
+        movida.usuario = otro
+        movida.save()
+        self.assertContadorExacto()
+        self.assertContadorExacto(otro)
+
+        Notificacion.objects.filter(usuario=self.usuario, leida=True).delete()
+        self.assertContadorExacto()
+        self.assertEqual(conteo_no_leidas(self.usuario.pk), 2)
+
+    def test_operaciones_masivas_sin_consultas_por_usuario(self):
+        def consultas(usuarios):
+            with CaptureQueriesContext(connection) as alta:
+                Notificacion.objects.bulk_create([Notificacion(usuario=u, titulo='t', mensaje='m') for u in usuarios])
+            with CaptureQueriesContext(connection) as lectura:
+                Notificacion.objects.filter(usuario__in=usuarios).marcar_leidas()
+            for usuario in usuarios:
+                self.assertContadorExacto(usuario)
+            return len(alta.captured_queries), len(lectura.captured_queries)
+
+        pocos = [User.objects.create_user(username=f'p{i}', password='pass') for i in range(2)]
+        muchos = [User.objects.create_user(username=f'm{i}', password='pass') for i in range(12)]
+        # Primera notificación (se crean los contadores) y las siguientes (UPDATE agrupado)
+        self.assertEqual(consultas(pocos), consultas(muchos))
+        self.assertEqual(consultas(pocos), consultas(muchos))
+
+    def test_recalcular_corrige_y_la_lectura_es_una_consulta(self):
+        self._notificaciones(2)
+        ContadorNotificaciones.objects.filter(usuario=self.usuario).update(no_leidas=9, total=9)
+        call_command('recalcular_contadores_notificaciones', stdout=io.StringIO())
+        self.assertContadorExacto()
+        with self.assertNumQueries(1):
+            self.assertEqual(conteo_no_leidas(self.usuario.pk), 2)
+
+
+class FanOutTest(NotificacionesTestBase):
+    def test_roles_en_cache_excluidos_y_url_diferida(self):
+        staff = [User.objects.create_user(username=f'staff{i}', password='pass', is_staff=True) for i in range(4)]
+        self.assertEqual(ids_de_rol('staff'), [u.pk for u in staff])
+        with self.assertNumQueries(0):
+            ids_de_rol('staff')
+
+        enviadas = notificar('staff', 'Aviso', 'm', excluir=[staff[0]])
+        self.assertEqual(sorted(n.usuario_id for n in enviadas), [u.pk for u in staff[1:]])
+        for usuario in staff[1:]:
+            self.assertContadorExacto(usuario)
+
+        enviadas = notificar('staff', 'Con enlace', 'm', url=lambda n: f'/detalle/{n.pk}/')
+        self.assertEqual(Notificacion.objects.get(pk=enviadas[0].pk).url, f'/detalle/{enviadas[0].pk}/')
+
+    def test_costo_constante_con_el_numero_de_destinatarios(self):
+        staff = [User.objects.create_user(username='staff0', password='pass', is_staff=True)]
+        notificar('staff', 'Aviso', 'm')
+        for tamano in (3, 7, 16):
+            with self.captureOnCommitCallbacks(execute=True):
+                staff += [User.objects.create_user(username=f'staff{len(staff) + i}', password='pass', is_staff=True)
+                          for i in range(tamano - len(staff))]
+            # Roles releídos y contadores nuevos creados en grupo junto al UPDATE de los existentes
+            with self.assertNumQueries(8):
+                notificar('staff', 'Aviso', 'm')
+            # Con contadores: SAVEPOINT, INSERT, SELECT de contadores, UPDATE y RELEASE
+            with self.assertNumQueries(5):
+                notificar('staff', 'Aviso', 'm')
+            for usuario in staff:
+                self.assertContadorExacto(usuario)
+
+    def test_cambio_de_usuario_invalida_los_roles(self):
+        staff = User.objects.create_user(username='staff', password='pass', is_staff=True)
+        self.assertEqual(ids_de_rol('staff'), [staff.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            staff.is_staff = False
+            staff.save()
+        self.assertEqual(ids_de_rol('staff'), [])
+        with self.assertRaises(ValueError):
+            ids_de_rol('desconocido')
+
+
+class DedupeTest(NotificacionesTestBase):
+    def test_misma_clave_no_repite_el_aviso(self):
+        staff = User.objects.create_user(username='staff', password='pass', is_staff=True)
+        for _ in range(3):
+            notificar('staff', 'Aviso', 'm', dedupe_key='vencimiento:1', url=lambda n: f'/detalle/{n.pk}/')
+        aviso = Notificacion.objects.get(usuario=staff)
+        self.assertEqual(aviso.url, f'/detalle/{aviso.pk}/')
+        self.assertContadorExacto(staff)
+
+        # La clave es por usuario y sin clave no hay restricción
+        notificar(self.usuario, 'Aviso', 'm', dedupe_key='vencimiento:1')
+        self._notificaciones(2)
+        self.assertEqual(Notificacion.objects.filter(usuario=self.usuario).count(), 3)
+        self.assertContadorExacto()
+
+    def test_solo_las_insertadas_mueven_el_contador(self):
+        ana, beto = self.usuario, User.objects.create_user(username='beto', password='pass')
+        notificar([ana, beto], 'Aviso', 'm')
+        notificar(ana, 'Aviso', 'm', dedupe_key='k')
+        with CaptureQueriesContext(connection) as ctx:
+            enviadas = notificar([ana, beto], 'Aviso', 'm', dedupe_key='k')
+        # Sin recálculo: el INSERT devuelve las filas insertadas y sólo ésas suman
+        self.assertFalse([q for q in ctx.captured_queries if 'COUNT(' in q['sql']])
+        self.assertEqual([(n.usuario_id, bool(n.pk)) for n in enviadas], [(ana.pk, False), (beto.pk, True)])
+        self.assertEqual(Notificacion.objects.get(pk=enviadas[1].pk).dedupe_key, 'k')
+        self.assertContadorExacto(ana)
+        self.assertContadorExacto(beto)
+
+    def test_el_indice_rechaza_duplicados(self):
+        Notificacion.objects.create(usuario=self.usuario, titulo='t', mensaje='m', dedupe_key='k')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Notificacion.objects.create(usuario=self.usuario, titulo='t', mensaje='m', dedupe_key='k')
+        self.assertContadorExacto()
+
+
+class EventosTest(TransactionTestCase):
+    # El stream lee la BD desde el hilo de sync_to_async: los datos deben estar confirmados
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user(username='ana', password='pass')
+        Notificacion.objects.create(usuario=self.usuario, titulo='Aviso', mensaje='m')
+
+    def test_bajo_wsgi_el_navegador_no_reconecta(self):
+        url = reverse('stream_notificaciones')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(url).status_code, 204)
+
+    def test_la_pagina_abre_el_stream_solo_con_sse(self):
+        self.client.force_login(self.usuario)
+        url = reverse('notificaciones_usuario')
+        with override_settings(NOTIFICACIONES_SSE=False):
+            self.assertNotContains(self.client.get(url), 'EventSource')
+        with override_settings(NOTIFICACIONES_SSE=True):
+            self.assertContains(self.client.get(url), 'EventSource')
+
+    def test_stream_envia_los_cambios_sin_sondear(self):
+        cliente = AsyncClient()
+
+        async def leer():
+            await sync_to_async(cliente.force_login)(self.usuario)
+            respuesta = await cliente.get(reverse('stream_notificaciones'))
+            eventos = respuesta.streaming_content.__aiter__()
+            recibidos = [await eventos.__anext__(), await eventos.__anext__()]
+            await sync_to_async(Notificacion.objects.create)(usuario=self.usuario, titulo='Nueva', mensaje='m')
+            recibidos += [await asyncio.wait_for(eventos.__anext__(), 5) for _ in range(2)]
+            await eventos.aclose()
+            return [e.decode() for e in recibidos]
+
+        retry, inicial, nueva, conteo = asyncio.run(leer())
+        self.assertTrue(retry.startswith('retry:'))
+        self.assertIn('"pendientes": 1', inicial)
+        self.assertTrue(nueva.startswith('event: notificacion'))
+        self.assertIn('"titulo": "Nueva"', nueva)
+        self.assertIn('"pendientes": 2', conteo)
+
+
+class ArchivoTest(NotificacionesTestBase):
+    def test_paginacion_por_cursor_sin_huecos_ni_repetidas(self):
+        notificaciones = self._notificaciones(12)
+        # Varias con la misma fecha: el id desempata
+        Notificacion.objects.filter(pk__in=[n.pk for n in notificaciones[:6]]).update(
+            fecha_creacion=timezone.now() - timedelta(days=1))
+        vistas, cursor = [], None
+        while True:
+            filas, cursor = paginar(Notificacion.objects.filter(usuario=self.usuario), cursor, 5)
+            vistas += [n.pk for n in filas]
+            if not cursor:
+                break
+        self.assertEqual(len(vistas), 12)
+        self.assertEqual(set(vistas), {n.pk for n in notificaciones})
+        # Un cursor inválido muestra la primera página
+        self.assertEqual(len(paginar(Notificacion.objects.all(), 'basura', 5)[0]), 5)
+
+    def test_bandeja_pagina_con_cursor(self):
+        self._notificaciones(30, leida=True)
+        self.client.force_login(self.usuario)
+        url = reverse('notificaciones_usuario')
+        primera = self.client.get(url, {'f': 'leida'})
+        self.assertEqual(len(primera.context['notificaciones']), 25)
+        segunda = self.client.get(url, {'f': 'leida', 'antes': primera.context['siguiente_cursor']})
+        self.assertEqual(len(segunda.context['notificaciones']), 5)
+        self.assertIsNone(segunda.context['siguiente_cursor'])
+
+    def test_archivar_leidas_antiguas(self):
+        viejas = self._notificaciones(7, leida=True)
+        self._notificaciones(3)
+        Notificacion.objects.filter(pk__in=[n.pk for n in viejas]).update(
+            fecha_creacion=timezone.now() - timedelta(days=200))
+        # Las que tienen respuestas se conservan
+        RespuestaNotificacion.objects.create(notificacion=viejas[0], usuario=self.usuario, mensaje='r')
+
+        otro = User.objects.create_user(username='beto', password='pass')
+        Notificacion.objects.bulk_create([Notificacion(usuario=otro, titulo='t', mensaje='m', leida=True)
+                                          for _ in range(2)])
+        Notificacion.objects.filter(usuario=otro).update(fecha_creacion=timezone.now() - timedelta(days=200))
+
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('archivar_notificaciones', batch_size=4, stdout=io.StringIO())
+        # Un UPDATE de contadores por lote (agrupado por delta), no uno por notificación
+        actualizaciones = [q for q in ctx.captured_queries
+                           if q['sql'].startswith('UPDATE "notificaciones_contadornotificaciones"')]
+        self.assertEqual(len(actualizaciones), 2)
+        self.assertEqual(NotificacionArchivada.objects.count(), 8)
+        self.assertContadorExacto(otro)
+        self.assertEqual(Notificacion.objects.count(), 4)
+        self.assertContadorExacto()
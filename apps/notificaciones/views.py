@@ -11,31 +11,19 @@ class ModificarRespuestaUsuarioView(LoginRequiredMixin, UserPassesTestMixin, Upd
         from django.contrib import messages
         messages.success(self.request, '¡Tu respuesta ha sido modificada con éxito!')
 
-        # Notificar al admin sobre la modificación
-        from apps.usuarios.models import Usuario
-        from .models import Notificacion
         # Notificar a todos los superusuarios activos (no sólo al primero)
-        superusers = Usuario.objects.filter(is_superuser=True, is_active=True)
-        if superusers.exists():
-            nombre = self.request.user.first_name
-            apellido = self.request.user.last_name.split()[0] if self.request.user.last_name else ''
-            from django.urls import reverse
-            objetos = []
-            for su in superusers:
-                admin_notif = Notificacion(
-                    usuario=su,
-                    titulo=f'{nombre} {apellido} ha modificado su respuesta a "{self.object.notificacion.titulo}"',
-                    mensaje=form.instance.mensaje,
-                    tipo='info',
-                    leida=False
-                )
-                # guardamos el objeto después de bulk_create; establecemos url en lista
-                objetos.append((admin_notif, su))
-            # Crear individualmente para que podamos asignar la URL con el PK
-            for admin_notif, su in objetos:
-                admin_notif.save()
-                admin_notif.url = reverse('notificaciones:admin_detalle', args=[admin_notif.pk]) + f'?respuesta_id={self.object.pk}'
-                admin_notif.save()
+        from .servicios import notificar
+        nombre = self.request.user.first_name
+        apellido = self.request.user.last_name.split()[0] if self.request.user.last_name else ''
+        from django.urls import reverse
+        notificar(
+            'superusuarios',
+            titulo=f'{nombre} {apellido} ha modificado su respuesta a "{self.object.notificacion.titulo}"',
+            mensaje=form.instance.mensaje,
+            tipo='info',
+            # La URL lleva el pk de cada notificación; notificar la asigna tras el INSERT
+            url=lambda admin_notif: reverse('notificaciones:admin_detalle', args=[admin_notif.pk]) + f'?respuesta_id={self.object.pk}',
+        )
         return response
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -295,7 +283,19 @@ class NotificacionesView(LoginRequiredMixin, ListView):
     context_object_name = 'items'
     
     def get_queryset(self):
-        return Notificacion.objects.filter(usuario=self.request.user).order_by('-fecha_creacion')
+        # Paginación por cursor (?antes=<cursor>); ver paginacion.py
+        from .paginacion import paginar
+        items, self.siguiente_cursor = paginar(
+            Notificacion.objects.filter(usuario=self.request.user),
+            self.request.GET.get('antes'),
+        )
+        return items
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['siguiente_cursor'] = self.siguiente_cursor
+        context['es_primera_pagina'] = not self.request.GET.get('antes')
+        return context
 
 
 class ResponderNotificacionView(LoginRequiredMixin, CreateView):
@@ -319,28 +319,17 @@ class ResponderNotificacionView(LoginRequiredMixin, CreateView):
         form.instance.usuario = self.request.user
         response = super().form_valid(form)
         from django.contrib import messages
-        from apps.usuarios.models import Usuario
-        from .models import Notificacion
+        from .servicios import notificar
         messages.success(self.request, '¡Respuesta enviada correctamente!')
-        superusers = Usuario.objects.filter(is_superuser=True, is_active=True)
-        if superusers.exists():
-            nombre = self.request.user.first_name
-            apellido = self.request.user.last_name.split()[0] if self.request.user.last_name else ''
-            from django.urls import reverse
-            objetos = []
-            for su in superusers:
-                admin_notif = Notificacion(
-                    usuario=su,
-                    titulo=f'{nombre} {apellido} ha respondido a "{self.notificacion.titulo}"',
-                    mensaje=form.instance.mensaje,
-                    tipo='info',
-                    leida=False
-                )
-                objetos.append((admin_notif, su))
-            for admin_notif, su in objetos:
-                admin_notif.save()
-                admin_notif.url = reverse('notificaciones:admin_detalle', args=[admin_notif.pk]) + f'?respuesta_id={form.instance.pk}'
-                admin_notif.save()
+        nombre = self.request.user.first_name
+        apellido = self.request.user.last_name.split()[0] if self.request.user.last_name else ''
+        notificar(
+            'superusuarios',
+            titulo=f'{nombre} {apellido} ha respondido a "{self.notificacion.titulo}"',
+            mensaje=form.instance.mensaje,
+            tipo='info',
+            url=lambda admin_notif: reverse('notificaciones:admin_detalle', args=[admin_notif.pk]) + f'?respuesta_id={form.instance.pk}',
+        )
         return response
 
     def get_success_url(self):
@@ -1,3 +1,7 @@
+import itertools
+from contextlib import closing
+
+from django.conf import settings
 from django.contrib import admin, messages
 from django import forms
 from django.forms.widgets import DateTimeInput
@@ -589,13 +593,43 @@ class EmpleadoForm(forms.ModelForm):
             self.fields['numero_empleado'].help_text = 'Si lo dejas vacío, se generará automáticamente.'
 
 
+class ImportarEmpleadosForm(forms.Form):
+    """Archivo para el alta masiva desde el admin, acotado en tamaño y filas.
+
+    La importación corre dentro de la petición; los archivos que rebasan
+    IMPORTACION_EMPLEADOS_MAX_MB o IMPORTACION_EMPLEADOS_MAX_FILAS se dejan
+    al comando `importar_empleados`.
+    """
+    archivo = forms.FileField(label='Archivo', help_text='CSV (UTF-8) o XLSX con una fila de encabezados.')
+    dry_run = forms.BooleanField(label='Solo validar', required=False)
+
+    def clean_archivo(self):
+        from .importacion import leer_filas
+        archivo = self.cleaned_data['archivo']
+        if not archivo.name.lower().endswith(('.csv', '.xlsx', '.xlsm')):
+            raise forms.ValidationError('El archivo debe ser .csv o .xlsx')
+        max_mb = settings.IMPORTACION_EMPLEADOS_MAX_MB
+        if archivo.size > max_mb * 1024 * 1024:
+            raise forms.ValidationError(
+                f'El archivo pesa más de {max_mb} MB; impórtalo con "python manage.py importar_empleados".')
+        max_filas = settings.IMPORTACION_EMPLEADOS_MAX_FILAS
+        with closing(leer_filas(archivo, archivo.name)) as filas:
+            total = sum(1 for _ in itertools.islice(filas, max_filas + 1))
+        archivo.seek(0)
+        if total > max_filas:
+            raise forms.ValidationError(
+                f'El archivo tiene más de {max_filas} filas; impórtalo con "python manage.py importar_empleados".')
+        return archivo
+
+
 @admin.register(Empleado)
 class EmpleadoAdmin(admin.ModelAdmin):
     form = EmpleadoForm
     save_on_top = True
     # Use model fields directly in changelist so values render reliably
-    list_display = ['numero_empleado', 'nombre_completo', 'lugar_de_pertenencia', 'fecha_nacimiento', 'puesto', 'salario_inicial', 'salario_actual', 'salario_fecha_ultima_modificacion', 'fecha_ingreso', 'activo', 'historial']
-    list_filter = ['puesto', 'activo', 'fecha_ingreso', 'fecha_nacimiento', 'lugar_de_pertenencia']
+    list_display = ['numero_empleado', 'nombre_completo', 'lugar_de_pertenencia', 'fecha_nacimiento', 'puesto', 'salario_inicial', 'salario_actual', 'salario_fecha_ultima_modificacion', 'fecha_ingreso', 'activo', 'estatus_actual', 'historial']
+    # estatus_actual es una columna indexada: filtrar por "en vacaciones" no recorre los periodos
+    list_filter = ['puesto', 'activo', 'estatus_actual', 'fecha_ingreso', 'fecha_nacimiento', 'lugar_de_pertenencia']
     search_fields = ['numero_empleado', 'usuario__first_name', 'usuario__last_name', 'curp', 'rfc']
     readonly_fields = ['fecha_creacion', 'fecha_actualizacion']
     # list_editable removed: do not allow inline edits from changelist
@@ -661,7 +695,46 @@ class EmpleadoAdmin(admin.ModelAdmin):
         perms = super().get_model_perms(request)
         perms['add'] = False
         return perms
-    
+
+    def get_urls(self):
+        from django.urls import path
+        urls = super().get_urls()
+        custom = [
+            path('importar/', self.admin_site.admin_view(self.importar_view), name='recursos_humanos_empleado_importar'),
+        ]
+        return custom + urls
+
+    def importar_view(self, request):
+        """Alta masiva desde CSV/XLSX (ver apps.recursos_humanos.importacion)."""
+        from .importacion import importar_empleados, leer_filas
+        if not request.user.has_perm('recursos_humanos.add_empleado'):
+            raise PermissionDenied
+        resultado = None
+        if request.method == 'POST':
+            form = ImportarEmpleadosForm(request.POST, request.FILES)
+            if form.is_valid():
+                archivo = form.cleaned_data['archivo']
+                resultado = importar_empleados(leer_filas(archivo, archivo.name),
+                                               dry_run=form.cleaned_data['dry_run'])
+                if form.cleaned_data['dry_run']:
+                    messages.info(request, f"{resultado['creados']} de {resultado['total']} filas son válidas.")
+                elif resultado['creados']:
+                    messages.success(request, f"Empleados creados: {resultado['creados']} de {resultado['total']}.")
+                if resultado['errores']:
+                    messages.warning(request, f"{len(resultado['errores'])} filas con errores (no se importaron).")
+                if not resultado['errores'] and not form.cleaned_data['dry_run']:
+                    return redirect(reverse('admin:recursos_humanos_empleado_changelist'))
+        else:
+            form = ImportarEmpleadosForm()
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Importar empleados',
+            'opts': self.model._meta,
+            'form': form,
+            'resultado': resultado,
+        }
+        return TemplateResponse(request, 'admin/recursos_humanos/empleado/importar.html', context)
+
     def nombre_completo(self, obj):
         return obj.usuario.get_full_name()
     nombre_completo.short_description = 'Nombre completo'
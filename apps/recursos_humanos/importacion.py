@@ -0,0 +1,340 @@
+"""
+Importación masiva de empleados desde CSV o XLSX.
+
+`leer_filas()` recorre el archivo fila por fila (módulo csv u openpyxl en
+modo read_only), sin cargarlo completo. `importar_empleados()` valida cada
+fila contra conjuntos en memoria (CURP, RFC, NSS, números de empleado,
+usuarios y teléfonos ya registrados, cada tabla leída con una consulta) que
+también van recibiendo lo que el propio archivo da de alta, y guarda por
+lotes: un bulk_create de usuarios y otro de empleados por lote, más el
+historial de salario y el periodo de alta (`registrar_altas`), cada lote en
+su transacción. Una fila inválida se reporta y no detiene a las demás.
+
+bulk_create no emite señales: las caches que dependen de empleados y usuarios
+se invalidan al final, y los avisos de cumpleaños de los nuevos empleados
+quedan para el comando diario `notificar_cumpleanos`.
+"""
+import csv
+import io
+import itertools
+import re
+import unicodedata
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+
+from apps.usuarios.models import Usuario
+from .models import ContadorNumeroEmpleado, Empleado, Puesto, registrar_altas, reservar_numeros_empleado
+
+LOTE = 500
+COLUMNAS_REQUERIDAS = ('nombre', 'apellido_paterno', 'curp', 'telefono', 'fecha_nacimiento',
+                       'fecha_ingreso', 'puesto')
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+
+
+def _clave(texto):
+    """Encabezado normalizado: 'Apellido Paterno' -> 'apellido_paterno'."""
+    texto = unicodedata.normalize('NFKD', str(texto or '').strip())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return re.sub(r'[^a-z0-9]+', '_', texto).strip('_')
+
+
+def leer_filas(archivo, nombre=''):
+    """Genera (número de fila, {columna: valor}) de un CSV o XLSX; la fila 1 son los encabezados."""
+    nombre = (nombre or getattr(archivo, 'name', '') or '').lower()
+    if nombre.endswith(('.xlsx', '.xlsm')):
+        from openpyxl import load_workbook
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+        try:
+            filas = libro.active.iter_rows(values_only=True)
+            encabezados = [_clave(c) for c in next(filas, ())]
+            for numero, valores in enumerate(filas, start=2):
+                if any(v not in (None, '') for v in valores):
+                    yield numero, dict(zip(encabezados, valores))
+        finally:
+            libro.close()
+        return
+    if isinstance(archivo, io.TextIOBase):
+        texto = archivo
+    else:
+        texto = io.TextIOWrapper(getattr(archivo, 'file', archivo), encoding='utf-8-sig', newline='')
+    try:
+        lector = csv.reader(texto)
+        encabezados = [_clave(c) for c in next(lector, [])]
+        for numero, valores in enumerate(lector, start=2):
+            if any(v.strip() for v in valores):
+                yield numero, dict(zip(encabezados, valores))
+    finally:
+        # Soltar el archivo sin cerrarlo: quien lo abrió puede volver a leerlo
+        if texto is not archivo:
+            texto.detach()
+
+
+def _texto(fila, columna):
+    valor = fila.get(columna)
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _fecha(fila, columna):
+    valor = fila.get(columna)
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = _texto(fila, columna)
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    raise ValidationError(f'{columna}: fecha inválida "{texto}" (usa AAAA-MM-DD o DD/MM/AAAA)')
+
+
+def _decimal(fila, columna):
+    texto = _texto(fila, columna).replace('$', '').replace(',', '')
+    if not texto:
+        return Decimal('0')
+    try:
+        valor = Decimal(texto)
+    except InvalidOperation:
+        raise ValidationError(f'{columna}: número inválido "{texto}"')
+    if valor < 0:
+        raise ValidationError(f'{columna}: no puede ser negativo')
+    return valor.quantize(Decimal('0.01'))
+
+
+def _opcion(fila, columna, opciones, defecto):
+    texto = _texto(fila, columna)
+    if not texto:
+        return defecto
+    for valor, etiqueta in opciones:
+        if _clave(texto) in (_clave(valor), _clave(etiqueta)):
+            return valor
+    raise ValidationError(f'{columna}: valor no válido "{texto}"')
+
+
+class _Registrados:
+    """Valores únicos ya usados: los de la BD (una consulta por tabla) y los que agrega el archivo."""
+
+    def __init__(self):
+        self.curp, self.rfc, self.nss, self.numero, self.telefono, self.usuario = (set() for _ in range(6))
+        for curp, rfc, nss, numero, telefono in Empleado.objects.values_list(
+                'curp', 'rfc', 'nss', 'numero_empleado', 'telefono_personal').iterator():
+            self.curp.add(curp.upper())
+            self.rfc.add((rfc or '').upper())
+            self.nss.add(nss or '')
+            self.numero.add(numero)
+            self.telefono.add(telefono or '')
+        for username, telefono in Usuario.objects.values_list('username', 'telefono').iterator():
+            self.usuario.add(username.lower())
+            self.telefono.add(telefono or '')
+        for conjunto in (self.rfc, self.nss, self.telefono):
+            conjunto.discard('')
+        self.puestos = {}
+        for pk, nombre in Puesto.objects.filter(activo=True).values_list('pk', 'nombre'):
+            self.puestos[str(pk)] = pk
+            self.puestos[_clave(nombre)] = pk
+
+
+def _validar(fila, registrados):
+    """(Usuario, Empleado) sin guardar para una fila, o ValidationError con todos sus problemas."""
+    errores = []
+    faltantes = [c for c in COLUMNAS_REQUERIDAS if not _texto(fila, c)]
+    if faltantes:
+        raise ValidationError(f'Faltan datos: {", ".join(faltantes)}')
+
+    def campo(funcion, *args):
+        try:
+            return funcion(*args)
+        except ValidationError as e:
+            errores.extend(e.messages)
+
+    curp = _texto(fila, 'curp').upper()
+    if curp in registrados.curp:
+        errores.append(f'curp: {curp} ya está registrada')
+    rfc = _texto(fila, 'rfc').upper()
+    if rfc and rfc in registrados.rfc:
+        errores.append(f'rfc: {rfc} ya está registrado')
+    nss = _texto(fila, 'nss')
+    if nss:
+        if not re.fullmatch(r'\d{11}', nss):
+            errores.append('nss: debe tener 11 dígitos')
+        elif nss in registrados.nss:
+            errores.append(f'nss: {nss} ya está registrado')
+    telefono = _texto(fila, 'telefono')
+    if not re.fullmatch(r'\d{10}', telefono):
+        errores.append('telefono: debe tener exactamente 10 dígitos')
+    elif telefono in registrados.telefono:
+        errores.append(f'telefono: {telefono} ya está registrado')
+    numero = _texto(fila, 'numero_empleado')
+    if numero and numero in registrados.numero:
+        errores.append(f'numero_empleado: {numero} ya existe')
+    username = (_texto(fila, 'usuario') or curp).lower()
+    if username in registrados.usuario:
+        errores.append(f'usuario: {username} ya existe')
+    puesto_id = registrados.puestos.get(_clave(_texto(fila, 'puesto')))
+    if not puesto_id:
+        errores.append(f'puesto: no existe un puesto activo "{_texto(fila, "puesto")}"')
+
+    fecha_nacimiento = campo(_fecha, fila, 'fecha_nacimiento')
+    fecha_ingreso = campo(_fecha, fila, 'fecha_ingreso')
+    salario_actual = campo(_decimal, fila, 'salario_actual')
+    salario_inicial = campo(_decimal, fila, 'salario_inicial')
+    sexo = campo(_opcion, fila, 'sexo', Empleado._meta.get_field('sexo').choices, 'I')
+    estado_civil = campo(_opcion, fila, 'estado_civil', Empleado.ESTADOS_CIVILES, 'soltero')
+    lugar = campo(_opcion, fila, 'lugar_de_pertenencia', Empleado.LUGAR_PERTENENCIA_CHOICES, None)
+
+    usuario = Usuario(
+        username=username,
+        first_name=_texto(fila, 'nombre').title(),
+        last_name=f"{_texto(fila, 'apellido_paterno').title()} {_texto(fila, 'apellido_materno').title()}".strip(),
+        email=_texto(fila, 'email'),
+        telefono=telefono,
+        tipo_usuario='empleado',
+        # Sin contraseña utilizable (se asigna después); evita un hash costoso por fila
+        password=make_password(None),
+    )
+    empleado = Empleado(
+        numero_empleado=numero,
+        curp=curp,
+        rfc=rfc,
+        nss=nss,
+        fecha_nacimiento=fecha_nacimiento,
+        estado_civil=estado_civil,
+        sexo=sexo,
+        telefono_personal=telefono,
+        telefono_emergencia=_texto(fila, 'telefono_emergencia'),
+        contacto_emergencia=_texto(fila, 'contacto_emergencia'),
+        direccion=_texto(fila, 'direccion'),
+        puesto_id=puesto_id,
+        fecha_ingreso=fecha_ingreso,
+        salario_inicial=salario_inicial,
+        salario_actual=salario_actual,
+        lugar_de_pertenencia=lugar,
+        activo=True,
+    )
+    # Longitudes, formatos y dígitos de los modelos: un valor que la BD rechazaría
+    # tumbaría el bulk_create de todo el lote
+    _limpiar(usuario, errores, {'username': 'usuario', 'first_name': 'nombre', 'last_name': 'apellido_paterno'})
+    _limpiar(empleado, errores)
+    if errores:
+        raise ValidationError(errores)
+
+    # La fila es válida: sus valores ya no pueden repetirse en el resto del archivo
+    registrados.curp.add(curp)
+    registrados.usuario.add(username)
+    registrados.telefono.add(telefono)
+    for conjunto, valor in ((registrados.rfc, rfc), (registrados.nss, nss), (registrados.numero, numero)):
+        if valor:
+            conjunto.add(valor)
+    return usuario, empleado
+
+
+def _limpiar(instancia, errores, columnas=None):
+    """Agrega a `errores` lo que reporta `clean_fields()` de la instancia, sin consultar la BD.
+
+    Se omiten las relaciones (su validación consulta la BD y aquí ya se
+    resolvieron) y los campos vacíos o que ya fallaron: su obligatoriedad la
+    decide la importación, no el formulario del admin.
+    """
+    excluir = [f.name for f in instancia._meta.concrete_fields
+               if f.is_relation or getattr(instancia, f.attname) in (None, '')]
+    try:
+        instancia.clean_fields(exclude=excluir + ['password'])
+    except ValidationError as e:
+        columnas = columnas or {}
+        for nombre, mensajes in e.message_dict.items():
+            errores.extend(f'{columnas.get(nombre, nombre)}: {m}' for m in mensajes)
+
+
+def _guardar_lote(lote, batch_size):
+    """Inserta un lote de (fila, usuario, empleado) válidos en una transacción."""
+    with transaction.atomic():
+        # Los números capturados a mano no deben volver a salir del contador
+        manuales = [int(e.numero_empleado) for _, _, e in lote if re.fullmatch(r'\d+', e.numero_empleado)]
+        if manuales:
+            ContadorNumeroEmpleado.objects.filter(pk=1, ultimo__lt=max(manuales)).update(ultimo=max(manuales))
+        sin_numero = [e for _, _, e in lote if not e.numero_empleado]
+        for empleado, numero in zip(sin_numero, reservar_numeros_empleado(len(sin_numero)) if sin_numero else []):
+            empleado.numero_empleado = numero
+
+        usuarios = Usuario.objects.bulk_create([u for _, u, _ in lote], batch_size=batch_size)
+        empleados = []
+        for (_, _, empleado), usuario in zip(lote, usuarios):
+            empleado.usuario = usuario
+            empleados.append(empleado)
+        Empleado.objects.bulk_create(empleados, batch_size=batch_size)
+        registrar_altas(empleados, batch_size=batch_size)
+
+
+def _reiniciar(item, numero_empleado):
+    """Deja una fila como antes de un lote revertido: sin pk asignadas ni número reservado."""
+    _, usuario, empleado = item
+    for instancia in (usuario, empleado):
+        instancia.pk = None
+        instancia._state.adding = True
+    empleado.numero_empleado = numero_empleado
+
+
+def _invalidar_caches():
+    from apps.asignaciones.servicios import invalidar_opciones_empleados
+    from apps.notificaciones.servicios import invalidar_roles
+    invalidar_opciones_empleados()
+    invalidar_roles()
+
+
+def importar_empleados(filas, batch_size=LOTE, dry_run=False):
+    """Valida y da de alta las filas de `leer_filas()`.
+
+    Devuelve {'total', 'creados', 'errores': [(fila, mensaje), ...]}. Con
+    `dry_run` sólo valida. Si la BD rechaza un lote (p. ej. otra alta
+    concurrente con la misma CURP), sus filas se reintentan una por una y sólo
+    las que vuelven a fallar se reportan como error.
+    """
+    registrados = _Registrados()
+    resultado = {'total': 0, 'creados': 0, 'errores': []}
+    filas = iter(filas)
+    while True:
+        bloque = list(itertools.islice(filas, batch_size))
+        if not bloque:
+            break
+        resultado['total'] += len(bloque)
+        lote = []
+        for numero, fila in bloque:
+            try:
+                usuario, empleado = _validar(fila, registrados)
+            except ValidationError as e:
+                resultado['errores'].append((numero, '; '.join(e.messages)))
+            else:
+                lote.append((numero, usuario, empleado))
+        if dry_run:
+            resultado['creados'] += len(lote)
+            continue
+        if not lote:
+            continue
+        numeros = [empleado.numero_empleado for _, _, empleado in lote]
+        try:
+            _guardar_lote(lote, batch_size)
+        except DatabaseError:
+            # Reintentar fila por fila (cada una en su savepoint) para reportar sólo las que la BD rechaza
+            for item, numero_empleado in zip(lote, numeros):
+                _reiniciar(item, numero_empleado)
+                try:
+                    _guardar_lote([item], batch_size)
+                except DatabaseError as e:
+                    resultado['errores'].append((item[0], f'No se guardó: {e}'))
+                else:
+                    resultado['creados'] += 1
+        else:
+            resultado['creados'] += len(lote)
+    if resultado['creados'] and not dry_run:
+        transaction.on_commit(_invalidar_caches)
+    resultado['errores'].sort()
+    return resultado
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from apps.recursos_humanos.models import empleados_con_cambio_de_estatus, recalcular_estatus_actual
+
+
+class Command(BaseCommand):
+    help = ('Actualiza Empleado.estatus_actual de los empleados con periodos que empiezan o terminan '
+            'por el cambio de fecha. Programarlo diario después de medianoche con cron: '
+            '5 0 * * * python manage.py actualizar_estatus_empleados')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=1,
+            help='Revisar los periodos que empezaron o terminaron en los últimos N días (por defecto 1)',
+        )
+        parser.add_argument(
+            '--todos',
+            action='store_true',
+            help='Revisar a todos los empleados',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo mostrar cuántos empleados están desactualizados',
+        )
+
+    def handle(self, *args, **options):
+        ids = None if options['todos'] else empleados_con_cambio_de_estatus(dias=max(1, options['dias']))
+        if ids is not None and not ids:
+            self.stdout.write(self.style.SUCCESS('Empleados actualizados: 0'))
+            return
+        cambios = recalcular_estatus_actual(ids, guardar=not options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'MODO DRY-RUN: {cambios} empleados desactualizados'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Empleados actualizados: {cambios}'))
@@ -1,18 +1,18 @@
 from django.core.management.base import BaseCommand
-from apps.recursos_humanos.models import Empleado, PeriodoEstatusEmpleado
+from django.db import transaction
+
+from apps.recursos_humanos.models import (Empleado, PeriodoEstatusEmpleado, periodo_de_alta,
+                                          programar_estatus_actual)
 
 class Command(BaseCommand):
     help = 'Agrega periodo de estatus "activo" a empleados que no lo tienen.'
 
     def handle(self, *args, **options):
-        empleados_actualizados = 0
-        for empleado in Empleado.objects.all():
-            if not empleado.periodos_estatus.exists():
-                PeriodoEstatusEmpleado.objects.create(
-                    empleado=empleado,
-                    estatus='activo',
-                    fecha_inicio=empleado.fecha_ingreso,
-                    observaciones='Registro automático para empleados existentes.'
-                )
-                empleados_actualizados += 1
-        self.stdout.write(self.style.SUCCESS(f'Se actualizaron {empleados_actualizados} empleados.'))
\ No newline at end of file
+        with transaction.atomic():
+            empleados = list(Empleado.objects.filter(periodos_estatus__isnull=True).only('pk', 'fecha_ingreso'))
+            PeriodoEstatusEmpleado.objects.bulk_create(
+                [periodo_de_alta(e, 'Registro automático para empleados existentes.') for e in empleados],
+                batch_size=500,
+            )
+            programar_estatus_actual(e.pk for e in empleados)
+        self.stdout.write(self.style.SUCCESS(f'Se actualizaron {len(empleados)} empleados.'))
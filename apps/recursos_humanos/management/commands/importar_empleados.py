@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.recursos_humanos.importacion import LOTE, importar_empleados, leer_filas
+
+
+class Command(BaseCommand):
+    help = ('Da de alta empleados (y sus usuarios) desde un CSV o XLSX. Columnas: nombre, apellido_paterno, '
+            'apellido_materno, curp, rfc, nss, telefono, fecha_nacimiento, fecha_ingreso, puesto (nombre o id), '
+            'salario_inicial, salario_actual, sexo, estado_civil, lugar_de_pertenencia, numero_empleado, '
+            'usuario, email, telefono_emergencia, contacto_emergencia, direccion')
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo .csv o .xlsx')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=LOTE,
+            help=f'Filas por lote (por defecto {LOTE})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo validar y mostrar los errores',
+        )
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        try:
+            archivo = open(ruta, 'rb')
+        except OSError as e:
+            raise CommandError(f'No se pudo abrir {ruta}: {e}')
+        with archivo:
+            resultado = importar_empleados(leer_filas(archivo, ruta), batch_size=max(1, options['batch_size']),
+                                           dry_run=options['dry_run'])
+        for fila, mensaje in resultado['errores']:
+            self.stdout.write(self.style.ERROR(f'Fila {fila}: {mensaje}'))
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f"MODO DRY-RUN: {resultado['creados']} de {resultado['total']} filas son válidas"))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Empleados creados: {resultado['creados']} de {resultado['total']} filas "
+                f"({len(resultado['errores'])} con errores)"))
@@ -1,13 +1,11 @@
 from django.core.management.base import BaseCommand
-from datetime import date
-from apps.recursos_humanos.models import PeriodoEstatusEmpleado, notify_status_end_for_today
-from apps.usuarios.models import Usuario
-from apps.notificaciones.models import Notificacion
-import logging
-from django.db import models
+from apps.recursos_humanos.models import notify_status_end_for_today
+
 
 class Command(BaseCommand):
-    help = 'Enviar notificaciones a administradores cuando un periodo de estatus finaliza hoy'
+    help = ('Enviar notificaciones a administradores cuando un periodo de estatus finaliza hoy. '
+            'Idempotente; programarlo p. ej. cada hora con cron: '
+            '0 * * * * python manage.py send_status_end_notifications')
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.NOTICE('Buscando periodos que finalizan hoy...'))
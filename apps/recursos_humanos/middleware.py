@@ -0,0 +1,34 @@
+from django.utils.functional import SimpleLazyObject
+
+
+def get_empleado(request):
+    """Devuelve el Empleado del usuario autenticado (o None), resolviéndolo una
+    sola vez por request. El resultado se guarda en `request._cached_empleado`
+    para que vistas y context processors compartan la misma consulta.
+    """
+    if not hasattr(request, '_cached_empleado'):
+        empleado = None
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            from .models import Empleado
+            empleado = (Empleado.objects
+                        .select_related('usuario', 'puesto')
+                        .filter(usuario=user)
+                        .first())
+        request._cached_empleado = empleado
+    return request._cached_empleado
+
+
+class EmpleadoMiddleware:
+    """
+    Adjunta `request.empleado` como objeto perezoso: la consulta sólo se ejecuta
+    si alguien lo lee y, como mucho, una vez por request. Debe ir después de
+    AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.empleado = SimpleLazyObject(lambda: get_empleado(request))
+        return self.get_response(request)
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:43
+
+from django.db import migrations, models
+from django.db.models.functions import Cast
+
+
+def sembrar_contador(apps, schema_editor):
+    """Inicializa el contador con el mayor número de empleado puramente numérico."""
+    Empleado = apps.get_model('recursos_humanos', 'Empleado')
+    ContadorNumeroEmpleado = apps.get_model('recursos_humanos', 'ContadorNumeroEmpleado')
+    maximo = (Empleado.objects
+              .filter(numero_empleado__regex=r'^[0-9]+$')
+              .aggregate(maximo=models.Max(Cast('numero_empleado', models.BigIntegerField())))['maximo'] or 0)
+    ContadorNumeroEmpleado.objects.update_or_create(pk=1, defaults={'ultimo': maximo})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recursos_humanos', '0019_empleado_lugar_de_pertenencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorNumeroEmpleado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultimo', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador de números de empleado',
+                'verbose_name_plural': 'Contadores de números de empleado',
+            },
+        ),
+        migrations.RunPython(sembrar_contador, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:10
+
+from datetime import date
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def poblar_estatus_actual(apps, schema_editor):
+    """Llena estatus_actual con el estatus del periodo vigente de cada empleado."""
+    Empleado = apps.get_model('recursos_humanos', 'Empleado')
+    PeriodoEstatusEmpleado = apps.get_model('recursos_humanos', 'PeriodoEstatusEmpleado')
+    hoy = date.today()
+    vigente = (PeriodoEstatusEmpleado.objects
+               .filter(models.Q(fecha_fin__isnull=True) | models.Q(fecha_fin__gte=hoy),
+                       empleado=models.OuterRef('pk'), fecha_inicio__lte=hoy)
+               .order_by('-fecha_inicio', '-pk')
+               .values('estatus')[:1])
+    Empleado.objects.update(estatus_actual=Coalesce(models.Subquery(vigente), models.Value('')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recursos_humanos', '0020_contadornumeroempleado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empleado',
+            name='estatus_actual',
+            field=models.CharField(blank=True, choices=[('activo', 'Activo'), ('inactivo', 'Inactivo'), ('vacaciones', 'Vacaciones'), ('incapacidad', 'Incapacidad')], db_index=True, default='', editable=False, max_length=20, verbose_name='Estatus actual'),
+        ),
+        migrations.AddIndex(
+            model_name='periodoestatusempleado',
+            index=models.Index(fields=['empleado', '-fecha_inicio'], name='periodo_estatus_empleado_idx'),
+        ),
+        migrations.RunPython(poblar_estatus_actual, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,7 @@ from django.core.validators import RegexValidator
 from django.urls import reverse
 from apps.usuarios.models import Usuario
 from apps.empresas.models import Empresa
+from soma.valores_cargados import ValoresCargadosMixin
 import re
 import logging
 from decimal import Decimal
@@ -83,7 +84,44 @@ class Puesto(models.Model):
         return self.nombre
 
 
-class Empleado(models.Model):
+# Estatus laborales de PeriodoEstatusEmpleado (también los usa Empleado.estatus_actual)
+ESTATUS_LABORAL_CHOICES = [
+    ("activo", "Activo"),
+    ("inactivo", "Inactivo"),
+    ("vacaciones", "Vacaciones"),
+    ("incapacidad", "Incapacidad"),
+]
+
+
+def periodos_vigentes(hoy=None):
+    """Periodos de estatus que cubren `hoy` (fecha_inicio <= hoy y fin abierto o >= hoy)."""
+    from datetime import date
+    hoy = hoy or date.today()
+    return PeriodoEstatusEmpleado.objects.filter(
+        models.Q(fecha_fin__isnull=True) | models.Q(fecha_fin__gte=hoy), fecha_inicio__lte=hoy
+    )
+
+
+class EmpleadoQuerySet(models.QuerySet):
+    def con_estatus_actual(self, hoy=None):
+        """Anota el periodo vigente: estatus_vigente, estatus_vigente_inicio y estatus_vigente_fin.
+
+        Es la fuente de verdad de la columna desnormalizada `estatus_actual`
+        (ver `recalcular_estatus_actual`). Las tres columnas salen de la misma
+        subconsulta correlacionada (el periodo más reciente que cubre `hoy`),
+        resuelta con el índice (empleado, fecha_inicio); sin periodo quedan en None.
+        """
+        vigente = (periodos_vigentes(hoy)
+                   .filter(empleado=models.OuterRef('pk'))
+                   .order_by('-fecha_inicio', '-pk'))
+        return self.annotate(
+            estatus_vigente=models.Subquery(vigente.values('estatus')[:1]),
+            estatus_vigente_inicio=models.Subquery(vigente.values('fecha_inicio')[:1]),
+            estatus_vigente_fin=models.Subquery(vigente.values('fecha_fin')[:1]),
+        )
+
+
+class Empleado(ValoresCargadosMixin, models.Model):
     @property
     def dias_faltan_para_vacaciones(self):
         """Devuelve los días que faltan para cumplir el año y poder pedir vacaciones."""
@@ -96,36 +134,10 @@ class Empleado(models.Model):
         return faltan if faltan > 0 else 0
     def dias_vacaciones_disponibles(self):
         """Devuelve los días de vacaciones disponibles solo si el empleado ya cumplió el año correspondiente, según la tabla oficial de la LFT mexicana (2023+)."""
-        from datetime import date
+        from .periodos import anios_servicio, dias_vacaciones_por_anios
         if not self.fecha_ingreso:
             return 0
-        hoy = date.today()
-        # Calcular años completos de servicio
-        anios = hoy.year - self.fecha_ingreso.year - ((hoy.month, hoy.day) < (self.fecha_ingreso.month, self.fecha_ingreso.day))
-        if anios < 1:
-            dias = 0
-        elif anios == 1:
-            dias = 12
-        elif anios == 2:
-            dias = 14
-        elif anios == 3:
-            dias = 16
-        elif anios == 4:
-            dias = 18
-        elif anios == 5:
-            dias = 20
-        elif 6 <= anios <= 10:
-            dias = 22
-        elif 11 <= anios <= 15:
-            dias = 24
-        elif 16 <= anios <= 20:
-            dias = 26
-        elif 21 <= anios <= 25:
-            dias = 28
-        elif 26 <= anios <= 30:
-            dias = 30
-        else:
-            dias = 30
+        dias = dias_vacaciones_por_anios(anios_servicio(self.fecha_ingreso))
         usados = self.dias_vacaciones()
         return max(0, dias - usados)
     """Modelo para representar empleados"""
@@ -195,8 +207,16 @@ class Empleado(models.Model):
     
     # Estado
     activo = models.BooleanField(default=True, verbose_name="ACTIVO")
+    # Estatus del periodo vigente, desnormalizado para filtrar sin subconsultas; lo mantienen las
+    # señales de PeriodoEstatusEmpleado y el comando actualizar_estatus_empleados
+    estatus_actual = models.CharField(max_length=20, choices=ESTATUS_LABORAL_CHOICES, blank=True, default='',
+                                      db_index=True, editable=False, verbose_name="Estatus actual")
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name="Última actualización")
+
+    objects = EmpleadoQuerySet.as_manager()
+
+    CAMPOS_RASTREADOS = ('salario_actual', 'salario_inicial', 'numero_empleado')
     
     class Meta:
         verbose_name = "Empleado"
@@ -239,50 +259,37 @@ class Empleado(models.Model):
         return 0
 
     def _generate_numero_empleado(self) -> str:
-        """Genera un número de empleado autoincremental como cadena de 4 dígitos.
-        Busca el mayor número puramente numérico existente y suma 1.
-        """
-        qs = Empleado.objects.values_list('numero_empleado', flat=True)
-        max_num = 0
-        for val in qs:
-            if val and re.fullmatch(r"\d+", str(val)):
-                try:
-                    n = int(val)
-                    if n > max_num:
-                        max_num = n
-                except ValueError:
-                    continue
-        return f"{max_num + 1:04d}"
+        """Siguiente número de empleado (4 dígitos) del contador con bloqueo."""
+        return reservar_numeros_empleado()[0]
 
     def save(self, *args, **kwargs):
         # Generar número de empleado si viene vacío
         if not self.numero_empleado:
             self.numero_empleado = self._generate_numero_empleado()
-        # use Django internal state to detect create vs update
-        is_new = getattr(self, '_state', None) and getattr(self._state, 'adding', False)
-        # Detectar cambio de salario: si ya existe en DB y cambia salario_actual, crear historial
+        elif (re.fullmatch(r"\d+", str(self.numero_empleado))
+              and self.valores_cargados('numero_empleado') != {'numero_empleado': self.numero_empleado}):
+            # Un número capturado a mano (al crear o al editarlo) no debe volver
+            # a salir del contador; si no es mayor, el UPDATE no toca nada.
+            # Guardar sin cambiar el número no toca el contador
+            ContadorNumeroEmpleado.objects.filter(pk=1, ultimo__lt=int(self.numero_empleado)) \
+                .update(ultimo=int(self.numero_empleado))
+        is_new = self._state.adding
+        if not is_new and not args and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # estatus_actual sólo lo escriben las señales de los periodos y el comando diario;
+            # una instancia cargada antes de un cambio de periodo no debe pisarlo
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name != 'estatus_actual'
+            ]
+        update_fields = kwargs.get('update_fields')
+        # Salario anterior según lo cargado de la BD (from_db): sin releer la fila
         salario_prev = None
-        if not is_new:
-            try:
-                prev = Empleado.objects.get(pk=self.pk)
-                salario_prev = prev.salario_actual
-                # Si el salario previo es nulo o cero y existe un salario_inicial
-                # preferido, usar salario_inicial como salario anterior para el primer cambio.
-                try:
-                    from decimal import Decimal
-                    if (salario_prev is None or Decimal(salario_prev) == Decimal('0')):
-                        si = getattr(prev, 'salario_inicial', None)
-                        if si is not None and Decimal(si) != Decimal('0'):
-                            salario_prev = si
-                except Exception:
-                    # Si hay algún problema con Decimal/conversiones, mantener salario_prev tal cual
-                    pass
-            except Empleado.DoesNotExist:
-                salario_prev = None
+        if not is_new and (update_fields is None or 'salario_actual' in update_fields):
+            salario_prev = self._salario_anterior()
 
         super().save(*args, **kwargs)
-        # Si no es nuevo y salario_prev difiere del actual, crear registro de cambio
-        if not is_new and salario_prev is not None and salario_prev != self.salario_actual:
+        if is_new:
+            registrar_altas([self])
+        elif salario_prev is not None and salario_prev != self.salario_actual:
             try:
                 from django.utils import timezone
                 CambioSalarioEmpleado.objects.create(
@@ -294,42 +301,18 @@ class Empleado(models.Model):
             except Exception:
                 logging.getLogger(__name__).exception("Error al crear CambioSalarioEmpleado en actualización")
 
-        # Si es nuevo y trae salario_actual (no cero), crear un registro inicial en el historial
-        if is_new:
-            try:
-                from django.utils import timezone
-                salario_val = getattr(self, 'salario_actual', None)
-                # Crear registro inicial si el salario actual fue proporcionado y es distinto de 0
-                if salario_val is not None and Decimal(salario_val) != Decimal('0'):
-                    # evitar duplicados por guardados múltiples
-                    if not CambioSalarioEmpleado.objects.filter(empleado=self).exists():
-                        # Usar salario_inicial si fue proporcionado, si no usar 0
-                        salario_inicial_val = getattr(self, 'salario_inicial', None)
-                        try:
-                            if salario_inicial_val is not None and Decimal(salario_inicial_val) != Decimal('0'):
-                                salario_anterior_val = Decimal(salario_inicial_val)
-                            else:
-                                salario_anterior_val = Decimal('0.00')
-                        except Exception:
-                            salario_anterior_val = Decimal('0.00')
-                        CambioSalarioEmpleado.objects.create(
-                            empleado=self,
-                            fecha=timezone.now(),
-                            salario_anterior=salario_anterior_val,
-                            salario_nuevo=Decimal(salario_val),
-                            observaciones='Registro inicial de salario'
-                        )
-            except Exception:
-                logging.getLogger(__name__).exception("Error al crear CambioSalarioEmpleado inicial")
-        # Crear periodo de estatus 'activo' si es nuevo y no existe ninguno
-        if is_new and not self.periodos_estatus.exists():
-            from .models import PeriodoEstatusEmpleado
-            PeriodoEstatusEmpleado.objects.create(
-                empleado=self,
-                estatus='activo',
-                fecha_inicio=self.fecha_ingreso,
-                observaciones='Registro automático de alta.'
-            )
+    def _salario_anterior(self):
+        """Salario guardado en la BD; si es nulo o cero se usa salario_inicial (primer cambio)."""
+        cargados = self.valores_cargados('salario_actual', 'salario_inicial')
+        if cargados is None:
+            # Instancia sin esos campos cargados (p. ej. .only()/.defer()): leerlos
+            cargados = Empleado.objects.filter(pk=self.pk).values('salario_actual', 'salario_inicial').first()
+            if cargados is None:
+                return None
+        salario_prev = cargados['salario_actual']
+        if not salario_prev and cargados['salario_inicial']:
+            salario_prev = cargados['salario_inicial']
+        return salario_prev
 
     def historial_estatus(self):
         """Devuelve el historial completo de periodos de estatus."""
@@ -343,64 +326,96 @@ class Empleado(models.Model):
         si no existe ningún periodo vigente.
         """
         try:
-            from datetime import date
-            from django.db.models import Q
-            hoy = date.today()
-            periodo = self.periodos_estatus.filter(
-                fecha_inicio__lte=hoy
-            ).filter(
-                Q(fecha_fin__isnull=True) | Q(fecha_fin__gte=hoy)
-            ).order_by('-fecha_inicio').first()
-            return periodo
+            return periodos_vigentes().filter(empleado=self).order_by('-fecha_inicio', '-pk').first()
         except Exception:
             return None
 
+    def _intervalos_estatus(self, estatus=None, excluir=None):
+        from .periodos import unir
+        qs = self.periodos_estatus.order_by()
+        if estatus:
+            qs = qs.filter(estatus=estatus)
+        if excluir:
+            qs = qs.exclude(estatus=excluir)
+        return unir(qs.values_list('fecha_inicio', 'fecha_fin'))
+
     def dias_trabajados(self):
-        """Suma los días en que el empleado estuvo en estatus 'Activo'."""
-        from datetime import date
-        total = 0
-        for periodo in self.periodos_estatus.filter(estatus="activo"):
-            fin = periodo.fecha_fin or date.today()
-            total += (fin - periodo.fecha_inicio).days + 1
-        return total
+        """Suma los días en que el empleado estuvo en estatus 'Activo' (los traslapes cuentan una vez)."""
+        from .periodos import total_dias
+        return total_dias(self._intervalos_estatus(estatus='activo'))
 
     def dias_vacaciones(self):
         """Suma los días en que el empleado estuvo en 'Vacaciones', sin contar domingos."""
-        from datetime import date, timedelta
-        total = 0
-        for periodo in self.periodos_estatus.filter(estatus="vacaciones"):
-            fin = periodo.fecha_fin or date.today()
-            temp = periodo.fecha_inicio
-            while temp <= fin:
-                if temp.weekday() != 6:  # 6 = domingo
-                    total += 1
-                temp += timedelta(days=1)
-        return total
+        from .periodos import total_dias_sin_domingo
+        return total_dias_sin_domingo(self._intervalos_estatus(estatus='vacaciones'))
 
     def antiguedad_laboral(self):
-        """Calcula la antigüedad descontando periodos no activos."""
+        """Calcula la antigüedad descontando periodos no activos (dentro del rango ingreso-hoy)."""
         from datetime import date
+        from .periodos import dias, recortar, total_dias
         if not self.fecha_ingreso:
             return 0
         hoy = date.today()
-        total_dias = (hoy - self.fecha_ingreso).days + 1
-        no_activos = 0
-        for periodo in self.periodos_estatus.exclude(estatus="activo"):
-            fin = periodo.fecha_fin or hoy
-            no_activos += (fin - periodo.fecha_inicio).days + 1
-        return max(0, total_dias - no_activos)
+        no_activos = recortar(self._intervalos_estatus(excluir='activo'), self.fecha_ingreso, hoy)
+        return max(0, dias(self.fecha_ingreso, hoy) - total_dias(no_activos))
+
+
+
+# --- Contador de números de empleado ---
+class ContadorNumeroEmpleado(models.Model):
+    """Último número de empleado asignado (una sola fila, pk=1).
+
+    `reservar_numeros_empleado()` la bloquea con SELECT ... FOR UPDATE, así dos
+    altas simultáneas no pueden obtener el mismo número; la migración la
+    inicializa con el mayor número puramente numérico existente.
+    """
+    ultimo = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Contador de números de empleado'
+        verbose_name_plural = 'Contadores de números de empleado'
+
+    def __str__(self):
+        return f"Último número de empleado: {self.ultimo:04d}"
+
+
+def maximo_numero_empleado():
+    """Mayor `numero_empleado` puramente numérico (0 si no hay), calculado en la BD."""
+    from django.db.models import BigIntegerField, Max
+    from django.db.models.functions import Cast
+    return (Empleado.objects
+            .filter(numero_empleado__regex=r'^[0-9]+$')
+            .aggregate(maximo=Max(Cast('numero_empleado', BigIntegerField())))['maximo'] or 0)
 
 
+def reservar_numeros_empleado(cantidad=1):
+    """Reserva `cantidad` números consecutivos y los devuelve como cadenas de 4 dígitos.
+
+    Para importaciones masivas: una sola reserva cubre todo el lote. La fila del
+    contador queda bloqueada hasta que termina la transacción que la llama, de
+    modo que las reservas concurrentes se atienden una tras otra. Si la
+    transacción se revierte, los números no se consumen.
+    """
+    from django.db import transaction
+    if cantidad < 1:
+        return []
+    with transaction.atomic():
+        contador = ContadorNumeroEmpleado.objects.select_for_update().filter(pk=1).first()
+        if contador is None:
+            # Sin fila (BD creada sin la migración de datos): sembrar desde el máximo
+            ContadorNumeroEmpleado.objects.get_or_create(pk=1, defaults={'ultimo': maximo_numero_empleado()})
+            contador = ContadorNumeroEmpleado.objects.select_for_update().get(pk=1)
+        inicio = contador.ultimo + 1
+        contador.ultimo += cantidad
+        contador.save(update_fields=['ultimo'])
+    return [f"{n:04d}" for n in range(inicio, inicio + cantidad)]
+
 
 # --- Modelo para historial de estatus laboral ---
-class PeriodoEstatusEmpleado(models.Model):
+class PeriodoEstatusEmpleado(ValoresCargadosMixin, models.Model):
     """Registra los periodos de estatus laboral de cada empleado."""
-    ESTATUS_CHOICES = [
-        ("activo", "Activo"),
-        ("inactivo", "Inactivo"),
-        ("vacaciones", "Vacaciones"),
-        ("incapacidad", "Incapacidad"),
-    ]
+    CAMPOS_RASTREADOS = ('fecha_fin',)
+    ESTATUS_CHOICES = ESTATUS_LABORAL_CHOICES
     empleado = models.ForeignKey("Empleado", on_delete=models.CASCADE, related_name="periodos_estatus")
     estatus = models.CharField(max_length=20, choices=ESTATUS_CHOICES, verbose_name="Estatus laboral")
     fecha_inicio = models.DateField(verbose_name="Fecha de inicio del estatus")
@@ -413,6 +428,10 @@ class PeriodoEstatusEmpleado(models.Model):
         verbose_name = "Periodo de estatus de empleado"
         verbose_name_plural = "Periodos de estatus de empleados"
         ordering = ["-fecha_inicio"]
+        indexes = [
+            # Periodo vigente de cada empleado (con_estatus_actual / get_periodo_actual)
+            models.Index(fields=['empleado', '-fecha_inicio'], name='periodo_estatus_empleado_idx'),
+        ]
 
     def __str__(self):
         fin = self.fecha_fin.strftime('%Y-%m-%d') if self.fecha_fin else "actual"
@@ -499,6 +518,38 @@ class CambioSalarioEmpleado(models.Model):
         except Exception:
             return ''
 
+def periodo_de_alta(empleado, observaciones='Registro automático de alta.'):
+    """Periodo 'activo' desde la fecha de ingreso (sin guardar)."""
+    return PeriodoEstatusEmpleado(empleado=empleado, estatus='activo', fecha_inicio=empleado.fecha_ingreso,
+                                  observaciones=observaciones)
+
+
+def registrar_altas(empleados, batch_size=500):
+    """Crea el historial de salario inicial y el periodo de alta de empleados recién insertados.
+
+    Un bulk_create por tabla para todos los empleados (lo usan `Empleado.save`
+    con uno solo y las importaciones con lotes completos). bulk_create no
+    dispara señales, así que el estatus_actual se agenda aquí mismo.
+    """
+    from django.utils import timezone
+    empleados = list(empleados)
+    ahora = timezone.now()
+    cambios = []
+    for empleado in empleados:
+        salario = Decimal(empleado.salario_actual or 0)
+        if salario != 0:
+            cambios.append(CambioSalarioEmpleado(
+                empleado=empleado,
+                fecha=ahora,
+                salario_anterior=Decimal(empleado.salario_inicial or 0),
+                salario_nuevo=salario,
+                observaciones='Registro inicial de salario',
+            ))
+    CambioSalarioEmpleado.objects.bulk_create(cambios, batch_size=batch_size)
+    PeriodoEstatusEmpleado.objects.bulk_create([periodo_de_alta(e) for e in empleados], batch_size=batch_size)
+    programar_estatus_actual(e.pk for e in empleados)
+
+
 from django.conf import settings
 
 class Inasistencia(models.Model):
@@ -537,16 +588,27 @@ from django.db.models.signals import pre_save
 import logging
 from django.urls import reverse
 from apps.notificaciones.models import Notificacion
+from apps.notificaciones.servicios import ids_de_rol, notificar
 from apps.usuarios.models import Usuario
 
 
+def _clave_fin_estatus(periodo):
+    """dedupe_key del aviso de fin de un periodo (cambia si se mueve la fecha_fin)."""
+    return f'fin_estatus:{periodo.pk}:{periodo.fecha_fin.isoformat()}'
+
+
 @receiver(pre_save, sender=PeriodoEstatusEmpleado)
 def periodo_estatus_pre_save(sender, instance, **kwargs):
-    """Guardar el valor previo de fecha_fin en el propio instance para usarlo en post_save."""
+    """Guardar el valor previo de fecha_fin en el propio instance para usarlo en post_save.
+
+    Sale de lo cargado con la instancia (from_db); sólo se consulta si no se cargó.
+    """
     try:
-        if instance.pk:
-            prev = sender.objects.get(pk=instance.pk)
-            instance._prev_fecha_fin = prev.fecha_fin
+        cargados = instance.valores_cargados('fecha_fin')
+        if cargados is not None:
+            instance._prev_fecha_fin = cargados['fecha_fin']
+        elif instance.pk and not instance._state.adding:
+            instance._prev_fecha_fin = sender.objects.filter(pk=instance.pk).values_list('fecha_fin', flat=True).first()
         else:
             instance._prev_fecha_fin = None
     except Exception:
@@ -572,8 +634,6 @@ def periodo_estatus_post_save(sender, instance, created, **kwargs):
                 return
             # Si la fecha de fin es hoy o en el pasado y cambió respecto a la previa, notificar
             if instance.fecha_fin <= hoy and (prev_fin is None or prev_fin != instance.fecha_fin):
-                # Buscar administradores activos
-                admins = Usuario.objects.filter(activo=True).filter(models.Q(tipo_usuario='admin') | models.Q(is_superuser=True))
                 # Ajustar título y mensaje según si la fecha_fin es hoy o ya pasó
                 from datetime import date
                 hoy = date.today()
@@ -583,22 +643,12 @@ def periodo_estatus_post_save(sender, instance, created, **kwargs):
                 else:
                     titulo = f"Estatus finalizado: {instance.get_estatus_display()} - {instance.empleado.nombre_completo}"
                     mensaje = f"El fin del estatus '{instance.get_estatus_display()}' del empleado {instance.empleado.nombre_completo} finalizó el {instance.fecha_fin.strftime('%d/%m/%Y')}."
+                # Administradores activos; sin link: el usuario va al detalle de la notificación
                 try:
-                    # No link: prefer que el usuario vaya al detalle de la notificación
-                    url = ''
+                    notificar('admins', titulo, mensaje, tipo='info', url='',
+                              dedupe_key=_clave_fin_estatus(instance))
                 except Exception:
-                    url = ''
-                for admin in admins:
-                    try:
-                        Notificacion.objects.create(
-                            usuario=admin,
-                            titulo=titulo,
-                            mensaje=mensaje,
-                            tipo='info',
-                            url=''
-                        )
-                    except Exception:
-                        logging.getLogger(__name__).exception('Error creando notificación de fin de periodo')
+                    logging.getLogger(__name__).exception('Error creando notificación de fin de periodo')
                 # Marcar como notificado usando update para evitar disparar señales nuevamente
                 try:
                     sender.objects.filter(pk=instance.pk).update(notificado_fin=True)
@@ -608,47 +658,110 @@ def periodo_estatus_post_save(sender, instance, created, **kwargs):
         logging.getLogger(__name__).exception('Error en handler periodo_estatus_post_save')
 
 
-def notify_status_end_for_today():
-    """Helper que crea notificaciones para todos los periodos cuya fecha_fin == hoy
+def notify_status_end_for_today(hoy=None):
+    """Crea notificaciones para los periodos cuya fecha_fin es hoy (o ya pasó)
     y que no han sido notificados aún. Devuelve el número de notificaciones creadas.
+
+    Pensado para ejecutarse programado (comando send_status_end_notifications).
+    Es idempotente: los periodos procesados quedan con notificado_fin=True, las
+    parejas (admin, periodo) ya existentes las descarta el índice de dedupe_key
+    y los periodos bloqueados por otra ejecución concurrente se saltan.
     """
+    from datetime import date
+    from django.db import transaction
+    hoy = hoy or date.today()
     try:
-        from datetime import date
-        hoy = date.today()
-        # Incluir periodos cuya fecha_fin es hoy o ya pasó y aún no han sido notificados
-        qs = PeriodoEstatusEmpleado.objects.filter(fecha_fin__lte=hoy, notificado_fin=False).select_related('empleado')
-        if not qs.exists():
-            return 0
-        admins = Usuario.objects.filter(activo=True).filter(models.Q(tipo_usuario='admin') | models.Q(is_superuser=True))
-        admins = list(admins)
-        if not admins:
+        admin_ids = ids_de_rol('admins')
+        if not admin_ids:
             return 0
-        created = 0
-        for periodo in qs:
-            # Diferenciar mensaje si finaliza hoy o ya finalizó
-            if periodo.fecha_fin == hoy:
-                titulo = f"Fin de estatus hoy: {periodo.get_estatus_display()} - {periodo.empleado.nombre_completo}"
-                mensaje = f"El fin del estatus '{periodo.get_estatus_display()}' del empleado {periodo.empleado.nombre_completo} finaliza hoy ({periodo.fecha_fin.strftime('%d/%m/%Y')})."
-            else:
-                titulo = f"Estatus finalizado: {periodo.get_estatus_display()} - {periodo.empleado.nombre_completo}"
-                mensaje = f"El fin del estatus '{periodo.get_estatus_display()}' del empleado {periodo.empleado.nombre_completo} finalizó el {periodo.fecha_fin.strftime('%d/%m/%Y')}."
-            for admin in admins:
-                try:
-                    if not Notificacion.objects.filter(usuario=admin, titulo=titulo).exists():
-                        Notificacion.objects.create(usuario=admin, titulo=titulo, mensaje=mensaje, tipo='info', url='')
-                        created += 1
-                except Exception:
-                    logging.getLogger(__name__).exception('Error creando notificación en helper')
-        try:
-            qs.update(notificado_fin=True)
-        except Exception:
-            logging.getLogger(__name__).exception('Error marcando notificado_fin en helper')
-        return created
+        with transaction.atomic():
+            # Incluir periodos cuya fecha_fin es hoy o ya pasó y aún no han sido notificados
+            periodos = list(PeriodoEstatusEmpleado.objects
+                            .filter(fecha_fin__lte=hoy, notificado_fin=False)
+                            .select_related('empleado__usuario')
+                            .select_for_update(skip_locked=True, of=('self',)))
+            if not periodos:
+                return 0
+            nuevas = []
+            for periodo in periodos:
+                # Diferenciar mensaje si finaliza hoy o ya finalizó
+                if periodo.fecha_fin == hoy:
+                    titulo = f"Fin de estatus hoy: {periodo.get_estatus_display()} - {periodo.empleado.nombre_completo}"
+                    mensaje = f"El fin del estatus '{periodo.get_estatus_display()}' del empleado {periodo.empleado.nombre_completo} finaliza hoy ({periodo.fecha_fin.strftime('%d/%m/%Y')})."
+                else:
+                    titulo = f"Estatus finalizado: {periodo.get_estatus_display()} - {periodo.empleado.nombre_completo}"
+                    mensaje = f"El fin del estatus '{periodo.get_estatus_display()}' del empleado {periodo.empleado.nombre_completo} finalizó el {periodo.fecha_fin.strftime('%d/%m/%Y')}."
+                clave = _clave_fin_estatus(periodo)
+                nuevas.extend(
+                    Notificacion(usuario_id=admin_id, titulo=titulo, mensaje=mensaje, tipo='info', url='',
+                                 dedupe_key=clave)
+                    for admin_id in admin_ids
+                )
+            # Las parejas (admin, periodo) ya notificadas las descarta el índice único
+            # Conteo por el índice (usuario, dedupe_key) para informar cuántas se crearon
+            enviadas = Notificacion.objects.filter(usuario_id__in=admin_ids,
+                                                   dedupe_key__in={n.dedupe_key for n in nuevas})
+            antes = enviadas.count()
+            Notificacion.objects.bulk_create(nuevas, ignore_conflicts=True)
+            creadas = enviadas.count() - antes
+            PeriodoEstatusEmpleado.objects.filter(pk__in=[p.pk for p in periodos]).update(notificado_fin=True)
+        return creadas
     except Exception:
         logging.getLogger(__name__).exception('Error en notify_status_end_for_today')
         return 0
 
 
+# --- Estatus actual desnormalizado ---
+from django.db.models.signals import post_delete
+from soma.al_commit import agrupar_al_commit
+
+
+def recalcular_estatus_actual(empleado_ids=None, hoy=None, guardar=True):
+    """Sincroniza `Empleado.estatus_actual` con el periodo vigente (con_estatus_actual).
+
+    Sin `empleado_ids` revisa a todos. Una lectura con la subconsulta y un
+    bulk_update sólo de los desajustados; devuelve cuántos lo estaban (con
+    `guardar=False` sólo los cuenta).
+    """
+    qs = Empleado.objects.all()
+    if empleado_ids is not None:
+        qs = qs.filter(pk__in={pk for pk in empleado_ids if pk})
+    filas = qs.con_estatus_actual(hoy).order_by().values_list('pk', 'estatus_actual', 'estatus_vigente')
+    a_corregir = [Empleado(pk=pk, estatus_actual=vigente or '')
+                  for pk, actual, vigente in filas if actual != (vigente or '')]
+    if guardar:
+        Empleado.objects.bulk_update(a_corregir, ['estatus_actual'], batch_size=500)
+    return len(a_corregir)
+
+
+def empleados_con_cambio_de_estatus(hoy=None, dias=1):
+    """Empleados con un periodo que empezó o terminó en los últimos `dias` días.
+
+    Son los únicos cuyo estatus vigente cambia sólo por el paso de la fecha
+    (sin que nadie guarde el periodo): los que inician en (hoy - dias, hoy] y
+    los que terminaron en [hoy - dias, hoy).
+    """
+    from datetime import date, timedelta
+    hoy = hoy or date.today()
+    desde = hoy - timedelta(days=dias)
+    return set(PeriodoEstatusEmpleado.objects
+               .filter(models.Q(fecha_inicio__gt=desde, fecha_inicio__lte=hoy)
+                       | models.Q(fecha_fin__gte=desde, fecha_fin__lt=hoy))
+               .order_by()
+               .values_list('empleado_id', flat=True))
+
+
+# Agenda el recálculo para el commit; varias llamadas en la misma transacción se juntan
+programar_estatus_actual = agrupar_al_commit(recalcular_estatus_actual)
+
+
+@receiver(post_save, sender=PeriodoEstatusEmpleado)
+@receiver(post_delete, sender=PeriodoEstatusEmpleado)
+def periodo_estatus_cambiado(sender, instance, **kwargs):
+    """Un periodo creado, editado o borrado puede cambiar el estatus vigente de su empleado."""
+    programar_estatus_actual([instance.empleado_id])
+
+
 @receiver(post_save, sender=Contrato)
 def sync_asignaciones_por_trabajador(sender, instance, **kwargs):
     """Crear/actualizar AsignacionPorTrabajador a partir de las asignaciones vinculadas en el contrato.
@@ -0,0 +1,156 @@
+"""
+Aritmética de intervalos para los periodos de estatus de los empleados.
+
+Los periodos (`PeriodoEstatusEmpleado`) se tratan como intervalos cerrados
+[fecha_inicio, fecha_fin]; un periodo abierto termina hoy. Los intervalos de
+un mismo estatus se unen antes de contar, así los traslapes no cuentan dos
+veces, y los conteos (días naturales, días sin domingo, días por año) se hacen
+en forma cerrada, sin generar una fecha por día.
+
+`metricas_empleados()` calcula todo lo que muestran el perfil y los saldos de
+vacaciones para muchos empleados con una sola consulta.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+
+DOMINGO = 6
+
+# Días de vacaciones por años de servicio (LFT, reforma 2023)
+TABLA_VACACIONES = [
+    (1, 12), (2, 14), (3, 16), (4, 18), (5, 20),
+    (10, 22), (15, 24), (20, 26), (25, 28), (30, 30),
+]
+
+
+def dias(inicio, fin):
+    """Días naturales del intervalo cerrado (0 si está vacío)."""
+    return max(0, (fin - inicio).days + 1)
+
+
+def dias_sin_domingo(inicio, fin):
+    """Días del intervalo cerrado que no son domingo."""
+    total = dias(inicio, fin)
+    semanas, resto = divmod(total, 7)
+    # En el tramo final de `resto` días hay un domingo si cae a menos de `resto` días del inicio
+    domingos = semanas + (1 if (DOMINGO - inicio.weekday()) % 7 < resto else 0)
+    return total - domingos
+
+
+def unir(intervalos, hoy=None):
+    """Ordena y une intervalos (inicio, fin) traslapados o contiguos; fin None = hoy.
+
+    Los intervalos vacíos (fin anterior al inicio, p. ej. un periodo abierto
+    que empieza en el futuro) se descartan.
+    """
+    hoy = hoy or date.today()
+    unidos = []
+    for inicio, fin in sorted((inicio, fin or hoy) for inicio, fin in intervalos if inicio):
+        if fin < inicio:
+            continue
+        if unidos and inicio <= unidos[-1][1] + timedelta(days=1):
+            if fin > unidos[-1][1]:
+                unidos[-1] = (unidos[-1][0], fin)
+        else:
+            unidos.append((inicio, fin))
+    return unidos
+
+
+def recortar(intervalos, desde=None, hasta=None):
+    """Intervalos unidos limitados a [desde, hasta]."""
+    recortados = []
+    for inicio, fin in intervalos:
+        inicio = max(inicio, desde) if desde else inicio
+        fin = min(fin, hasta) if hasta else fin
+        if inicio <= fin:
+            recortados.append((inicio, fin))
+    return recortados
+
+
+def total_dias(intervalos):
+    return sum(dias(inicio, fin) for inicio, fin in intervalos)
+
+
+def total_dias_sin_domingo(intervalos):
+    return sum(dias_sin_domingo(inicio, fin) for inicio, fin in intervalos)
+
+
+def dias_por_anio(intervalos):
+    """{año: días} de intervalos unidos, partiendo cada uno en los cambios de año."""
+    por_anio = defaultdict(int)
+    for inicio, fin in intervalos:
+        for anio in range(inicio.year, fin.year + 1):
+            por_anio[anio] += dias(max(inicio, date(anio, 1, 1)), min(fin, date(anio, 12, 31)))
+    return dict(por_anio)
+
+
+def anios_servicio(fecha_ingreso, hoy=None):
+    """Años completos desde la fecha de ingreso."""
+    hoy = hoy or date.today()
+    return hoy.year - fecha_ingreso.year - ((hoy.month, hoy.day) < (fecha_ingreso.month, fecha_ingreso.day))
+
+
+def dias_vacaciones_por_anios(anios):
+    """Días de vacaciones que corresponden a `anios` años de servicio."""
+    if anios < 1:
+        return 0
+    for hasta, dias_vacaciones in TABLA_VACACIONES:
+        if anios <= hasta:
+            return dias_vacaciones
+    return TABLA_VACACIONES[-1][1]
+
+
+def metricas(periodos, fecha_ingreso=None, hoy=None):
+    """Métricas de un empleado a partir de sus periodos [(estatus, inicio, fin), ...].
+
+    Devuelve un dict con:
+    - dias_trabajados: días en estatus 'activo'.
+    - dias_vacaciones: días de vacaciones sin contar domingos.
+    - antiguedad_laboral: días desde el ingreso hasta hoy menos los días en
+      cualquier otro estatus (dentro de ese mismo rango).
+    - historial_anual: [{'anio', 'dias'}] de días activos por año desde el ingreso.
+    - vacaciones_disponibles: días de vacaciones del año de servicio menos los usados.
+    """
+    hoy = hoy or date.today()
+    por_estatus = defaultdict(list)
+    for estatus, inicio, fin in periodos:
+        por_estatus[estatus].append((inicio, fin))
+    activos = unir(por_estatus['activo'], hoy)
+    vacaciones = unir(por_estatus['vacaciones'], hoy)
+    no_activos = unir([i for estatus, lista in por_estatus.items() if estatus != 'activo' for i in lista], hoy)
+
+    resultado = {
+        'dias_trabajados': total_dias(activos),
+        'dias_vacaciones': total_dias_sin_domingo(vacaciones),
+        'antiguedad_laboral': 0,
+        'historial_anual': [],
+        'vacaciones_disponibles': 0,
+    }
+    if fecha_ingreso:
+        resultado['antiguedad_laboral'] = max(
+            0, dias(fecha_ingreso, hoy) - total_dias(recortar(no_activos, fecha_ingreso, hoy))
+        )
+        por_anio = dias_por_anio(activos)
+        resultado['historial_anual'] = [
+            {'anio': anio, 'dias': por_anio.get(anio, 0)} for anio in range(fecha_ingreso.year, hoy.year + 1)
+        ]
+        disponibles = dias_vacaciones_por_anios(anios_servicio(fecha_ingreso, hoy))
+        resultado['vacaciones_disponibles'] = max(0, disponibles - resultado['dias_vacaciones'])
+    return resultado
+
+
+def metricas_empleados(empleados, hoy=None):
+    """{empleado_id: metricas(...)} para varios empleados con una sola consulta de periodos.
+
+    `empleados` son instancias de Empleado (se usa su fecha_ingreso).
+    """
+    from .models import PeriodoEstatusEmpleado
+
+    empleados = list(empleados)
+    periodos = defaultdict(list)
+    filas = (PeriodoEstatusEmpleado.objects
+             .filter(empleado_id__in=[e.pk for e in empleados])
+             .order_by()
+             .values_list('empleado_id', 'estatus', 'fecha_inicio', 'fecha_fin'))
+    for empleado_id, estatus, inicio, fin in filas:
+        periodos[empleado_id].append((estatus, inicio, fin))
+    return {e.pk: metricas(periodos[e.pk], e.fecha_ingreso, hoy) for e in empleados}
@@ -0,0 +1,343 @@
+import io
+import random
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.notificaciones.models import Notificacion
+from . import importacion, periodos
+from .admin import ImportarEmpleadosForm
+from .middleware import EmpleadoMiddleware, get_empleado
+from .importacion import importar_empleados, leer_filas
+from .models import (CambioSalarioEmpleado, ContadorNumeroEmpleado, Empleado, PeriodoEstatusEmpleado, Puesto, empleados_con_cambio_de_estatus,
+                     notify_status_end_for_today, recalcular_estatus_actual, reservar_numeros_empleado)
+
+User = get_user_model()
+
+
+class RecursosHumanosTestBase(TestCase):
+    def setUp(self):
+        self.puesto = Puesto.objects.create(nombre='Técnico', descripcion='Técnico',
+                                            salario_minimo=1000, salario_maximo=2000)
+
+    def _empleado(self, nombre, numero_empleado='', **extra):
+        n = User.objects.count() + 1
+        usuario = User.objects.create_user(username=nombre, password='pass', first_name=nombre)
+        datos = dict(
+            usuario=usuario, numero_empleado=numero_empleado, curp=f'CURP{n:014d}', rfc=f'RFC{n:010d}',
+            fecha_nacimiento=date(1990, 1, 1), estado_civil='soltero', telefono_personal='1',
+            telefono_emergencia='1', contacto_emergencia='Contacto', direccion='Dirección',
+            puesto=self.puesto, fecha_ingreso=date(2020, 1, 1), salario_actual=1500,
+        )
+        datos.update(extra)
+        return Empleado.objects.create(**datos)
+
+
+class EmpleadoMiddlewareTest(RecursosHumanosTestBase):
+    def _procesar(self, usuario, vista):
+        request = RequestFactory().get('/')
+        request.user = usuario
+        EmpleadoMiddleware(vista)(request)
+        return request
+
+    def test_se_resuelve_una_vez_y_solo_si_se_lee(self):
+        empleado = self._empleado('ana')
+
+        def vista(request):
+            with self.assertNumQueries(1):
+                self.assertEqual(request.empleado.pk, empleado.pk)
+                # Vistas y context processors comparten el resultado
+                self.assertEqual(request.empleado.puesto.nombre, 'Técnico')
+                self.assertIs(get_empleado(request), get_empleado(request))
+
+        self._procesar(empleado.usuario, vista)
+        with self.assertNumQueries(0):
+            self._procesar(empleado.usuario, lambda request: None)
+
+    def test_anonimo_y_usuario_sin_empleado(self):
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_empleado(self._procesar(AnonymousUser(), lambda request: None)))
+        usuario = User.objects.create_user(username='sin_empleado', password='pass')
+        request = self._procesar(usuario, lambda request: None)
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_empleado(request))
+            self.assertIsNone(get_empleado(request))
+
+
+class NumeroEmpleadoTest(RecursosHumanosTestBase):
+    def test_contador_se_siembra_y_respeta_numeros_manuales(self):
+        self._empleado('a', numero_empleado='0007')
+        self._empleado('b', numero_empleado='EXT-99')
+        # Sin fila del contador se toma el mayor número numérico existente
+        ContadorNumeroEmpleado.objects.all().delete()
+        self.assertEqual(self._empleado('c').numero_empleado, '0008')
+        self._empleado('d', numero_empleado='0120')
+        self.assertEqual(self._empleado('e').numero_empleado, '0121')
+
+    def test_reserva_de_bloque(self):
+        self.assertEqual(reservar_numeros_empleado(3), ['0001', '0002', '0003'])
+        self.assertEqual(self._empleado('a').numero_empleado, '0004')
+        self.assertEqual(reservar_numeros_empleado(0), [])
+
+    def test_editar_numero_a_uno_mayor_avanza_el_contador(self):
+        empleado = self._empleado('a')
+        self.assertEqual(empleado.numero_empleado, '0001')
+        empleado.numero_empleado = '0050'
+        empleado.save()
+        self.assertEqual(self._empleado('b').numero_empleado, '0051')
+        # Bajarlo no hace retroceder el contador
+        empleado.numero_empleado = '0002'
+        empleado.save()
+        self.assertEqual(self._empleado('c').numero_empleado, '0052')
+
+    def test_editar_otro_campo_no_toca_el_contador(self):
+        empleado = Empleado.objects.get(pk=self._empleado('a').pk)
+        empleado.telefono_personal = '2'
+        with CaptureQueriesContext(connection) as ctx:
+            empleado.save()
+        self.assertFalse([q for q in ctx.captured_queries if 'contadornumeroempleado' in q['sql']])
+
+
+class PeriodosTest(SimpleTestCase):
+    def _dias_uno_a_uno(self, intervalos, hoy):
+        vistos = set()
+        for inicio, fin in intervalos:
+            fin = fin or hoy
+            while inicio <= fin:
+                vistos.add(inicio)
+                inicio += timedelta(days=1)
+        return vistos
+
+    def test_formas_cerradas_coinciden_con_el_conteo_por_dia(self):
+        azar = random.Random(7)
+        hoy = date(2025, 6, 15)
+        for _ in range(200):
+            intervalos = []
+            for _ in range(azar.randint(0, 5)):
+                inicio = date(2021, 1, 1) + timedelta(days=azar.randint(0, 1600))
+                fin = None if azar.random() < 0.2 else inicio + timedelta(days=azar.randint(-3, 400))
+                intervalos.append((inicio, fin))
+            dias = self._dias_uno_a_uno(intervalos, hoy)
+            unidos = periodos.unir(intervalos, hoy)
+            self.assertEqual(periodos.total_dias(unidos), len(dias))
+            self.assertEqual(periodos.total_dias_sin_domingo(unidos), sum(1 for d in dias if d.weekday() != 6))
+            por_anio = periodos.dias_por_anio(unidos)
+            for anio in {d.year for d in dias}:
+                self.assertEqual(por_anio[anio], sum(1 for d in dias if d.year == anio))
+
+    def test_tabla_vacaciones(self):
+        esperado = {0: 0, 1: 12, 2: 14, 5: 20, 6: 22, 10: 22, 11: 24, 21: 28, 30: 30, 40: 30}
+        for anios, dias in esperado.items():
+            self.assertEqual(periodos.dias_vacaciones_por_anios(anios), dias)
+
+
+class MetricasEmpleadosTest(RecursosHumanosTestBase):
+    def test_una_consulta_para_varios_empleados(self):
+        hoy = date(2025, 6, 15)
+        empleados = [self._empleado(f'e{i}', fecha_ingreso=date(2023, 1, 1)) for i in range(3)]
+        # Periodo traslapado con el automático de alta: no cuenta dos veces
+        PeriodoEstatusEmpleado.objects.create(empleado=empleados[0], estatus='activo',
+                                              fecha_inicio=date(2023, 6, 1), fecha_fin=date(2023, 12, 31))
+        PeriodoEstatusEmpleado.objects.create(empleado=empleados[1], estatus='vacaciones',
+                                              fecha_inicio=date(2025, 6, 2), fecha_fin=date(2025, 6, 8))
+        with CaptureQueriesContext(connection) as ctx:
+            resultado = periodos.metricas_empleados(empleados, hoy=hoy)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(resultado[empleados[0].pk]['dias_trabajados'], (hoy - date(2023, 1, 1)).days + 1)
+        self.assertEqual([r['dias'] for r in resultado[empleados[0].pk]['historial_anual']], [365, 366, 166])
+        # Lunes a domingo: seis días sin el domingo; 14 días por dos años de servicio
+        self.assertEqual(resultado[empleados[1].pk]['dias_vacaciones'], 6)
+        self.assertEqual(resultado[empleados[1].pk]['vacaciones_disponibles'], 8)
+        self.assertEqual(resultado[empleados[1].pk]['antiguedad_laboral'], (hoy - date(2023, 1, 1)).days + 1 - 7)
+
+
+class EstatusActualTest(RecursosHumanosTestBase):
+    def test_anotacion_senales_y_cambio_de_fecha(self):
+        hoy = date.today()
+        with self.captureOnCommitCallbacks(execute=True):
+            # El alta crea el periodo 'activo' abierto
+            empleado = self._empleado('a', fecha_ingreso=hoy - timedelta(days=30))
+            otro = self._empleado('b', fecha_ingreso=hoy - timedelta(days=30))
+        self.assertEqual(Empleado.objects.get(pk=empleado.pk).estatus_actual, 'activo')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            vacaciones = PeriodoEstatusEmpleado.objects.create(
+                empleado=empleado, estatus='vacaciones', fecha_inicio=hoy, fecha_fin=hoy + timedelta(days=2))
+        self.assertEqual(set(Empleado.objects.filter(estatus_actual='vacaciones')), {empleado})
+
+        with CaptureQueriesContext(connection) as ctx:
+            filas = {e.pk: (e.estatus_vigente, e.estatus_vigente_inicio, e.estatus_vigente_fin)
+                     for e in Empleado.objects.con_estatus_actual()}
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(filas[empleado.pk], ('vacaciones', hoy, hoy + timedelta(days=2)))
+        self.assertEqual(filas[otro.pk], ('activo', hoy - timedelta(days=30), None))
+
+        # Al día siguiente del fin vuelve a regir el periodo activo sin que nadie lo guarde
+        despues = hoy + timedelta(days=3)
+        self.assertEqual(empleados_con_cambio_de_estatus(despues), {empleado.pk})
+        self.assertEqual(recalcular_estatus_actual(empleados_con_cambio_de_estatus(despues), hoy=despues), 1)
+        self.assertEqual(Empleado.objects.get(pk=empleado.pk).estatus_actual, 'activo')
+
+        # Una instancia cargada antes del cambio no regresa el estatus viejo al guardarse
+        vieja = Empleado.objects.get(pk=empleado.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            PeriodoEstatusEmpleado.objects.create(
+                empleado=empleado, estatus='incapacidad', fecha_inicio=hoy, fecha_fin=hoy + timedelta(days=1))
+        vieja.direccion = 'Otra dirección'
+        vieja.save()
+        self.assertEqual(Empleado.objects.get(pk=empleado.pk).estatus_actual, 'incapacidad')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PeriodoEstatusEmpleado.objects.filter(empleado=otro).delete()
+            vacaciones.delete()
+        self.assertEqual(Empleado.objects.get(pk=otro.pk).estatus_actual, '')
+        self.assertEqual(recalcular_estatus_actual(), 0)
+
+
+class FinDeEstatusTest(RecursosHumanosTestBase):
+    def test_avisos_en_lote_idempotentes_y_fuera_del_dropdown(self):
+        cache.clear()  # ids de rol cacheados por otras pruebas
+        admins = [User.objects.create_superuser(f'admin{i}', f'admin{i}@example.com', 'pass') for i in range(2)]
+        empleado = self._empleado('ana')
+        # Periodos que terminan en el futuro: al guardarlos la señal todavía no avisa
+        hoy = date.today() + timedelta(days=3)
+        PeriodoEstatusEmpleado.objects.create(empleado=empleado, estatus='vacaciones', fecha_inicio=date.today(),
+                                              fecha_fin=hoy)
+        PeriodoEstatusEmpleado.objects.create(empleado=empleado, estatus='incapacidad', fecha_inicio=date.today(),
+                                              fecha_fin=hoy - timedelta(days=2))
+        Notificacion.objects.all().delete()
+
+        # Abrir el dropdown ya no genera avisos
+        self.client.force_login(admins[0])
+        self.client.get(reverse('dropdown_notificaciones'))
+        self.assertFalse(Notificacion.objects.exists())
+
+        self.assertEqual(notify_status_end_for_today(hoy), 4)
+        self.assertEqual(Notificacion.objects.filter(usuario=admins[1], titulo__startswith='Fin de estatus hoy').count(), 1)
+        self.assertEqual(notify_status_end_for_today(hoy), 0)
+        # Aunque un periodo vuelva a quedar pendiente, la dedupe_key evita repetir el aviso
+        PeriodoEstatusEmpleado.objects.update(notificado_fin=False)
+        self.assertEqual(notify_status_end_for_today(hoy), 0)
+        self.assertEqual(Notificacion.objects.count(), 4)
+
+
+class GuardadoSinRelecturaTest(RecursosHumanosTestBase):
+    def test_historial_de_salario_sin_releer_la_fila(self):
+        empleado = self._empleado('a', salario_inicial=1200)
+        inicial = CambioSalarioEmpleado.objects.get(empleado=empleado)
+        self.assertEqual((inicial.salario_anterior, inicial.salario_nuevo), (1200, 1500))
+        self.assertEqual(empleado.periodos_estatus.get().estatus, 'activo')
+
+        empleado = Empleado.objects.get(pk=empleado.pk)
+        empleado.salario_actual = 1800
+        with CaptureQueriesContext(connection) as ctx:
+            empleado.save()
+        self.assertFalse(any(q['sql'].startswith('SELECT') for q in ctx.captured_queries))
+        cambio = CambioSalarioEmpleado.objects.latest('fecha')
+        self.assertEqual((cambio.salario_anterior, cambio.salario_nuevo), (1500, 1800))
+        # Guardar otra vez sin cambios no repite el registro
+        empleado.save()
+        self.assertEqual(CambioSalarioEmpleado.objects.filter(empleado=empleado).count(), 2)
+
+    def test_fecha_fin_previa_del_periodo(self):
+        periodo = self._empleado('a').periodos_estatus.get()
+        periodo = PeriodoEstatusEmpleado.objects.get(pk=periodo.pk)
+        periodo.observaciones = 'Sin cambio de fin'
+        with CaptureQueriesContext(connection) as ctx:
+            periodo.save()
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIsNone(periodo._prev_fecha_fin)
+
+
+class ImportacionEmpleadosTest(RecursosHumanosTestBase):
+    ENCABEZADOS = 'Nombre,Apellido Paterno,CURP,RFC,NSS,Teléfono,Fecha Nacimiento,Fecha Ingreso,Puesto,Salario Actual\n'
+
+    def _csv(self, filas):
+        return io.BytesIO((self.ENCABEZADOS + ''.join(filas)).encode('utf-8'))
+
+    def _fila(self, i, curp=None, fecha='1990-01-01'):
+        curp = curp or f'GOMJ9001{i:02d}HDFRRN01'
+        return f'Juan{i},Gómez,{curp},,{i:011d},55000000{i:02d},{fecha},2024-01-0{i % 9 + 1},técnico,1500\n'
+
+    def test_alta_por_lotes_con_errores_por_fila(self):
+        self._empleado('existente', curp='GOMJ900101HDFRRN01')
+        filas = [self._fila(i) for i in range(1, 8)]
+        filas.append(self._fila(20, curp='GOMJ900102HDFRRN01'))  # repetida dentro del archivo
+        filas.append(self._fila(21, fecha='31/02/1990'))
+        with CaptureQueriesContext(connection) as ctx:
+            resultado = importar_empleados(leer_filas(self._csv(filas), 'empleados.csv'), batch_size=4)
+        self.assertEqual(resultado['total'], 9)
+        self.assertEqual(resultado['creados'], 6)
+        self.assertEqual([fila for fila, _ in resultado['errores']], [2, 9, 10])
+        self.assertIn('curp', resultado['errores'][0][1])
+        self.assertIn('fecha_nacimiento', resultado['errores'][2][1])
+
+        nuevos = Empleado.objects.filter(curp__startswith='GOMJ').exclude(usuario__username='existente')
+        self.assertEqual(nuevos.count(), 6)
+        self.assertEqual(len(set(nuevos.values_list('numero_empleado', flat=True))), 6)
+        self.assertEqual(PeriodoEstatusEmpleado.objects.filter(empleado__in=nuevos).count(), 6)
+        self.assertEqual(CambioSalarioEmpleado.objects.filter(empleado__in=nuevos).count(), 6)
+        empleado = nuevos.select_related('usuario').get(curp='GOMJ900102HDFRRN01')
+        self.assertEqual((empleado.usuario.username, empleado.usuario.last_name), ('gomj900102hdfrrn01', 'Gómez'))
+        self.assertFalse(empleado.usuario.has_usable_password())
+        # Consultas por lote, no por fila
+        self.assertLess(len(ctx.captured_queries), 40)
+
+    def test_dry_run_no_guarda(self):
+        resultado = importar_empleados(leer_filas(self._csv([self._fila(1)]), 'e.csv'), dry_run=True)
+        self.assertEqual((resultado['creados'], resultado['errores']), (1, []))
+        self.assertFalse(Empleado.objects.exists())
+
+    def test_valores_fuera_de_los_limites_del_modelo(self):
+        encabezados = self.ENCABEZADOS.rstrip('\n') + ',Contacto Emergencia,Email\n'
+        filas = [
+            self._fila(1).rstrip('\n') + ',' + 'x' * 101 + ',\n',
+            self._fila(2).replace(',1500\n', ',123456789\n').rstrip('\n') + ',Ana,\n',
+            self._fila(3).rstrip('\n') + ',Ana,no-es-correo\n',
+            self._fila(4).rstrip('\n') + ',Ana,ana@example.com\n',
+        ]
+        archivo = io.BytesIO((encabezados + ''.join(filas)).encode('utf-8'))
+        resultado = importar_empleados(leer_filas(archivo, 'e.csv'))
+        self.assertEqual(resultado['creados'], 1)
+        errores = dict(resultado['errores'])
+        self.assertIn('contacto_emergencia', errores[2])
+        self.assertIn('salario_actual', errores[3])
+        self.assertIn('email', errores[4])
+
+    def test_lote_rechazado_se_reintenta_fila_por_fila(self):
+        # Otra alta guardó la misma CURP después de leer los registrados
+        class SinCurps(importacion._Registrados):
+            def __init__(self):
+                super().__init__()
+                self.curp.clear()
+
+        self._empleado('concurrente', curp='GOMJ900102HDFRRN01')
+        filas = [self._fila(i) for i in range(1, 4)]
+        with mock.patch.object(importacion, '_Registrados', SinCurps):
+            resultado = importar_empleados(leer_filas(self._csv(filas), 'e.csv'))
+        self.assertEqual(resultado['creados'], 2)
+        self.assertEqual([fila for fila, _ in resultado['errores']], [3])
+        self.assertEqual(Empleado.objects.filter(curp__startswith='GOMJ').count(), 3)
+
+    @override_settings(IMPORTACION_EMPLEADOS_MAX_FILAS=2)
+    def test_formulario_del_admin_limita_las_filas(self):
+        def form(n):
+            contenido = (self.ENCABEZADOS + ''.join(self._fila(i) for i in range(1, n + 1))).encode('utf-8')
+            return ImportarEmpleadosForm({}, {'archivo': SimpleUploadedFile('e.csv', contenido)})
+
+        grande = form(3)
+        self.assertFalse(grande.is_valid())
+        self.assertIn('importar_empleados', grande.errors['archivo'][0])
+        chico = form(2)
+        self.assertTrue(chico.is_valid())
+        # El conteo no consume ni cierra el archivo
+        archivo = chico.cleaned_data['archivo']
+        self.assertEqual(len(list(leer_filas(archivo, archivo.name))), 2)
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from soma.valores_cargados import ValoresCargadosMixin
+
 class Rol(models.Model):
     nombre = models.CharField(max_length=50, unique=True)
     descripcion = models.TextField(blank=True)
@@ -13,7 +15,7 @@ class Rol(models.Model):
     def __str__(self):
         return self.nombre
 
-class Usuario(AbstractUser):
+class Usuario(ValoresCargadosMixin, AbstractUser):
     TIPOS_USUARIO = [
         ('admin', 'Administrador'),
         ('supervisor', 'Supervisor'),
@@ -26,6 +28,9 @@ class Usuario(AbstractUser):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     activo = models.BooleanField(default=True)
+
+    # El nombre aparece en el texto de búsqueda de las asignaciones
+    CAMPOS_RASTREADOS = ('first_name', 'last_name')
     
     class Meta:
         verbose_name = 'Usuario'
@@ -0,0 +1,121 @@
+"""
+Cache de la lista de aplicaciones del admin usada en el sidebar de staff.
+
+`admin.site.get_app_list()` revisa permisos y hace un reverse() por cada modelo
+registrado. El resultado sólo depende de los permisos del usuario, del registro
+del admin y del idioma, así que se cachea por usuario (los superusuarios
+comparten una entrada) sin calcular sus permisos en cada petición. Una versión
+global, incrementada por las señales de permisos y grupos, descarta todo el
+cache cuando cambian los permisos de alguien; is_active e is_superuser van en
+la clave porque se leen de la instancia sin consultar.
+"""
+import hashlib
+
+from django.contrib import admin as djadmin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils import translation
+from django.utils.functional import Promise
+
+from .cache_version import bump_version, get_version
+
+APP_LIST_TIMEOUT = 60 * 60 * 6
+_VERSION_KEY = 'admin_app_list:ver'
+_registro_fingerprint = None
+
+
+def _fingerprint_registro():
+    """Huella del registro del admin; cambia si se registran o retiran modelos."""
+    global _registro_fingerprint
+    if _registro_fingerprint is None:
+        labels = sorted(model._meta.label for model in djadmin.site._registry)
+        _registro_fingerprint = hashlib.sha1(','.join(labels).encode()).hexdigest()[:12]
+    return _registro_fingerprint
+
+
+def _clave_usuario(user):
+    if not user.is_active:
+        return 'inactivo'
+    if user.is_superuser:
+        return 'superuser'
+    return f'u{user.pk}'
+
+
+def invalidate_admin_app_list():
+    bump_version(_VERSION_KEY)
+
+
+def ordenar_app_list(app_list):
+    """Mueve recursos_humanos justo después de asignaciones (o a la posición 2)."""
+    # app_list elements are dictionaries (not objects) -- use dict access
+    apps = list(app_list)
+    target = None
+    for a in apps:
+        if a.get('app_label') == 'recursos_humanos':
+            target = a
+            break
+    if target:
+        apps.remove(target)
+        # Prefer inserting recursos_humanos right after 'asignaciones' if present
+        assign_idx = None
+        for idx, a in enumerate(apps):
+            if a.get('app_label') == 'asignaciones':
+                assign_idx = idx
+                break
+        if assign_idx is not None:
+            insert_at = assign_idx + 1
+        else:
+            insert_at = 1 if len(apps) >= 1 else len(apps)
+        apps.insert(insert_at, target)
+    return apps
+
+
+def _a_texto(valor):
+    return str(valor) if isinstance(valor, Promise) else valor
+
+
+def _serializable(app_list):
+    """Copia de app_list sin cadenas perezosas (capfirst/gettext_lazy no se pueden picklear)."""
+    apps = []
+    for app in app_list:
+        app = {k: _a_texto(v) for k, v in app.items()}
+        app['models'] = [{k: _a_texto(v) for k, v in m.items()} for m in app.get('models', [])]
+        apps.append(app)
+    return apps
+
+
+def get_admin_app_list(request):
+    """Devuelve (app_list, ordered_app_list) desde cache o construyéndolos."""
+    user = request.user
+    key = 'admin_app_list:{}:{}:{}:{}'.format(
+        get_version(_VERSION_KEY),
+        _fingerprint_registro(),
+        translation.get_language() or '',
+        _clave_usuario(user),
+    )
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    app_list = _serializable(djadmin.site.get_app_list(request))
+    try:
+        ordered = ordenar_app_list(app_list)
+    except Exception:
+        ordered = app_list
+    result = (app_list, ordered)
+    cache.set(key, result, APP_LIST_TIMEOUT)
+    return result
+
+
+def _permisos_cambiados(sender, **kwargs):
+    transaction.on_commit(invalidate_admin_app_list)
+
+
+Usuario = get_user_model()
+for _sender in (Usuario.groups.through, Usuario.user_permissions.through, Group.permissions.through):
+    m2m_changed.connect(_permisos_cambiados, sender=_sender, dispatch_uid=f'admin_app_list_m2m_{_sender.__name__}')
+for _modelo in (Group, Permission):
+    post_save.connect(_permisos_cambiados, sender=_modelo, dispatch_uid=f'admin_app_list_save_{_modelo.__name__}')
+    post_delete.connect(_permisos_cambiados, sender=_modelo, dispatch_uid=f'admin_app_list_delete_{_modelo.__name__}')
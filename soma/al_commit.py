@@ -0,0 +1,37 @@
+"""
+Trabajo por ids diferido al commit de la transacción y agrupado.
+
+    programar = agrupar_al_commit(recalcular)
+    programar([pk1, pk2])   # desde señales, tantas veces como haga falta
+
+Los ids se acumulan por hilo; al confirmar la transacción el primer callback
+llama `recalcular(ids)` una vez con todos (ordenados) y los demás no hacen
+nada. Un id de una transacción revertida sólo provoca un recálculo de más.
+"""
+import threading
+
+from django.db import transaction
+
+
+def agrupar_al_commit(procesar):
+    """Devuelve `programar(ids)`, que junta los ids hasta el commit y llama `procesar(ids)` una vez."""
+    pendientes = threading.local()
+
+    def _procesar():
+        ids = getattr(pendientes, 'ids', None)
+        if not ids:
+            return
+        pendientes.ids = set()
+        procesar(sorted(ids))
+
+    def programar(ids):
+        nuevos = {pk for pk in ids if pk}
+        if not nuevos:
+            return
+        actuales = getattr(pendientes, 'ids', None)
+        if actuales is None:
+            actuales = pendientes.ids = set()
+        actuales.update(nuevos)
+        transaction.on_commit(_procesar, robust=True)
+
+    return programar
@@ -28,4 +28,7 @@ class SomaConfig(AppConfig):
             messages_app.verbose_name = 'Mensajes'
         except Exception as e:
             # Si hay algún error, continuar sin cambios
-            pass
\ No newline at end of file
+            pass
+
+        # Conectar señales que invalidan el snapshot del menú lateral y la lista de apps del admin
+        from . import menu, admin_menu  # noqa: F401
@@ -1,5 +1,17 @@
+"""
+Punto de entrada ASGI de SOMA.
+
+Se despliega junto a soma.wsgi para atender las conexiones de larga duración
+(Server-Sent Events de /api/notificaciones/stream/), por ejemplo:
+
+    uvicorn soma.asgi:application --workers 2
+
+y con NOTIFICACIONES_SSE=True para que las páginas abran el stream (bajo
+WSGI responde 204 y el badge sólo se actualiza al navegar).
+El resto de rutas funciona igual bajo ambos servidores.
+"""
 import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'soma.settings')
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
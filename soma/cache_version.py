@@ -0,0 +1,28 @@
+"""
+Versiones de cache para invalidar grupos de claves de una sola vez.
+
+Las claves cacheadas incluyen `get_version(key)`; `bump_version(key)` la
+incrementa y las entradas anteriores quedan huérfanas hasta que expiran. La
+versión se siembra con la hora en nanosegundos: si la clave de versión se
+desaloja del cache, la nueva semilla no coincide con ninguna anterior y no se
+reutilizan datos viejos.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # La clave no existe (nunca se leyó o fue desalojada)
+        cache.set(key, time.time_ns(), None)
@@ -1,77 +1,58 @@
 from django.contrib.admin.models import LogEntry
-from apps.recursos_humanos.models import Empleado
-from apps.flota_vehicular.models import AsignacionVehiculo
-try:
-    # Import optional models for vehículos externos (puede no existir en instalaciones antiguas)
-    from apps.flota_vehicular.models import AsignacionVehiculoExterno
-except Exception:
-    AsignacionVehiculoExterno = None
-from apps.herramientas.models import AsignacionHerramienta
+from django.utils.functional import SimpleLazyObject
+from .menu import get_menu_snapshot, MENU_VACIO
+from .admin_menu import get_admin_app_list
+
+
+def es_render_parcial(request):
+    """Indica si la petición es un fragmento HTMX (hx-get/hx-post con swap parcial).
+
+    Las peticiones boosted y las de restauración de historial reemplazan la página
+    completa, por lo que sí necesitan el contexto del header y el sidebar.
+    """
+    htmx = getattr(request, 'htmx', None)
+    return bool(htmx) and not htmx.boosted and not htmx.history_restore_request
+
+
+def _menu_value(request, key):
+    """Valor perezoso del snapshot del menú; sólo se lee del cache si la plantilla lo usa."""
+    def _resolver():
+        try:
+            return get_menu_snapshot(request).get(key, MENU_VACIO[key])
+        except Exception:
+            return MENU_VACIO[key]
+    return SimpleLazyObject(_resolver)
+
 
 def vehiculo_asignado_context(request):
     """Retorna el vehículo asignado del usuario autenticado si existe"""
-    if not request.user.is_authenticated:
+    if not request.user.is_authenticated or es_render_parcial(request):
         return {}
-    
-    try:
-        empleado = Empleado.objects.filter(usuario=request.user).first()
-        if empleado:
-            # Priorizar vehículo de la flota interna
-            asignacion_vehiculo = AsignacionVehiculo.objects.filter(
-                empleado=empleado,
-                estado='activa'
-            ).select_related('vehiculo').first()
-            if asignacion_vehiculo:
-                return {'vehiculo_menu': asignacion_vehiculo.vehiculo, 'vehiculo_menu_is_externo': False}
-
-            # Si no hay vehículo interno, intentar vehículo externo (si el modelo está disponible)
-            if AsignacionVehiculoExterno is not None:
-                asign_ext = AsignacionVehiculoExterno.objects.filter(
-                    empleado=empleado,
-                    estado='activa'
-                ).select_related('vehiculo_externo').first()
-                if asign_ext:
-                    # indicar que es externo para plantillas (evitar acceder a _meta desde templates)
-                    return {'vehiculo_menu': asign_ext.vehiculo_externo, 'vehiculo_menu_is_externo': True}
-
-        return {'vehiculo_menu': None, 'vehiculo_menu_is_externo': False}
-    except Exception:
-        return {'vehiculo_menu': None, 'vehiculo_menu_is_externo': False}
+    return {
+        'vehiculo_menu': _menu_value(request, 'vehiculo_menu'),
+        # indicar que es externo para plantillas (evitar acceder a _meta desde templates)
+        'vehiculo_menu_is_externo': _menu_value(request, 'vehiculo_menu_is_externo'),
+    }
 
 
 def herramienta_asignada_context(request):
     """Retorna información de herramientas asignadas para el menú: una (herramienta_menu) o varias (herramientas_menu, herramientas_count)."""
-    if not request.user.is_authenticated:
+    if not request.user.is_authenticated or es_render_parcial(request):
         return {}
-    try:
-        empleado = Empleado.objects.filter(usuario=request.user).first()
-        if not empleado:
-            return {'herramienta_menu': None, 'herramientas_menu': [], 'herramientas_count': 0}
-        asignaciones = (AsignacionHerramienta.objects
-                         .filter(empleado=empleado, fecha_devolucion__isnull=True)
-                         .select_related('herramienta')
-                         .order_by('herramienta__categoria', 'herramienta__codigo'))
-        count = asignaciones.count()
-        if count == 0:
-            return {'herramienta_menu': None, 'herramientas_menu': [], 'herramientas_count': 0}
-        if count == 1:
-            return {'herramienta_menu': asignaciones[0].herramienta, 'herramientas_menu': [], 'herramientas_count': 1}
-        # Múltiples
-        return {
-            'herramienta_menu': None,
-            'herramientas_menu': [a.herramienta for a in asignaciones],
-            'herramientas_count': count
-        }
-    except Exception:
-        return {'herramienta_menu': None, 'herramientas_menu': [], 'herramientas_count': 0}
+    return {
+        'herramienta_menu': _menu_value(request, 'herramienta_menu'),
+        'herramientas_menu': _menu_value(request, 'herramientas_menu'),
+        'herramientas_count': _menu_value(request, 'herramientas_count'),
+    }
 
 def recent_admin_actions(request):
     """Retorna las últimas 10 acciones del admin para usuarios staff.
     Se usa en el header (modal de Acciones recientes).
     """
     user = getattr(request, 'user', None)
-    if not user or not user.is_authenticated or not user.is_staff:
+    if not user or not user.is_authenticated or not user.is_staff or es_render_parcial(request):
         return {}
+    # El QuerySet no se evalúa hasta que la plantilla lo recorre
     entries = (LogEntry.objects.select_related('user', 'content_type')
                .order_by('-action_time')[:10])
     return {
@@ -79,54 +60,42 @@ def recent_admin_actions(request):
     }
 
 
+def _build_admin_app_list(request):
+    """Devuelve (app_list, ordered_app_list); se calcula una vez por request."""
+    if not hasattr(request, '_admin_app_list'):
+        try:
+            request._admin_app_list = get_admin_app_list(request)
+        except Exception:
+            request._admin_app_list = ([], [])
+    return request._admin_app_list
+
+
 def admin_app_list(request):
     """Retorna la lista de aplicaciones del admin para usuarios staff.
     Esto asegura que siempre esté disponible en el sidebar administrativo.
+    La lista sólo se construye si la plantilla la lee.
     """
     user = getattr(request, 'user', None)
-    if not user or not user.is_authenticated or not user.is_staff:
+    if not user or not user.is_authenticated or not user.is_staff or es_render_parcial(request):
         return {}
-    
-    try:
-        from django.contrib import admin as djadmin
-        app_list = djadmin.site.get_app_list(request)
-        # Also provide an ordered_app_list where recursos_humanos is forced to position 2
-        try:
-            # app_list elements are dictionaries (not objects) -- use dict access
-            apps = list(app_list)
-            target = None
-            for a in apps:
-                if a.get('app_label') == 'recursos_humanos':
-                    target = a
-                    break
-            if target:
-                apps.remove(target)
-                # Prefer inserting recursos_humanos right after 'asignaciones' if present
-                assign_idx = None
-                for idx, a in enumerate(apps):
-                    if a.get('app_label') == 'asignaciones':
-                        assign_idx = idx
-                        break
-                if assign_idx is not None:
-                    insert_at = assign_idx + 1
-                else:
-                    insert_at = 1 if len(apps) >= 1 else len(apps)
-                apps.insert(insert_at, target)
-            ordered = apps
-        except Exception:
-            ordered = app_list
-        return {'app_list': app_list, 'ordered_app_list': ordered}
-    except Exception:
-        return {'app_list': []}
+    return {
+        'app_list': SimpleLazyObject(lambda: _build_admin_app_list(request)[0]),
+        'ordered_app_list': SimpleLazyObject(lambda: _build_admin_app_list(request)[1]),
+    }
 
 
 def frase_administradores(request):
     """Provee la frase activa definida por administradores (si existe)."""
-    try:
-        from .models import FraseAdministradores
-        frase = FraseAdministradores.objects.filter(activo=True).order_by('-fecha_creacion').first()
-        if frase:
-            return {'frase_administradores': frase.texto}
-    except Exception:
-        pass
-    return {'frase_administradores': ''}
+    if es_render_parcial(request):
+        return {}
+
+    def _frase():
+        try:
+            from .models import FraseAdministradores
+            frase = FraseAdministradores.objects.filter(activo=True).order_by('-fecha_creacion').first()
+            if frase:
+                return frase.texto
+        except Exception:
+            pass
+        return ''
+    return {'frase_administradores': SimpleLazyObject(_frase)}
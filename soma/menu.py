@@ -0,0 +1,129 @@
+"""
+Snapshot por usuario del menú lateral (vehículo y herramientas asignadas).
+
+El snapshot se guarda en el cache de Django bajo una clave versionada por
+usuario. Las señales de AsignacionVehiculo, AsignacionVehiculoExterno y
+AsignacionHerramienta incrementan la versión del usuario afectado, de modo que
+la siguiente petición reconstruye el snapshot y las demás no consultan la BD.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+
+from apps.flota_vehicular.models import AsignacionVehiculo
+try:
+    from apps.flota_vehicular.models import AsignacionVehiculoExterno
+except Exception:
+    AsignacionVehiculoExterno = None
+from apps.herramientas.models import AsignacionHerramienta
+from apps.recursos_humanos.models import Empleado
+from .cache_version import bump_version, get_version
+
+# Cambiar si se modifica la forma del snapshot para no leer datos de un despliegue anterior
+SNAPSHOT_SCHEMA = 1
+# Límite de vida para acotar datos desactualizados (p. ej. cambio de placas de un vehículo)
+SNAPSHOT_TIMEOUT = 60 * 60
+
+MENU_VACIO = {
+    'vehiculo_menu': None,
+    'vehiculo_menu_is_externo': False,
+    'herramienta_menu': None,
+    'herramientas_menu': [],
+    'herramientas_count': 0,
+}
+
+
+def _version_key(user_id):
+    return f'menu_snapshot:ver:{user_id}'
+
+
+def _snapshot_key(user_id, version):
+    return f'menu_snapshot:{SNAPSHOT_SCHEMA}:{user_id}:{version}'
+
+
+def build_menu_snapshot(user_id):
+    """Consulta la BD y arma el contexto del menú para el usuario indicado."""
+    snapshot = dict(MENU_VACIO)
+    asignacion_vehiculo = (AsignacionVehiculo.objects
+                           .filter(empleado__usuario_id=user_id, estado='activa')
+                           .select_related('vehiculo')
+                           .first())
+    if asignacion_vehiculo:
+        # Priorizar vehículo de la flota interna
+        snapshot['vehiculo_menu'] = asignacion_vehiculo.vehiculo
+    elif AsignacionVehiculoExterno is not None:
+        asign_ext = (AsignacionVehiculoExterno.objects
+                     .filter(empleado__usuario_id=user_id, estado='activa')
+                     .select_related('vehiculo_externo')
+                     .first())
+        if asign_ext:
+            snapshot['vehiculo_menu'] = asign_ext.vehiculo_externo
+            snapshot['vehiculo_menu_is_externo'] = True
+
+    herramientas = [a.herramienta for a in (AsignacionHerramienta.objects
+                                            .filter(empleado__usuario_id=user_id, fecha_devolucion__isnull=True)
+                                            .select_related('herramienta')
+                                            .order_by('herramienta__categoria', 'herramienta__codigo'))]
+    snapshot['herramientas_count'] = len(herramientas)
+    if len(herramientas) == 1:
+        snapshot['herramienta_menu'] = herramientas[0]
+    elif len(herramientas) > 1:
+        snapshot['herramientas_menu'] = herramientas
+    return snapshot
+
+
+def get_menu_snapshot(request):
+    """Devuelve el snapshot del menú desde cache, reconstruyéndolo si no existe.
+    Se memoriza en el request para que ambos context processors compartan la lectura.
+    """
+    user = getattr(request, 'user', None)
+    if not user or not user.is_authenticated:
+        return {}
+    if not hasattr(request, '_menu_snapshot'):
+        version = get_version(_version_key(user.pk))
+        key = _snapshot_key(user.pk, version)
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = build_menu_snapshot(user.pk)
+            cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+        request._menu_snapshot = snapshot
+    return request._menu_snapshot
+
+
+def invalidate_menu_snapshot(user_id):
+    """Incrementa la versión del usuario; los snapshots anteriores quedan huérfanos y expiran solos."""
+    if not user_id:
+        return
+    bump_version(_version_key(user_id))
+
+
+def _invalidate_for_empleados(*empleado_ids):
+    ids = {pk for pk in empleado_ids if pk}
+    if not ids:
+        return
+    user_ids = list(Empleado.objects.filter(pk__in=ids).values_list('usuario_id', flat=True))
+    # Invalidar al confirmar: evita que otra petición reconstruya con datos aún sin commit
+    transaction.on_commit(lambda: [invalidate_menu_snapshot(uid) for uid in user_ids])
+
+
+_MODELOS_MENU = [m for m in (AsignacionVehiculo, AsignacionVehiculoExterno, AsignacionHerramienta) if m is not None]
+
+
+def _recordar_empleado_original(sender, instance, **kwargs):
+    # Permite invalidar también al empleado anterior si la asignación se reasigna
+    instance._menu_empleado_id = instance.__dict__.get('empleado_id')
+
+
+def _asignacion_cambiada(sender, instance, **kwargs):
+    try:
+        _invalidate_for_empleados(instance.empleado_id, getattr(instance, '_menu_empleado_id', None))
+        instance._menu_empleado_id = instance.empleado_id
+    except Exception:
+        # El menú se reconstruye a lo sumo al expirar; no interrumpir la escritura
+        pass
+
+
+for _modelo in _MODELOS_MENU:
+    post_init.connect(_recordar_empleado_original, sender=_modelo, dispatch_uid=f'menu_init_{_modelo.__name__}')
+    post_save.connect(_asignacion_cambiada, sender=_modelo, dispatch_uid=f'menu_save_{_modelo.__name__}')
+    post_delete.connect(_asignacion_cambiada, sender=_modelo, dispatch_uid=f'menu_delete_{_modelo.__name__}')
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
+import tempfile
 from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -99,6 +100,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.recursos_humanos.middleware.EmpleadoMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django_htmx.middleware.HtmxMiddleware',
@@ -151,6 +153,33 @@ DATABASES = {
 }
 
 
+# Cache
+# Compartido entre workers de gunicorn: el snapshot del menú y demás datos
+# cacheados se invalidan desde cualquier proceso. En producción puede apuntarse
+# a Redis/Memcached vía CACHE_BACKEND y CACHE_LOCATION.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=str(Path(tempfile.gettempdir()) / 'soma_cache')),
+    }
+}
+
+
+# Notificaciones: días que se conservan las leídas antes de archivarlas
+# (comando archivar_notificaciones)
+NOTIFICACIONES_RETENCION_DIAS = config('NOTIFICACIONES_RETENCION_DIAS', default=90, cast=int)
+# Badge de notificaciones en tiempo real (SSE). Activarlo sólo si /api/notificaciones/stream/
+# se sirve con soma.asgi (p. ej. uvicorn); bajo WSGI el stream responde 204 y la página no lo abre
+NOTIFICACIONES_SSE = config('NOTIFICACIONES_SSE', default=False, cast=bool)
+# Tareas tras el commit (avisos, reportes PDF) en hilos del proceso (False: en la misma petición)
+TAREAS_SEGUNDO_PLANO = config('TAREAS_SEGUNDO_PLANO', default=True, cast=bool)
+TAREAS_SEGUNDO_PLANO_HILOS = config('TAREAS_SEGUNDO_PLANO_HILOS', default=2, cast=int)
+# Importación de empleados desde el admin (corre dentro de la petición): archivos más
+# grandes se importan con el comando importar_empleados
+IMPORTACION_EMPLEADOS_MAX_FILAS = config('IMPORTACION_EMPLEADOS_MAX_FILAS', default=2000, cast=int)
+IMPORTACION_EMPLEADOS_MAX_MB = config('IMPORTACION_EMPLEADOS_MAX_MB', default=5, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,65 @@
+"""
+Tareas en segundo plano dentro del proceso web.
+
+    from soma.tareas import en_segundo_plano
+    en_segundo_plano(generar_reporte, reporte.pk)
+
+Una cola por proceso atendida por TAREAS_SEGUNDO_PLANO_HILOS hilos que se
+arrancan con la primera tarea. La cola la comparten los avisos de
+notificaciones y los reportes PDF de asignaciones, así que un reporte largo
+no acapara el proceso: cuando hay más de un hilo, los avisos siguen saliendo
+mientras se genera. Las tareas no sobreviven a un reinicio; quien las use
+debe poder recuperarlas (p. ej. `recuperar_reportes_asignaciones`).
+"""
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+_tareas = queue.Queue()
+_trabajadores = []
+_trabajadores_lock = threading.Lock()
+
+
+def _procesar_tareas():
+    while True:
+        funcion, args, kwargs = _tareas.get()
+        try:
+            close_old_connections()
+            funcion(*args, **kwargs)
+        except Exception:
+            logger.exception('Error en la tarea en segundo plano %s', getattr(funcion, '__name__', funcion))
+        finally:
+            # Igual que al terminar una petición: no dejar conexiones caducadas abiertas
+            close_old_connections()
+            _tareas.task_done()
+
+
+def _iniciar_trabajadores():
+    hilos = max(1, getattr(settings, 'TAREAS_SEGUNDO_PLANO_HILOS', 2))
+    with _trabajadores_lock:
+        _trabajadores[:] = [t for t in _trabajadores if t.is_alive()]
+        while len(_trabajadores) < hilos:
+            trabajador = threading.Thread(target=_procesar_tareas, daemon=True,
+                                          name=f'soma-tareas-{len(_trabajadores) + 1}')
+            trabajador.start()
+            _trabajadores.append(trabajador)
+
+
+def en_segundo_plano(funcion, *args, **kwargs):
+    """Ejecuta `funcion(*args, **kwargs)` en un hilo de tareas cuando se confirme la transacción.
+
+    Las tareas reciben ids (no instancias) y vuelven a leer lo que necesitan;
+    con más de un hilo no se garantiza el orden entre ellas. Con
+    TAREAS_SEGUNDO_PLANO = False se ejecutan en el mismo hilo al commit.
+    """
+    def _encolar():
+        if not getattr(settings, 'TAREAS_SEGUNDO_PLANO', True):
+            funcion(*args, **kwargs)
+            return
+        _iniciar_trabajadores()
+        _tareas.put((funcion, args, kwargs))
+    transaction.on_commit(_encolar, robust=True)
@@ -0,0 +1,165 @@
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django_htmx.middleware import HtmxDetails
+
+from apps.herramientas.models import AsignacionHerramienta, Herramienta
+from apps.notificaciones.context_processors import notificaciones
+from apps.notificaciones.models import Notificacion
+from apps.recursos_humanos.models import Empleado, PeriodoEstatusEmpleado, Puesto
+from . import admin_menu, context_processors
+from .cache_version import get_version
+from .menu import get_menu_snapshot
+
+User = get_user_model()
+
+
+class SomaTestBase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.puesto = Puesto.objects.create(nombre='Técnico', descripcion='Técnico',
+                                            salario_minimo=1000, salario_maximo=2000)
+
+    def _empleado(self, nombre):
+        n = Empleado.objects.count() + 1
+        usuario = User.objects.create_user(username=nombre, password='pass', first_name=nombre)
+        return Empleado.objects.create(
+            usuario=usuario, numero_empleado=f'S{n:03d}', curp=f'CURP{n:014d}', rfc=f'RFC{n:010d}',
+            fecha_nacimiento=date(1990, 1, 1), estado_civil='soltero', telefono_personal='1',
+            telefono_emergencia='1', contacto_emergencia='Contacto', direccion='Dirección',
+            puesto=self.puesto, fecha_ingreso=date(2020, 1, 1), salario_actual=1500,
+        )
+
+    def _request(self, usuario, **headers):
+        request = RequestFactory().get('/', **headers)
+        request.user = usuario
+        request.htmx = HtmxDetails(request)
+        return request
+
+
+class MenuSnapshotTest(SomaTestBase):
+    def _menu(self, empleado):
+        return get_menu_snapshot(self._request(empleado.usuario))
+
+    def test_cache_y_invalidacion_por_asignacion(self):
+        ana, beto = self._empleado('ana'), self._empleado('beto')
+        self.assertEqual(self._menu(ana)['herramientas_count'], 0)
+        # Las siguientes peticiones leen el snapshot del cache
+        with self.assertNumQueries(0):
+            self.assertEqual(self._menu(ana)['herramientas_count'], 0)
+
+        herramienta = Herramienta.objects.create(nombre='Taladro', categoria='CON', codigo='CON001')
+        with self.captureOnCommitCallbacks(execute=True):
+            asignacion = AsignacionHerramienta.objects.create(herramienta=herramienta, empleado=ana,
+                                                              fecha_asignacion=date(2025, 1, 1))
+        menu = self._menu(ana)
+        self.assertEqual((menu['herramientas_count'], menu['herramienta_menu']), (1, herramienta))
+
+        # Reasignarla invalida al empleado anterior y al nuevo
+        self.assertEqual(self._menu(beto)['herramientas_count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            asignacion = AsignacionHerramienta.objects.get(pk=asignacion.pk)
+            asignacion.empleado = beto
+            asignacion.save()
+        self.assertEqual((self._menu(ana)['herramientas_count'], self._menu(beto)['herramientas_count']), (0, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            asignacion.delete()
+        self.assertEqual(self._menu(beto)['herramientas_count'], 0)
+
+    def test_una_lectura_por_peticion(self):
+        ana = self._empleado('ana')
+        request = self._request(ana.usuario)
+        get_menu_snapshot(request)
+        with self.assertNumQueries(0):
+            self.assertIs(get_menu_snapshot(request), get_menu_snapshot(request))
+
+
+class ContextProcessorsTest(SomaTestBase):
+    PROCESADORES = (
+        context_processors.vehiculo_asignado_context,
+        context_processors.herramienta_asignada_context,
+        context_processors.recent_admin_actions,
+        context_processors.admin_app_list,
+        context_processors.frase_administradores,
+        notificaciones,
+    )
+
+    def _contexto(self, request):
+        contexto = {}
+        for procesador in self.PROCESADORES:
+            contexto.update(procesador(request))
+        return contexto
+
+    def test_no_consultan_hasta_que_la_plantilla_lee(self):
+        ana = self._empleado('ana')
+        ana.usuario.is_staff = True
+        ana.usuario.save()
+        Notificacion.objects.create(usuario=ana.usuario, titulo='t', mensaje='m')
+        with self.assertNumQueries(0):
+            contexto = self._contexto(self._request(ana.usuario))
+        self.assertEqual(contexto['herramientas_count'], 0)
+        self.assertEqual(contexto['notificaciones_pendientes'], 1)
+
+    def test_fragmentos_htmx_sin_contexto_del_layout(self):
+        ana = self._empleado('ana')
+        ana.usuario.is_staff = True
+        ana.usuario.save()
+        self.assertEqual(self._contexto(self._request(ana.usuario, HTTP_HX_REQUEST='true')), {})
+        # Las peticiones boosted reemplazan la página completa
+        boosted = self._contexto(self._request(ana.usuario, HTTP_HX_REQUEST='true', HTTP_HX_BOOSTED='true'))
+        self.assertIn('ordered_app_list', boosted)
+        self.assertIn('notificaciones_pendientes', boosted)
+
+
+class AdminAppListTest(SomaTestBase):
+    def _apps(self, usuario):
+        usuario = User.objects.get(pk=usuario.pk)  # sin la cache de permisos de la instancia
+        return [app['app_label'] for app in admin_menu.get_admin_app_list(self._request(usuario))[1]]
+
+    def test_cache_por_usuario_sin_leer_permisos(self):
+        raiz = User.objects.create_superuser('raiz', 'raiz@example.com', 'pass')
+        etiquetas = self._apps(raiz)
+        self.assertIn('recursos_humanos', etiquetas)
+        with self.assertNumQueries(1):  # sólo releer al usuario
+            self.assertEqual(self._apps(raiz), etiquetas)
+
+        staff = User.objects.create_user(username='staff', password='pass', is_staff=True)
+        self.assertEqual(self._apps(staff), [])
+        with self.assertNumQueries(1):  # sin get_all_permissions()
+            self.assertEqual(self._apps(staff), [])
+        grupo = Group.objects.create(name='RH')
+        with self.captureOnCommitCallbacks(execute=True):
+            staff.groups.add(grupo)
+        version = get_version(admin_menu._VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            grupo.permissions.add(Permission.objects.get(codename='view_puesto'))
+        # Cambiar los permisos de un grupo descarta las listas cacheadas
+        self.assertNotEqual(get_version(admin_menu._VERSION_KEY), version)
+        self.assertEqual(self._apps(staff), ['recursos_humanos'])
+        # Las banderas del usuario van en la clave
+        User.objects.filter(pk=staff.pk).update(is_superuser=True)
+        self.assertEqual(self._apps(staff), etiquetas)
+
+
+class PerfilTest(SomaTestBase):
+    def test_periodo_solo_si_hay_estatus(self):
+        ana = self._empleado('ana')  # sin commit: no se crea el periodo inicial
+        self.client.force_login(ana.usuario)
+        with CaptureQueriesContext(connection) as ctx:
+            respuesta = self.client.get(reverse('perfil_usuario'))
+        self.assertEqual(respuesta.context['estatus_actual'], 'sin estatus')
+        # Sólo la lectura de métricas; el estatus sale de la columna del empleado
+        self.assertEqual(len([q for q in ctx.captured_queries if 'periodoestatusempleado' in q['sql']]), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PeriodoEstatusEmpleado.objects.create(empleado=ana, estatus='vacaciones', fecha_inicio=date.today())
+        respuesta = self.client.get(reverse('perfil_usuario'))
+        self.assertEqual(respuesta.context['estatus_actual'], 'vacaciones')
+        self.assertEqual(respuesta.context['periodo_actual'].fecha_inicio, date.today())
@@ -22,6 +22,7 @@ urlpatterns = [
     path('notificaciones/<int:notificacion_id>/leida/', views.marcar_notificacion_leida, name='marcar_notificacion_leida'),
     # API / HTMX helpers
     path('api/notificaciones/conteo/', views.api_conteo_notificaciones, name='api_conteo_notificaciones'),
+    path('api/notificaciones/stream/', views.stream_notificaciones, name='stream_notificaciones'),
     path('htmx/notificaciones/dropdown/', views.dropdown_notificaciones, name='dropdown_notificaciones'),
     path('api/notificaciones/<int:notificacion_id>/leer/', views.api_marcar_notificacion_leida, name='api_marcar_notificacion_leida'),
     # Password reset: funcionalidad deshabilitada por petición del cliente.
@@ -0,0 +1,48 @@
+"""
+Valores de un modelo tal como se leyeron de la BD.
+
+    class Empleado(ValoresCargadosMixin, models.Model):
+        CAMPOS_RASTREADOS = ('salario_actual',)
+
+    empleado.valores_cargados('salario_actual')  # {'salario_actual': ...} o None
+
+Sirve a las señales y a save() para saber qué cambió sin releer la fila ni
+conectar receptores post_init (que corren por cada instancia creada).
+"""
+
+
+class ValoresCargadosMixin:
+    """Recuerda los valores de CAMPOS_RASTREADOS tal como se leyeron de la BD.
+
+    Se toman en `from_db` (y `refresh_from_db`) y se renuevan después de cada
+    save, así que para saber qué cambió no hace falta releer la fila. Los
+    campos diferidos (.only()/.defer()) no quedan registrados.
+    """
+    CAMPOS_RASTREADOS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._recordar_valores()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self._recordar_valores(fields)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._recordar_valores(kwargs.get('update_fields'))
+
+    def _recordar_valores(self, campos=None):
+        cargados = self.__dict__.setdefault('_valores_cargados', {})
+        for campo in self.CAMPOS_RASTREADOS:
+            if (campos is None or campo in campos) and campo in self.__dict__:
+                cargados[campo] = self.__dict__[campo]
+
+    def valores_cargados(self, *campos):
+        """{campo: valor leído de la BD}, o None si alguno no se cargó (o la instancia es nueva)."""
+        cargados = self.__dict__.get('_valores_cargados', {})
+        if self._state.adding or not all(c in cargados for c in campos):
+            return None
+        return {c: cargados[c] for c in campos}
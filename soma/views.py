@@ -5,6 +5,8 @@ from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth import login as auth_login
 from django.urls import reverse
 from django.contrib import admin as djadmin
+from datetime import date
+from apps.recursos_humanos import periodos
 from apps.recursos_humanos.models import Empleado
 from apps.flota_vehicular.models import Vehiculo, TransferenciaVehicular, AsignacionVehiculo
 try:
@@ -12,12 +14,13 @@ try:
 except Exception:
     AsignacionVehiculoExterno = None
 from apps.herramientas.models import Herramienta, AsignacionHerramienta
-from apps.notificaciones.models import Notificacion
+from apps.notificaciones.models import Notificacion, conteo_no_leidas, get_contador
+from apps.notificaciones.paginacion import paginar
 from apps.flota_vehicular.forms import RegistroUsoForm
 from django.contrib.admin.models import LogEntry
 from django.http import JsonResponse, HttpResponseBadRequest, HttpResponse
 from django.template.loader import render_to_string
-from apps.asignaciones.models import Asignacion
+from apps.asignaciones.servicios import trabajo_del_dia
 from django.utils import timezone
 
 
@@ -25,78 +28,15 @@ from django.utils import timezone
 def index(request):
     """Vista principal del sitio"""
     es_admin = request.user.is_staff or request.user.is_superuser
-    from datetime import date
-    from apps.asignaciones.models import Asignacion
-    asignaciones_hoy = []
-    empleado = Empleado.objects.filter(usuario=request.user).first()
-    asignaciones_recientes = []
-    asignaciones_supervisadas_hoy = []
-    asignaciones_supervisadas_pendientes = []
-    
-    if es_admin:
-        # Si es admin, mostrar todas las asignaciones del día sin duplicados
-        asignaciones_hoy = list(Asignacion.objects
-                               .filter(fecha=timezone.localdate())
-                               .select_related('empresa', 'supervisor')
-                               .prefetch_related('empleados__usuario')
-                               .distinct()
-                               .order_by('empresa__nombre', 'id'))
-    elif empleado:
-        # Si no es admin pero tiene registro de empleado
-        # Asignaciones como empleado
-        qs_emp = (Asignacion.objects
-                  .filter(empleados=empleado)
-                  .select_related('empresa', 'supervisor')
-                  .order_by('-fecha', '-fecha_creacion'))
-        asignaciones_empleado_hoy = list(qs_emp.filter(fecha=timezone.localdate()))
-        
-        # Asignaciones como supervisor
-        qs_sup = (Asignacion.objects
-                  .filter(supervisor=empleado)
-                  .select_related('empresa', 'supervisor')
-                  .prefetch_related('empleados')
-                  .order_by('-fecha', '-fecha_creacion'))
-        
-        # Asignaciones supervisadas de hoy
-        asignaciones_supervisadas_hoy = list(qs_sup.filter(fecha=timezone.localdate()))
-        
-        # Asignaciones supervisadas pendientes de días anteriores (no completadas al 100%)
-        asignaciones_supervisadas_pendientes = []
-        asignaciones_anteriores = qs_sup.filter(fecha__lt=timezone.localdate())[:10]  # Últimas 10
-        for asig in asignaciones_anteriores:
-            if asig.porcentaje_completado < 100:
-                asignaciones_supervisadas_pendientes.append(asig)
-            if len(asignaciones_supervisadas_pendientes) >= 5:  # Máximo 5
-                break
-        
-        # Combinar todas las listas eliminando duplicados por ID
-        asignaciones_ids_vistas = set()
-        asignaciones_hoy = []
-        
-        # Priorizar: hoy + pendientes de días anteriores
-        todas_asignaciones = asignaciones_empleado_hoy + asignaciones_supervisadas_hoy + asignaciones_supervisadas_pendientes
-        
-        for asignacion in todas_asignaciones:
-            if asignacion.id not in asignaciones_ids_vistas:
-                asignaciones_ids_vistas.add(asignacion.id)
-                asignaciones_hoy.append(asignacion)
-        
-        if not asignaciones_hoy:
-            # Para recientes también evitar duplicados
-            asignaciones_recientes_ids = set()
-            asignaciones_recientes = []
-            for asignacion in list(qs_emp[:3]) + list(qs_sup[:2]):
-                if asignacion.id not in asignaciones_recientes_ids:
-                    asignaciones_recientes_ids.add(asignacion.id)
-                    asignaciones_recientes.append(asignacion)
+    empleado = request.empleado
+    # Si es admin, todas las asignaciones del día; si no, las propias (hoy,
+    # supervisadas pendientes de días anteriores o, en su defecto, recientes)
+    trabajo = trabajo_del_dia(empleado, es_admin=es_admin)
     context = {
         'titulo': 'Servicios Industriales SOMA',
         'descripcion': 'Sistema de Gestión Empresarial',
         'es_admin': es_admin,
-        'asignaciones_hoy': asignaciones_hoy,
-        'asignaciones_recientes': asignaciones_recientes,
-        'asignaciones_supervisadas_hoy': asignaciones_supervisadas_hoy if empleado else [],
-        'asignaciones_pendientes': asignaciones_supervisadas_pendientes if empleado else [],
+        **trabajo,
         'empleado': empleado,
         'today': timezone.localdate(),
     }
@@ -165,68 +105,14 @@ def disabled_password_reset(request, *args, **kwargs):
 @login_required
 def perfil_usuario(request):
     """Vista del perfil del usuario"""
-    asignaciones_hoy = []
-    empleado = Empleado.objects.filter(usuario=request.user).first()
-    asignaciones_recientes = []
-    asignaciones_supervisadas_hoy = []
-    asignaciones_supervisadas_pendientes_perfil = []
+    empleado = request.empleado
     vehiculo_asignado = None
     herramienta_asignada = None
     herramientas_lista = []
     
-    if empleado:
-        # Asignaciones como empleado
-        qs_emp = (Asignacion.objects
-                  .filter(empleados=empleado)
-                  .select_related('empresa', 'supervisor')
-                  .order_by('-fecha', '-fecha_creacion'))
-        asignaciones_empleado_hoy = list(qs_emp.filter(fecha=timezone.localdate()))
-        
-        # Asignaciones como supervisor
-        qs_sup = (Asignacion.objects
-                  .filter(supervisor=empleado)
-                  .select_related('empresa', 'supervisor')
-                  .prefetch_related('empleados')
-                  .order_by('-fecha', '-fecha_creacion'))
-        
-        # Asignaciones supervisadas de hoy
-        asignaciones_supervisadas_hoy = list(qs_sup.filter(fecha=timezone.localdate()))
-        
-        # Asignaciones supervisadas pendientes de días anteriores (no completadas al 100%)
-        asignaciones_supervisadas_pendientes_perfil = []
-        asignaciones_anteriores_perfil = qs_sup.filter(fecha__lt=timezone.localdate())[:10]  # Últimas 10
-        for asig in asignaciones_anteriores_perfil:
-            if asig.porcentaje_completado < 100:
-                asignaciones_supervisadas_pendientes_perfil.append(asig)
-            if len(asignaciones_supervisadas_pendientes_perfil) >= 5:  # Máximo 5
-                break
-        
-        # Combinar todas las listas eliminando duplicados por ID
-        asignaciones_ids_vistas = set()
-        asignaciones_hoy = []
-        
-        # Priorizar: hoy + pendientes de días anteriores
-        todas_asignaciones_perfil = asignaciones_empleado_hoy + asignaciones_supervisadas_hoy + asignaciones_supervisadas_pendientes_perfil
-        
-        for asignacion in todas_asignaciones_perfil:
-            if asignacion.id not in asignaciones_ids_vistas:
-                asignaciones_ids_vistas.add(asignacion.id)
-                asignaciones_hoy.append(asignacion)
-        
-        if not asignaciones_hoy:
-            # Para recientes también evitar duplicados
-            asignaciones_recientes_ids = set()
-            asignaciones_recientes = []
-            for asignacion in list(qs_emp[:3]) + list(qs_sup[:2]):
-                if asignacion.id not in asignaciones_recientes_ids:
-                    asignaciones_recientes_ids.add(asignacion.id)
-                    asignaciones_recientes.append(asignacion)
-    elif request.user.is_staff or request.user.is_superuser:
-        asignaciones_hoy = (Asignacion.objects
-                            .filter(fecha=timezone.localdate())
-                            .select_related('empresa', 'supervisor')
-                            .prefetch_related('empleados__usuario')
-                            .order_by('empleados__numero_empleado'))
+    # Con empleado: sus asignaciones; sin empleado pero staff: todas las de hoy
+    es_admin = not empleado and (request.user.is_staff or request.user.is_superuser)
+    trabajo = trabajo_del_dia(empleado, es_admin=es_admin)
     
     # Obtener vehículo asignado activo si el usuario tiene empleado
     if empleado:
@@ -258,61 +144,30 @@ def perfil_usuario(request):
     fecha_ingreso = None
     dias_activo = None
     historial_anual = []
+    dias_vacaciones_disponibles = None
     if empleado:
-        from datetime import date, timedelta
-        # Usar helper del modelo para determinar el periodo vigente
-        periodo_actual = empleado.get_periodo_actual()
+        # El estatus sale de la columna desnormalizada; el periodo sólo se lee si
+        # hay uno vigente cuyas fechas mostrar. El resto de las métricas salen de
+        # una sola lectura de periodos (periodos.metricas_empleados)
+        estatus_actual = empleado.estatus_actual or 'sin estatus'
+        periodo_actual = empleado.get_periodo_actual() if empleado.estatus_actual else None
         if periodo_actual:
-            estatus_actual = periodo_actual.estatus
             inicio = periodo_actual.fecha_inicio
             fin = periodo_actual.fecha_fin or date.today()
             if inicio:
                 if periodo_actual.estatus == 'vacaciones':
-                    dias = 0
-                    temp = inicio
-                    while temp <= fin:
-                        if temp.weekday() != 6:  # 6 = domingo
-                            dias += 1
-                        temp += timedelta(days=1)
-                    dias_en_estatus_actual = dias
+                    dias_en_estatus_actual = periodos.dias_sin_domingo(inicio, fin)
                 else:
                     dias_en_estatus_actual = (fin - inicio).days + 1
-        else:
-            # Mostrar explícitamente "sin estatus" cuando no hay periodo vigente
-            estatus_actual = 'sin estatus'
-        fecha_ingreso = empleado.fecha_ingreso if empleado and empleado.fecha_ingreso else None
-        dias_activo = empleado.dias_trabajados() if empleado else None
-        historial_anual = []
-        if empleado and empleado.fecha_ingreso:
-            from datetime import date, timedelta
-            import calendar
-            primer = empleado.fecha_ingreso.year
-            ultimo = date.today().year
-            periodos = empleado.periodos_estatus.filter(estatus="activo")
-            for anio in range(primer, ultimo+1):
-                dias_unicos = set()
-                for periodo in periodos:
-                    inicio = periodo.fecha_inicio
-                    fin = periodo.fecha_fin or date.today()
-                    # Si el periodo cruza el año
-                    if inicio.year <= anio <= fin.year:
-                        ini = max(inicio, date(anio,1,1))
-                        fini = min(fin, date(anio,12,31))
-                        if ini <= fini:
-                            delta = (fini - ini).days + 1
-                            for i in range(delta):
-                                dias_unicos.add(ini + timedelta(days=i))
-                # Limitar al máximo de días del año
-                max_dias = 366 if calendar.isleap(anio) else 365
-                dias = min(len(dias_unicos), max_dias)
-                historial_anual.append({'anio': anio, 'dias': dias})
+        fecha_ingreso = empleado.fecha_ingreso
+        metricas = periodos.metricas_empleados([empleado])[empleado.pk]
+        dias_activo = metricas['dias_trabajados']
+        historial_anual = metricas['historial_anual']
+        dias_vacaciones_disponibles = metricas['vacaciones_disponibles']
     context = {
         'titulo': 'Mi Perfil',
         'usuario': request.user,
-        'asignaciones_hoy': asignaciones_hoy,
-        'asignaciones_recientes': asignaciones_recientes,
-        'asignaciones_supervisadas_hoy': asignaciones_supervisadas_hoy if empleado else [],
-        'asignaciones_pendientes': asignaciones_supervisadas_pendientes_perfil if empleado else [],
+        **trabajo,
         'empleado': empleado,
         'estatus_actual': estatus_actual,
         'periodo_actual': periodo_actual,
@@ -324,7 +179,7 @@ def perfil_usuario(request):
         'fecha_ingreso': fecha_ingreso,
         'dias_activo': dias_activo,
         'historial_anual': historial_anual,
-        'dias_vacaciones_disponibles': empleado.dias_vacaciones_disponibles() if empleado else None,
+        'dias_vacaciones_disponibles': dias_vacaciones_disponibles,
         'dias_faltan_para_vacaciones': empleado.dias_faltan_para_vacaciones if empleado else None,
     }
     return render(request, 'perfil_usuario.html', context)
@@ -333,7 +188,7 @@ def perfil_usuario(request):
 @login_required
 def mi_vehiculo(request):
     """Vista dedicada para mostrar el vehículo asignado al usuario"""
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     vehiculo_asignado = None
     asignacion_vehiculo = None
     es_externo = False
@@ -381,7 +236,7 @@ def mi_vehiculo(request):
 @login_required
 def registrar_km(request):
     """Página separada para mostrar y procesar el formulario de registro de kilometraje."""
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado:
         messages.error(request, 'Tu usuario no está asociado a un empleado.')
         return redirect('perfil_usuario')
@@ -446,7 +301,7 @@ def registrar_km(request):
 @login_required
 def historial_km(request):
     """Página que muestra el historial de registros del vehículo asignado."""
-    empleado = Empleado.objects.filter(usuario=request.user).first()
+    empleado = request.empleado
     if not empleado:
         messages.error(request, 'Tu usuario no está asociado a un empleado.')
         return redirect('perfil_usuario')
@@ -485,14 +340,18 @@ def notificaciones_usuario(request):
     elif filtro == 'no_leida':
         qs = qs.filter(leida=False)
 
-    notificaciones = qs.order_by('-fecha_creacion')
+    # Paginación por cursor sobre (fecha_creacion, id): ?antes=<cursor>
+    notificaciones, siguiente_cursor = paginar(qs.select_related('usuario'), request.GET.get('antes'))
+    contador = get_contador(request.user.pk)
 
     context = {
         'titulo': 'Mis Notificaciones',
         'notificaciones': notificaciones,
-        'total_no_leidas': Notificacion.objects.filter(usuario=request.user, leida=False).count(),
-        'total_leidas': Notificacion.objects.filter(usuario=request.user, leida=True).count(),
+        'total_no_leidas': contador.no_leidas,
+        'total_leidas': contador.leidas,
         'filtro_actual': filtro,
+        'siguiente_cursor': siguiente_cursor,
+        'es_primera_pagina': not request.GET.get('antes'),
     }
     return render(request, 'notificaciones_usuario.html', context)
 
@@ -513,21 +372,40 @@ def marcar_notificacion_leida(request, notificacion_id):
 @login_required
 def api_conteo_notificaciones(request):
     """Devuelve JSON con el conteo de notificaciones no leídas (para polling ligero)."""
-    count = Notificacion.objects.filter(usuario=request.user, leida=False).count()
+    count = conteo_no_leidas(request.user.pk)
     return JsonResponse({'pendientes': count})
 
 
+async def stream_notificaciones(request):
+    """Server-Sent Events con el conteo y las notificaciones nuevas del usuario.
+
+    Sólo mantiene la conexión abierta bajo ASGI (soma.asgi). Bajo WSGI responde 204
+    para que el navegador no reconecte ni ocupe un worker (base.html sólo abre el
+    stream con NOTIFICACIONES_SSE).
+    """
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
+    from asgiref.sync import sync_to_async
+    from apps.notificaciones.eventos import stream_usuario
+
+    usuario_id = await sync_to_async(lambda: request.user.pk if request.user.is_authenticated else None)()
+    if usuario_id is None:
+        return HttpResponse(status=401)
+    if not isinstance(request, ASGIRequest):
+        # EventSource deja de reconectar al recibir 204
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(stream_usuario(usuario_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Evitar que nginx acumule el stream en buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def dropdown_notificaciones(request):
-    """Devuelve un fragmento HTML (HTMX) con las últimas notificaciones para el dropdown rápido."""
-    # Antes de cargar las notificaciones, generar notificaciones de estatus que finalizan hoy
-    try:
-        from apps.recursos_humanos.models import notify_status_end_for_today
-        notify_status_end_for_today()
-    except Exception:
-        # No interrumpir si algo falla aquí; las notificaciones seguirán cargando
-        pass
-
+    """Devuelve un fragmento HTML (HTMX) con las últimas notificaciones para el dropdown rápido.
+    Sólo lectura: los avisos de fin de estatus los genera el comando send_status_end_notifications.
+    """
     ultimas = (Notificacion.objects
                .filter(usuario=request.user)
                .order_by('-fecha_creacion')[:5])
@@ -535,7 +413,7 @@ def dropdown_notificaciones(request):
         'partials/_notificaciones_dropdown.html',
         {
             'notificaciones': ultimas,
-            'pendientes': Notificacion.objects.filter(usuario=request.user, leida=False).count(),
+            'pendientes': conteo_no_leidas(request.user.pk),
         },
         request=request
     )
@@ -552,7 +430,7 @@ def api_marcar_notificacion_leida(request, notificacion_id):
         if not notif.leida:
             notif.leida = True
             notif.save(update_fields=['leida'])
-        pendientes = Notificacion.objects.filter(usuario=request.user, leida=False).count()
+        pendientes = conteo_no_leidas(request.user.pk)
         return JsonResponse({'ok': True, 'pendientes': pendientes, 'id': notif.id})
     except Notificacion.DoesNotExist:
         return JsonResponse({'ok': False, 'error': 'No encontrada'}, status=404)